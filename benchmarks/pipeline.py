@@ -0,0 +1,371 @@
+import json
+import multiprocessing
+import platform
+import resource
+import statistics
+import subprocess
+import tempfile
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+import typer
+
+# i-LIDS videos: PAL resolution at 25 fps
+ILIDS_DIMENSION = (720, 576)
+ILIDS_FPS = 25
+
+DEFAULT_HISTORY_PATH = Path(__file__).parent / "history.json"
+
+
+class MissingCheckpoint(Exception):
+    """A benchmark requires a checkpoint which wasn't given: it is skipped"""
+
+
+@dataclass
+class BenchmarkOptions:
+    videos: List[Path]
+    work_folder: Path
+    video_duration: float
+    actionclip_checkpoint: Optional[Path]
+    movinet_model_name: str
+
+
+@dataclass
+class BenchmarkResult:
+    seconds: float
+    clips_per_s: float
+    frames_per_s: float
+    peak_rss_mb: float
+
+
+def generate_videos(output_folder: Path, count: int, duration: float) -> List[Path]:
+    """Synthetic videos at the i-LIDS resolution and frame rate (ffmpeg's `testsrc`)"""
+    width, height = ILIDS_DIMENSION
+
+    videos = []
+    for i in range(count):
+        video = output_folder / f"testsrc-{i}.mov"
+        subprocess.run(
+            [
+                "ffmpeg",
+                "-loglevel",
+                "error",
+                "-y",
+                "-f",
+                "lavfi",
+                "-i",
+                f"testsrc=duration={duration}:size={width}x{height}:rate={ILIDS_FPS}",
+                str(video),
+            ],
+            check=True,
+        )
+        videos.append(video)
+
+    return videos
+
+
+def _sequences_csv(options: BenchmarkOptions) -> Path:
+    import pandas as pd
+
+    sequences_csv = options.work_folder / "sequences.csv"
+    pd.DataFrame(
+        {
+            "sequence": [str(video) for video in options.videos],
+            "frame_count": int(options.video_duration * ILIDS_FPS),
+        }
+    ).to_csv(sequences_csv, index=False)
+
+    return sequences_csv
+
+
+# Each benchmark returns a callable running it, and the number of clips and frames it
+# processes: the setup (imports, models loading, ...) isn't timed.
+Benchmark = Callable[[BenchmarkOptions], Tuple[Callable[[], None], int, int]]
+
+
+def bench_frames_extraction(options: BenchmarkOptions):
+    from ilids.commands.videos.frames_extraction import extract
+
+    duration = int(options.video_duration)
+
+    def _run():
+        for video in options.videos:
+            extract(
+                video,
+                "00:00:00",
+                f"00:00:{duration:02d}",
+                frame_stride=1,
+                fps=ILIDS_FPS,
+                output=options.work_folder / f"extract-{video.name}",
+                overwrite=True,
+            )
+
+    return _run, len(options.videos), len(options.videos) * duration * ILIDS_FPS
+
+
+def bench_action_dataset(options: BenchmarkOptions):
+    from ilids.models.actionclip.datasets import ActionDataset
+    from ilids.models.actionclip.transform import get_augmentation
+
+    frames_to_extract = 8
+    dataset = ActionDataset(
+        _sequences_csv(options),
+        transform=get_augmentation(),
+        frames_to_extract=frames_to_extract,
+    )
+
+    def _run():
+        for i in range(len(dataset)):
+            dataset[i]
+
+    return _run, len(dataset), len(dataset) * frames_to_extract
+
+
+def bench_augmentation(options: BenchmarkOptions):
+    import numpy as np
+    from decord import VideoReader, cpu
+    from PIL import Image
+
+    from ilids.models.actionclip.transform import get_augmentation
+
+    frames_to_extract = 8
+    transform = get_augmentation()
+
+    clips = []
+    for video in options.videos:
+        video_reader = VideoReader(str(video), ctx=cpu(0))
+        indices = np.linspace(0, len(video_reader) - 1, frames_to_extract).astype(int)
+        clips.append(
+            [Image.fromarray(f) for f in video_reader.get_batch(indices).asnumpy()]
+        )
+
+    def _run():
+        for clip in clips:
+            transform(clip)
+
+    return _run, len(clips), len(clips) * frames_to_extract
+
+
+def bench_movinet(options: BenchmarkOptions):
+    import torch
+    from decord import VideoReader, cpu
+
+    from ilids.towhee_utils.override.movinet import Movinet
+
+    movinet = Movinet(model_name=options.movinet_model_name)
+    movinet.device = "cpu"
+    movinet.model.to("cpu")
+
+    videos = [
+        list(VideoReader(str(video), ctx=cpu(0))[:].asnumpy())
+        for video in options.videos
+    ]
+
+    def _run():
+        with torch.no_grad():
+            for video in videos:
+                movinet(video)
+
+    return _run, len(videos), sum(len(video) for video in videos)
+
+
+def bench_actionclip_features(options: BenchmarkOptions):
+    import torch
+    from torch.utils.data import DataLoader
+
+    from ilids.experiments.actionclip import extract_actionclip_sequences_features
+    from ilids.models.actionclip.constants import get_input_frames_from_ckpt_path
+    from ilids.models.actionclip.datasets import ActionDataset
+    from ilids.models.actionclip.factory import create_models_and_transforms
+    from ilids.models.actionclip.transform import get_augmentation
+
+    if options.actionclip_checkpoint is None:
+        raise MissingCheckpoint(
+            "No ActionCLIP checkpoint given (--actionclip-checkpoint)"
+        )
+
+    device = torch.device("cpu")
+    frames_to_extract = get_input_frames_from_ckpt_path(options.actionclip_checkpoint)
+    model_image, _, fusion_model, _ = create_models_and_transforms(
+        actionclip_pretrained_ckpt=options.actionclip_checkpoint,
+        openai_model_name=None,
+        extracted_frames=frames_to_extract,
+        device=device,
+    )
+    dataset = ActionDataset(
+        _sequences_csv(options),
+        transform=get_augmentation(),
+        frames_to_extract=frames_to_extract,
+    )
+
+    def _run():
+        extract_actionclip_sequences_features(
+            model_image,
+            fusion_model,
+            DataLoader(dataset, batch_size=4, shuffle=False),
+            extracted_frames=frames_to_extract,
+            normalize_features=False,
+            device=device,
+        )
+
+    return _run, len(dataset), len(dataset) * frames_to_extract
+
+
+BENCHMARKS: Dict[str, Benchmark] = {
+    "frames_extraction.extract": bench_frames_extraction,
+    "ActionDataset.__getitem__": bench_action_dataset,
+    "get_augmentation": bench_augmentation,
+    "Movinet.__call__": bench_movinet,
+    "extract_actionclip_sequences_features": bench_actionclip_features,
+}
+
+
+def _run_benchmark(
+    name: str, options: BenchmarkOptions, repeat: int
+) -> BenchmarkResult:
+    """Run in its own process, for its peak RSS not to include the other benchmarks"""
+    run, clips, frames = BENCHMARKS[name](options)
+
+    seconds = float("inf")
+    for _ in range(repeat):
+        start = perf_counter()
+        run()
+        seconds = min(seconds, perf_counter() - start)
+
+    return BenchmarkResult(
+        seconds=seconds,
+        clips_per_s=clips / seconds,
+        frames_per_s=frames / seconds,
+        # in KiB on Linux
+        peak_rss_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    )
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def find_regressions(
+    history: List[dict], results: Dict[str, BenchmarkResult], threshold: float
+) -> List[str]:
+    """Benchmarks whose throughput (clips/s) dropped by more than `threshold` compared
+    with the median of the last runs on this machine"""
+    host = platform.node()
+    previous_runs = [run for run in history if run["host"] == host][-5:]
+
+    regressions = []
+    for name, result in results.items():
+        previous_throughputs = [
+            run["results"][name]["clips_per_s"]
+            for run in previous_runs
+            if name in run["results"]
+        ]
+        if len(previous_throughputs) == 0:
+            continue
+
+        baseline = statistics.median(previous_throughputs)
+        if result.clips_per_s < baseline * (1 - threshold):
+            regressions.append(
+                f"{name}: {result.clips_per_s:.2f} clips/s, "
+                f"{(1 - result.clips_per_s / baseline) * 100:.0f}% below the "
+                f"{baseline:.2f} clips/s baseline"
+            )
+
+    return regressions
+
+
+def main(
+    benchmarks: Optional[List[str]] = typer.Option(
+        None, "--benchmark", "-k", help="Only run the given benchmarks"
+    ),
+    videos_count: int = typer.Option(4, "--videos", help="Number of synthetic videos"),
+    video_duration: int = typer.Option(
+        10, "--duration", help="Duration (s) of the videos"
+    ),
+    repeat: int = typer.Option(3, "--repeat", "-n", help="Runs per benchmark (best)"),
+    actionclip_checkpoint: Optional[Path] = typer.Option(
+        None, "--actionclip-checkpoint", exists=True, dir_okay=False
+    ),
+    movinet_model_name: str = typer.Option("movineta0", "--movinet"),
+    history_path: Path = typer.Option(DEFAULT_HISTORY_PATH, "--history"),
+    record: bool = typer.Option(
+        True, "--record/--no-record", help="Append the results to the history"
+    ),
+    threshold: float = typer.Option(
+        0.2,
+        "--threshold",
+        help="Fail if a throughput is that much below the baseline (0.2 = 20%)",
+    ),
+):
+    """Measure the throughput of the pipeline stages on CPU (decode, transform,
+    encode), over synthetic i-LIDS videos, and compare it with the previous runs."""
+    benchmarks = benchmarks or list(BENCHMARKS.keys())
+    unknown_benchmarks = set(benchmarks) - set(BENCHMARKS.keys())
+    if len(unknown_benchmarks) > 0:
+        raise typer.BadParameter(f"Unknown benchmarks: {unknown_benchmarks}")
+
+    history = json.loads(history_path.read_text()) if history_path.exists() else []
+
+    # a fresh interpreter per benchmark, not sharing the memory of the others
+    context = multiprocessing.get_context("spawn")
+
+    results: Dict[str, BenchmarkResult] = dict()
+    with tempfile.TemporaryDirectory() as work_folder:
+        options = BenchmarkOptions(
+            videos=generate_videos(Path(work_folder), videos_count, video_duration),
+            work_folder=Path(work_folder),
+            video_duration=video_duration,
+            actionclip_checkpoint=actionclip_checkpoint,
+            movinet_model_name=movinet_model_name,
+        )
+
+        print(
+            f"{'benchmark':<40} {'clips/s':>9} {'frames/s':>10} {'peak RSS (MB)':>14}"
+        )
+        for name in benchmarks:
+            with context.Pool(1) as pool:
+                # only skip the benchmarks of the missing optional dependencies or
+                # checkpoints, any other error fails the run
+                try:
+                    result = pool.apply(_run_benchmark, (name, options, repeat))
+                except (ImportError, MissingCheckpoint) as e:
+                    print(f"{name:<40} skipped: {e!r}")
+                    continue
+
+            results[name] = result
+            print(
+                f"{name:<40} {result.clips_per_s:>9.2f} {result.frames_per_s:>10.1f} "
+                f"{result.peak_rss_mb:>14.0f}"
+            )
+
+    regressions = find_regressions(history, results, threshold)
+
+    if record and len(results) > 0:
+        history.append(
+            {
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "commit": _git_commit(),
+                "host": platform.node(),
+                "results": {name: asdict(r) for name, r in results.items()},
+            }
+        )
+        history_path.write_text(json.dumps(history, indent=2))
+
+    if len(regressions) > 0:
+        print("Regressions:\n" + "\n".join(f"- {r}" for r in regressions))
+        raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    typer.run(main)
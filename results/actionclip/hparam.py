@@ -1,6 +1,10 @@
+import os
 import random
+import sys
 import warnings
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Optional
 
 from aim import Run, Text
 import numpy as np
@@ -10,11 +14,10 @@ import pandas as pd
 import torch
 import typer
 from hparam.texts import NEGATIVE_TEXTS, POSITIVE_TEXTS, get_all_composition
-from metrics.confusion_matrix import confusion_matrix_fn_equals_0
 from metrics.pr import pr_auc
 from metrics.roc import roc_auc
 from metrics.score.ratio import ScoreMethod, score
-from metrics.score.topk import TopClassificationMethod, classify
+from metrics.score.topk import TopClassificationMethod, classify_topks
 from metrics.similarity.dot_product import SimilarityMethod, similarity
 
 from ilids.models.actionclip.constants import (
@@ -22,11 +25,16 @@ from ilids.models.actionclip.constants import (
     get_input_frames_from_ckpt_path,
 )
 from ilids.models.actionclip.factory import create_models_and_transforms
+from ilids.models.actionclip.prompt_embeddings import PromptEmbeddings, PromptEmbeddingsCache
+from ilids.utils.metrics import confusion_matrix_fn_equals_0
+from ilids.utils.persistence_method import find_pandas_persisted_file, read_pandas
 
 SEED = 16896375
+TOPKS = [1, 3, 5]
 SOURCE_PATH = Path().resolve()
 
 warnings.filterwarnings("ignore", category=UserWarning, module="optuna.distributions")
+warnings.filterwarnings("ignore", category=optuna.exceptions.ExperimentalWarning)
 
 # object that will replace Aim's logger as a noop, when "re-running" the objective function
 # with the best parameters found
@@ -37,12 +45,12 @@ class DoNothing:
         return self  # Return the DoNothing object itself
 
 
-def objective_builder(model_name, model_text, y_true, visual_features, ALL_POSITIVE_TEXTS_COMBINATIONS, ALL_NEGATIVE_TEXTS_COMBINATIONS, persist_y = False, log_run = False):
+def objective_builder(model_name, prompt_embeddings: PromptEmbeddings, y_true, visual_features, ALL_POSITIVE_TEXTS_COMBINATIONS, ALL_NEGATIVE_TEXTS_COMBINATIONS, persist_y = False, log_run = False):
     y_true = y_true.to_numpy()
 
     normalized_visual_features = normalize(visual_features)
 
-    human_text_features = encode_text(model_text, ["human"])
+    human_text_features = prompt_embeddings[["human"]]
 
     run = Run(experiment=model_name) if log_run else DoNothing()
 
@@ -65,14 +73,15 @@ def objective_builder(model_name, model_text, y_true, visual_features, ALL_POSIT
         texts_classes = [True] * len(positive_texts) + [False] * len(negative_texts)
 
         ## get similarity method
-        similarity_method = trial.suggest_categorical(
+        # (the trials loaded from a storage give back the values of the enums)
+        similarity_method = SimilarityMethod(trial.suggest_categorical(
             "similarity_method",
             [
                 SimilarityMethod.dot_product,
                 SimilarityMethod.minus_human_features,
                 SimilarityMethod.minus_human_similarity,
             ],
-        )
+        ))
         run.track(Text(similarity_method.value), name="similarity_method", step=trial.number)
         minus_similarity_weight = (
             trial.suggest_float("minus_similarity_weight", 0.1, 0.9)
@@ -93,11 +102,15 @@ def objective_builder(model_name, model_text, y_true, visual_features, ALL_POSIT
                 TopClassificationMethod.max_sum,
             ],
         )
+        if score_method in list(TopClassificationMethod):
+            score_method = TopClassificationMethod(score_method)
+        else:
+            score_method = ScoreMethod(score_method)
         run.track(Text(score_method.value), name="score_method", step=trial.number)
 
-        # encode texts
-        positive_text_features = encode_text(model_text, positive_texts)
-        negative_text_features = encode_text(model_text, negative_texts)
+        # gather the texts features, encoded once beforehand
+        positive_text_features = prompt_embeddings[positive_texts]
+        negative_text_features = prompt_embeddings[negative_texts]
 
         # similarity
         similarities = similarity(
@@ -115,12 +128,11 @@ def objective_builder(model_name, model_text, y_true, visual_features, ALL_POSIT
             best_roc = 0
             best_topK = 0
 
-            for topK in [1, 3, 5]:
-                if topK > len(positive_texts):
-                    break
-
-                y = classify(score_method, similarities, texts_classes, topK).numpy()
+            # classify the clips for all the top K at once (top K x visual)
+            topKs = [topK for topK in TOPKS if topK <= len(positive_texts)]
+            topKs_y = classify_topks(score_method, similarities, texts_classes, topKs).numpy()
 
+            for topK, y in zip(topKs, topKs_y):
                 # roc, pr
                 roc = roc_auc(y_true, y)
                 pr = pr_auc(y_true, y)
@@ -225,12 +237,12 @@ def load_y_true() -> pd.Series:
 
 
 def load_visual_features(model_name, y_true):
-    pickle_file = SOURCE_PATH / f"{model_name}.pkl"
-    features_df = pd.read_pickle(pickle_file)
-    features_df.set_index(features_df.index.str.lstrip("data/sequences/"), inplace=True)
-
     FEATURES_COLUMNS_INDEXES = pd.RangeIndex.from_range(range(512))
 
+    features_file = find_pandas_persisted_file(SOURCE_PATH, model_name)
+    features_df = read_pandas(features_file, columns=FEATURES_COLUMNS_INDEXES)
+    features_df.set_index(features_df.index.str.lstrip("data/sequences/"), inplace=True)
+
     visual_features_df = (
         # make sure to have matching indexes order
         features_df.join(y_true)
@@ -247,10 +259,12 @@ def load_visual_features(model_name, y_true):
     return visual_features, visual_features_df['Classification']
 
 
+def get_actionclip_ckpt_path(model_name) -> Path:
+    return SOURCE_PATH.parent.parent / "ckpt" / "actionclip" / f"{model_name}.pt"
+
+
 def load_model_text_encoder(model_name):
-    ACTIONCLIP_CKPT_PATH = (
-        SOURCE_PATH.parent.parent / "ckpt" / "actionclip" / f"{model_name}.pt"
-    )
+    ACTIONCLIP_CKPT_PATH = get_actionclip_ckpt_path(model_name)
 
     model_text = create_models_and_transforms(
         actionclip_pretrained_ckpt=ACTIONCLIP_CKPT_PATH,
@@ -270,13 +284,65 @@ def encode_text(model_text, texts):
         return model_text(tokenized_texts)
 
 
-def run(model_name: str, plot_study: bool = typer.Argument(default=False), trials: int = typer.Argument(default=200)):
+def load_prompt_embeddings(model_name) -> PromptEmbeddings:
+    """Text features of all the prompts the trials can pick, only loading the model to
+    encode the prompts missing from the on-disk cache"""
+    return PromptEmbeddingsCache(get_actionclip_ckpt_path(model_name)).get(
+        ["human", *POSITIVE_TEXTS, *NEGATIVE_TEXTS],
+        lambda texts: encode_text(load_model_text_encoder(model_name), texts),
+    )
+
+
+def get_study_storage(storage_path: Path) -> optuna.storages.BaseStorage:
+    """Storage on a local file, shared by all the processes optimizing the study, which can
+    be resumed from it after an interruption"""
+    storage_path.parent.mkdir(parents=True, exist_ok=True)
+
+    return optuna.storages.JournalStorage(
+        optuna.storages.JournalFileStorage(str(storage_path))
+    )
+
+
+def optimize_worker(worker_index: int, model_name, storage_path: Path, trials: int, study_trials: int, jobs: int, prompt_embeddings, y_true, visual_features, ALL_POSITIVE_TEXTS_COMBINATIONS, ALL_NEGATIVE_TEXTS_COMBINATIONS):
+    """Run `trials` trials of the study, its share of the trials left, along with the
+    other workers, stopping early once the study has `study_trials` completed trials
+    (e.g. along with another invocation on the same storage)"""
+    # the workers share the cores, rather than each one using all of them
+    if jobs > 1:
+        torch.set_num_threads(1)
+
+    study = optuna.load_study(
+        study_name=model_name,
+        storage=get_study_storage(storage_path),
+        # a seed per worker, for them not to suggest the same parameters
+        sampler=optuna.samplers.TPESampler(seed=SEED + worker_index),  # student number as seed
+    )
+    study.optimize(
+        objective_builder(model_name, prompt_embeddings, y_true, visual_features, ALL_POSITIVE_TEXTS_COMBINATIONS, ALL_NEGATIVE_TEXTS_COMBINATIONS, log_run=True),
+        n_trials=trials,
+        callbacks=[optuna.study.MaxTrialsCallback(study_trials, states=(optuna.trial.TrialState.COMPLETE,))],
+    )
+
+
+def run(
+    model_name: str,
+    plot_study: bool = typer.Argument(default=False),
+    trials: int = typer.Argument(default=200),
+    jobs: int = typer.Option(1, "--jobs", "-j", help="Processes optimizing the study at once, -1 for all the cores"),
+    storage_path: Optional[Path] = typer.Option(None, "--storage", help="Journal file of the study, default to <model name>/hparam-study.journal"),
+):
     if plot_study:
         if not optuna.visualization.is_available():
             raise RuntimeError("Visualization library is not available!")
 
+    if jobs == 0 or jobs < -1:
+        raise typer.BadParameter(f"Expected a positive number of jobs, or -1 for all the cores, got {jobs}")
+
     random.seed(SEED)
 
+    jobs = os.cpu_count() if jobs == -1 else jobs
+    storage_path = storage_path or Path(model_name) / "hparam-study.journal"
+
     # load true data
     y_true: pd.Series = load_y_true()
 
@@ -284,19 +350,42 @@ def run(model_name: str, plot_study: bool = typer.Argument(default=False), trial
     #   and override the y_true as some sequences might have been dropped
     visual_features, y_true = load_visual_features(model_name, y_true)
 
-    # load model
-    model_text = load_model_text_encoder(model_name)
+    # load the features of the prompts, encoded by the model
+    prompt_embeddings = load_prompt_embeddings(model_name)
 
     # pick positive and negative prompts and create compositions
     ALL_POSITIVE_TEXTS_COMBINATIONS = get_all_composition(POSITIVE_TEXTS, 12, 8)
     ALL_NEGATIVE_TEXTS_COMBINATIONS = get_all_composition(NEGATIVE_TEXTS, 12, 8)
 
-    # Create a study object and optimize the objective function.
+    # Create the study, or resume it if it was interrupted
     study = optuna.create_study(
+        study_name=model_name,
+        storage=get_study_storage(storage_path),
+        load_if_exists=True,
         direction="maximize",
-        sampler=optuna.samplers.TPESampler(seed=SEED),  # student number as seed
     )
-    study.optimize(objective_builder(model_name, model_text, y_true, visual_features, ALL_POSITIVE_TEXTS_COMBINATIONS, ALL_NEGATIVE_TEXTS_COMBINATIONS, log_run=True), n_trials=trials)
+    completed_trials = len(study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.COMPLETE,)))
+    if completed_trials > 0:
+        print(f"Resuming the study with {completed_trials} completed trials", file=sys.stderr)
+
+    remaining_trials = trials - completed_trials
+    if remaining_trials <= 0:
+        print(f"The study already has {completed_trials} completed trials, out of {trials}", file=sys.stderr)
+    else:
+        # optimize the study from several processes, sharing the same storage, each one
+        # running its share of the remaining trials (not more workers than trials)
+        jobs = min(jobs, remaining_trials)
+        workers_trials = [remaining_trials // jobs + (1 if i < remaining_trials % jobs else 0) for i in range(jobs)]
+        data_args = (prompt_embeddings, y_true, visual_features, ALL_POSITIVE_TEXTS_COMBINATIONS, ALL_NEGATIVE_TEXTS_COMBINATIONS)
+        if jobs > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                for future in [executor.submit(optimize_worker, i, model_name, storage_path, worker_trials, trials, jobs, *data_args) for i, worker_trials in enumerate(workers_trials)]:
+                    future.result()
+        else:
+            optimize_worker(0, model_name, storage_path, remaining_trials, trials, jobs, *data_args)
+
+    # reload the trials of all the workers
+    study = optuna.load_study(study_name=model_name, storage=get_study_storage(storage_path))
 
     # Print the best value and parameters
     print("Best value:")
@@ -306,7 +395,7 @@ def run(model_name: str, plot_study: bool = typer.Argument(default=False), trial
     print("Best trial user attributes:")
     print(study.best_trial.user_attrs)
 
-    objective_builder(model_name, model_text, y_true, visual_features, ALL_POSITIVE_TEXTS_COMBINATIONS, ALL_NEGATIVE_TEXTS_COMBINATIONS, persist_y=True)(study.best_trial)
+    objective_builder(model_name, prompt_embeddings, y_true, visual_features, ALL_POSITIVE_TEXTS_COMBINATIONS, ALL_NEGATIVE_TEXTS_COMBINATIONS, persist_y=True)(study.best_trial)
 
     if plot_study:  # should have checked previously if the visualization library is available
         path = Path(model_name) / "images"
@@ -1,4 +1,5 @@
 from enum import Enum
+from typing import List
 
 import torch
 
@@ -80,3 +81,42 @@ def classify(method: TopClassificationMethod, similarities, text_class, topK):
         return any(similarities, text_class, topK)
     else:
         raise ValueError(f"Unknown method: {method}")
+
+
+def classify_topks(
+    method: TopClassificationMethod, similarities, text_class, topKs: List[int]
+):
+    # same as `classify` for each top K, but sorting the texts similarity only once:
+    # the top K of each clip being the first K rows of the largest top K, each
+    # classification is derived from the cumulative sums of those rows
+    # returns: top K x visual
+
+    # make sure that the text classes is a tensor for further operations
+    text_class = torch.tensor(text_class)
+
+    # similarities: text x visual
+    # for each column (clip), get the texts similarity, sorted, of the largest top K
+    values, indices = similarities.topk(k=max(topKs), dim=0, sorted=True)
+
+    # map the indices to the text class
+    best_text_classes = text_class[indices]
+
+    # index of the row closing each top K
+    last_rows = torch.tensor(topKs) - 1
+
+    if method == TopClassificationMethod.mode:
+        # the positive text class is the mode when strictly more than half of the top K
+        # (on a tie, the mode is the smallest value: False)
+        positive_counts = best_text_classes.int().cumsum(dim=0)[last_rows]
+        return positive_counts * 2 > last_rows.unsqueeze(dim=1) + 1
+    elif method == TopClassificationMethod.max_sum:
+        positive_similarity_values_sum = (values * best_text_classes).cumsum(dim=0)
+        negative_similarity_values_sum = (values * ~best_text_classes).cumsum(dim=0)
+        return (
+            positive_similarity_values_sum[last_rows]
+            >= negative_similarity_values_sum[last_rows]
+        )
+    elif method == TopClassificationMethod.any:
+        return best_text_classes.int().cummax(dim=0).values[last_rows].bool()
+    else:
+        raise ValueError(f"Unknown method: {method}")
@@ -14,16 +14,24 @@ import torch
 from dash import Dash, Input, Output, State, dash_table, dcc, html
 
 from ilids.models.actionclip.factory import create_models_and_transforms
+from ilids.utils.persistence_method import (
+    FEATURES_FILE_EXTENSIONS,
+    find_pandas_persisted_file,
+    read_pandas,
+)
 
 SOURCE_PATH = Path(os.path.dirname(os.path.abspath(__file__)))
 
 FEATURES_COLUMNS_INDEXES = pd.RangeIndex.from_range(range(512))
 
-VARIATION_PATHS = list(
-    map(lambda result_file: Path(result_file), glob.glob(str(SOURCE_PATH / "*.pkl")))
-)
+VARIATION_PATHS = [
+    Path(result_file)
+    for extension in FEATURES_FILE_EXTENSIONS
+    for result_file in glob.glob(str(SOURCE_PATH / f"*{extension}"))
+]
+# the same variation might be persisted in different formats
 VARIATION_NAMES = sorted(
-    list(map(lambda result_path: result_path.stem, VARIATION_PATHS))
+    set(map(lambda result_path: result_path.stem, VARIATION_PATHS))
 )
 
 tp_fp_sequences_path = (
@@ -47,8 +55,8 @@ SEQUENCES_DF = SEQUENCES_DF.set_index("data/sequences/" + SEQUENCES_DF.index)
 
 
 def load_variation_df(movinet_variation):
-    pickle_file = SOURCE_PATH / f"{movinet_variation}.pkl"
-    features_df = pd.read_pickle(pickle_file)
+    features_file = find_pandas_persisted_file(SOURCE_PATH, movinet_variation)
+    features_df = read_pandas(features_file, columns=FEATURES_COLUMNS_INDEXES)
 
     df = SEQUENCES_DF.join(features_df)
 
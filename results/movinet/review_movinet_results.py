@@ -5,6 +5,7 @@ import http
 import io
 import math
 import os
+from dataclasses import dataclass
 from email.utils import formatdate
 from itertools import permutations
 from math import trunc
@@ -17,12 +18,21 @@ import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+import typer
 from dash import Dash, Input, Output, State, dcc, html
 from dash.exceptions import PreventUpdate
 from decord import VideoReader, cpu
 from flask import Flask
 from PIL import Image
-from sklearn.metrics import confusion_matrix, roc_auc_score, roc_curve
+from sklearn.metrics import roc_auc_score, roc_curve
+
+from ilids.utils.cache import file_cache_key, get_cache_dir, write_atomically
+from ilids.utils.metrics import ThresholdSweep, cost_curves
+from ilids.utils.persistence_method import (
+    FEATURES_FILE_EXTENSIONS,
+    find_pandas_persisted_file,
+    read_pandas,
+)
 
 SOURCE_PATH = Path(os.path.dirname(os.path.abspath(__file__)))
 
@@ -30,11 +40,14 @@ FEATURES_COLUMNS_INDEXES = pd.RangeIndex.from_range(range(600))
 
 RATES_PERMUTATIONS = list(permutations(["tpr", "fpr", "fnr", "tnr"], r=2))
 
-VARIATION_PATHS = list(
-    map(lambda result_file: Path(result_file), glob.glob(str(SOURCE_PATH / "*.pkl")))
-)
+VARIATION_PATHS = [
+    Path(result_file)
+    for extension in FEATURES_FILE_EXTENSIONS
+    for result_file in glob.glob(str(SOURCE_PATH / f"*{extension}"))
+]
+# the same variation might be persisted in different formats
 VARIATION_NAMES = sorted(
-    list(map(lambda result_path: result_path.stem, VARIATION_PATHS))
+    set(map(lambda result_path: result_path.stem, VARIATION_PATHS))
 )
 
 tp_fp_sequences_path = (
@@ -69,8 +82,8 @@ assert ILIDS_PATH.exists() and ILIDS_PATH.is_dir()
 
 
 def load_variation_df(movinet_variation):
-    pickle_file = SOURCE_PATH / f"{movinet_variation}.pkl"
-    features_df = pd.read_pickle(pickle_file)
+    features_file = find_pandas_persisted_file(SOURCE_PATH, movinet_variation)
+    features_df = read_pandas(features_file, columns=FEATURES_COLUMNS_INDEXES)
 
     # features = features_df[FEATURES_COLUMNS_INDEXES].to_numpy()
     # features_df[FEATURES_COLUMNS_INDEXES] = (features / np.linalg.norm(features, axis=-1, keepdims=True) * 100).tolist()
@@ -93,7 +106,7 @@ def get_predictions(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
 
 
 def get_rates_cost_df(movinet_variation: str) -> pd.DataFrame:
-    fpr, tpr, thresholds = ALL_ROC_CURVES[movinet_variation]
+    fpr, tpr, thresholds = get_variation_roc_curve(movinet_variation)
 
     rates = dict(tpr=tpr, fpr=fpr, fnr=(1 - tpr), tnr=(1 - fpr))
 
@@ -123,99 +136,176 @@ def get_rates_cost_df(movinet_variation: str) -> pd.DataFrame:
 
 
 def get_conf_matrix_with_threshold(
-    threshold: float, y_true: np.ndarray, df: pd.DataFrame
+    threshold: float, movinet_variation: str
 ) -> np.ndarray:
     # Imagine setting the prediction threshold to the actual threshold
-    y_pred = (df["Activation"] >= threshold).to_numpy(np.int32)
+    return get_variation_metrics(movinet_variation).threshold_sweep.confusion_matrices(
+        [threshold]
+    )[0]
 
-    TN, FP, FN, TP = confusion_matrix(y_true, y_pred).ravel()
 
-    conf_matrix = np.array([[TP, FN], [FP, TN]])
+def get_3d_cost_function(confusion_matrices) -> np.ndarray:
+    # Considering confusion matrix of the shape:
+    # [[TP, FN],  X  [[C(TP) = 0,     C(FN) = X],   = Cost(T)
+    #  [FP, TN]]      [C(FP) = 1 - X, c(TN) = 0]]
+    return cost_curves(confusion_matrices, COST_FN)
 
-    return conf_matrix
 
+REVIEW_CACHE_NAMESPACE = "movinet-review"
 
-def get_cost_matrix(cost_ratio: float) -> np.ndarray:
-    return np.array([[0, cost_ratio], [1 - cost_ratio, 0]])
+# the metrics of the whole variations are only kept for the last selected ones, while
+# the ROC curves of all of them (a few KB each) are shown at once by the rates grid
+VARIATION_METRICS_CACHE_SIZE = 4
+ROC_CURVES_CACHE_SIZE = 256
 
 
-def get_cost_function(cost_matrix, confusion_vector) -> np.ndarray:
-    nb_thresholds = int(len(confusion_vector) / 4)
+@dataclass
+class VariationMetrics:
+    """All the dashboard shows of a variation, built from its features by
+    `build_variation_metrics` and cached on disk"""
 
-    tiled_cost_vector = np.tile(cost_matrix.ravel(), nb_thresholds)
+    df: pd.DataFrame  # "Clip", "Alarm" and "Activation" of each sequence
+    roc_curve: Tuple[np.ndarray, np.ndarray, np.ndarray]  # fpr, tpr, thresholds
+    auc_score: float
+    cost_function_z: np.ndarray  # COST_FN x reversed thresholds
 
-    return (
-        np.multiply(confusion_vector, tiled_cost_vector)
-        .reshape((nb_thresholds, -1))
-        .sum(axis=1)
-    )
+    @functools.cached_property
+    def threshold_sweep(self) -> ThresholdSweep:
+        return ThresholdSweep(*get_predictions(self.df))
 
+    @functools.cached_property
+    def roc_curve_df(self) -> pd.DataFrame:
+        fpr, tpr, thresholds = self.roc_curve
+        return pd.DataFrame(
+            {"False Positive Rate": fpr, "True Positive Rate": tpr},
+            columns=pd.Index(
+                ["False Positive Rate", "True Positive Rate"], name="Rate"
+            ),
+            index=pd.Index(thresholds, name="Thresholds"),
+        )
 
-def get_confusion_vector(df, reversed_thresholds, y_true) -> np.ndarray:
-    return np.array(
-        [
-            get_conf_matrix_with_threshold(threshold, y_true, df)
-            for threshold in reversed_thresholds
-        ]
-    ).ravel()
 
+def build_variation_metrics(movinet_variation: str) -> VariationMetrics:
+    df = load_variation_df(movinet_variation)[["Clip", "Alarm", "Activation"]]
 
-def get_3d_cost_function(confusion_vector) -> np.ndarray:
-    # Considering confusion matrix of the shape:
-    # [[TP, FN],  X  [[C(TP) = 0,     C(FN) = X],   = Cost(T)
-    #  [FP, TN]]      [C(FP) = 1 - X, c(TN) = 0]]
+    predictions = get_predictions(df)
+    fpr, tpr, thresholds = roc_curve(*predictions)
 
-    z = np.array(
-        [
-            get_cost_function(get_cost_matrix(cost_ratio), confusion_vector)
-            for cost_ratio in COST_FN
-        ]
+    return VariationMetrics(
+        df=df,
+        roc_curve=(fpr, tpr, thresholds),
+        auc_score=roc_auc_score(*predictions),
+        cost_function_z=get_3d_cost_function(
+            ThresholdSweep(*predictions).confusion_matrices(thresholds[::-1])
+        ),
     )
 
-    return z
-
-
-ALL_DF = {
-    variation_name: load_variation_df(variation_name)
-    for variation_name in VARIATION_NAMES
-}
-ALL_PREDICTIONS = {
-    variation_name: get_predictions(ALL_DF[variation_name])
-    for variation_name in VARIATION_NAMES
-}
-ALL_ROC_CURVES = {
-    variation_name: roc_curve(*ALL_PREDICTIONS[variation_name])
-    for variation_name in VARIATION_NAMES
-}
-ALL_ROC_CURVES_DF = {
-    variation_name: pd.DataFrame(
-        {
-            "False Positive Rate": ALL_ROC_CURVES[variation_name][0],
-            "True Positive Rate": ALL_ROC_CURVES[variation_name][1],
-        },
-        columns=pd.Index(["False Positive Rate", "True Positive Rate"], name="Rate"),
-        index=pd.Index(ALL_ROC_CURVES[variation_name][2], name="Thresholds"),
-    )
-    for variation_name in VARIATION_NAMES
-}
-ALL_AUC_SCORES = {
-    variation_name: roc_auc_score(*ALL_PREDICTIONS[variation_name])
-    for variation_name in VARIATION_NAMES
-}
-ALL_CONFUSION_VECTOR_FOR_ALL_THRESHOLDS = {
-    variation_name: get_confusion_vector(
-        ALL_DF[variation_name],
-        ALL_ROC_CURVES[variation_name][2][::-1],
-        ALL_PREDICTIONS[variation_name][0],
+
+def get_variation_cache_key(movinet_variation: str) -> str:
+    # a new version of the features, of the sequences or of the cost ratios
+    # invalidates the cache
+    return file_cache_key(
+        find_pandas_persisted_file(SOURCE_PATH, movinet_variation),
+        file_cache_key(tp_fp_sequences_path),
+        N,
     )
-    for variation_name in VARIATION_NAMES
-}
-ALL_COST_FUNCTION_Z = {
-    variation_name: get_3d_cost_function(
-        ALL_CONFUSION_VECTOR_FOR_ALL_THRESHOLDS[variation_name],
+
+
+def get_variation_cache_path(movinet_variation: str) -> Path:
+    key = get_variation_cache_key(movinet_variation)
+    return get_cache_dir(REVIEW_CACHE_NAMESPACE) / f"{movinet_variation}-{key}.npz"
+
+
+def get_roc_curve_cache_path(movinet_variation: str) -> Path:
+    key = get_variation_cache_key(movinet_variation)
+    return get_cache_dir(REVIEW_CACHE_NAMESPACE) / f"{movinet_variation}-{key}-roc.npz"
+
+
+def save_variation_metrics(metrics: VariationMetrics, cache_path: Path):
+    fpr, tpr, thresholds = metrics.roc_curve
+
+    buffer = io.BytesIO()
+    np.savez(
+        buffer,
+        clips=metrics.df["Clip"].to_numpy(dtype=str),
+        alarm=metrics.df["Alarm"].to_numpy(),
+        activation=metrics.df["Activation"].to_numpy(),
+        fpr=fpr,
+        tpr=tpr,
+        thresholds=thresholds,
+        auc_score=metrics.auc_score,
+        cost_function_z=metrics.cost_function_z,
     )
-    for variation_name in VARIATION_NAMES
-}
+    write_atomically(cache_path, buffer.getvalue())
+
+
+def load_variation_metrics(cache_path: Path) -> VariationMetrics:
+    with np.load(cache_path) as arrays:
+        clips = arrays["clips"]
+        return VariationMetrics(
+            df=pd.DataFrame(
+                {
+                    "Clip": clips,
+                    "Alarm": arrays["alarm"],
+                    "Activation": arrays["activation"],
+                },
+                index=clips,
+            ),
+            roc_curve=(arrays["fpr"], arrays["tpr"], arrays["thresholds"]),
+            auc_score=float(arrays["auc_score"]),
+            cost_function_z=arrays["cost_function_z"],
+        )
+
+
+def save_roc_curve(
+    roc_curve: Tuple[np.ndarray, np.ndarray, np.ndarray], cache_path: Path
+):
+    fpr, tpr, thresholds = roc_curve
+
+    buffer = io.BytesIO()
+    np.savez(buffer, fpr=fpr, tpr=tpr, thresholds=thresholds)
+    write_atomically(cache_path, buffer.getvalue())
+
+
+def load_roc_curve(cache_path: Path) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    with np.load(cache_path) as arrays:
+        return arrays["fpr"], arrays["tpr"], arrays["thresholds"]
+
+
+def load_or_build_variation_metrics(movinet_variation: str) -> VariationMetrics:
+    """Metrics of the variation, from the cache if already built (see `--build`),
+    otherwise built and cached, along with its ROC curve"""
+    cache_path = get_variation_cache_path(movinet_variation)
+    if cache_path.exists():
+        return load_variation_metrics(cache_path)
+
+    metrics = build_variation_metrics(movinet_variation)
+    save_variation_metrics(metrics, cache_path)
+    save_roc_curve(metrics.roc_curve, get_roc_curve_cache_path(movinet_variation))
+
+    return metrics
+
+
+@functools.lru_cache(maxsize=VARIATION_METRICS_CACHE_SIZE)
+def get_variation_metrics(movinet_variation: str) -> VariationMetrics:
+    """Metrics of the variation, loaded on its selection"""
+    return load_or_build_variation_metrics(movinet_variation)
+
+
+@functools.lru_cache(maxsize=ROC_CURVES_CACHE_SIZE)
+def get_variation_roc_curve(
+    movinet_variation: str,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """ROC curve of the variation, without loading its other metrics once cached"""
+    cache_path = get_roc_curve_cache_path(movinet_variation)
+    if cache_path.exists():
+        return load_roc_curve(cache_path)
+
+    roc_curve = load_or_build_variation_metrics(movinet_variation).roc_curve
+    save_roc_curve(roc_curve, cache_path)
+
+    return roc_curve
+
 
 COST_LHS = 0.9
 COST_RHS = 1.0 - COST_LHS
@@ -311,33 +401,10 @@ def get_clip_middle_frame(image_name: str):
 app = Dash(server=flask_app, name=__name__)
 
 
-expanded_rates_df = pd.concat(
-    [get_rates_cost_df(movinet_variation) for movinet_variation in VARIATION_NAMES]
-)
-
-
 app.layout = html.Div(
     children=[
         html.H1("Without normalized features!"),
-        grid_facet_rate_costs_graph := dcc.Graph(
-            id="grid-facet-rate-costs-graph",
-            figure=px.line(
-                expanded_rates_df,
-                x="x",
-                y="y",
-                facet_row="rate1",
-                facet_col="rate2",
-                color="variation",
-                log_x=True,
-                category_orders={
-                    "rate1": ["tpr", "fnr", "fpr", "tnr"],
-                    "rate2": ["tpr", "fnr", "fpr", "tnr"],
-                },
-                # height=1000,
-                height=500,
-                # height=60,
-            ),
-        ),
+        grid_facet_rate_costs_graph := dcc.Graph(id="grid-facet-rate-costs-graph"),
         variation_items := dcc.RadioItems(
             id="variation-items",
             options=VARIATION_NAMES,
@@ -397,10 +464,36 @@ app.layout = html.Div(
 )
 
 
+@app.callback(
+    Output(grid_facet_rate_costs_graph, "figure"), Input(variation_items, "options")
+)
+def get_grid_facet_rate_costs(variation_names: List[str]) -> go.Figure:
+    expanded_rates_df = pd.concat(
+        [get_rates_cost_df(movinet_variation) for movinet_variation in variation_names]
+    )
+
+    return px.line(
+        expanded_rates_df,
+        x="x",
+        y="y",
+        facet_row="rate1",
+        facet_col="rate2",
+        color="variation",
+        log_x=True,
+        category_orders={
+            "rate1": ["tpr", "fnr", "fpr", "tnr"],
+            "rate2": ["tpr", "fnr", "fpr", "tnr"],
+        },
+        # height=1000,
+        height=500,
+        # height=60,
+    )
+
+
 @app.callback(Output(histo_graph, "figure"), Input(variation_items, "value"))
 def get_histogram_by_thresholds(movinet_variation: str) -> go.Figure:
     return px.histogram(
-        ALL_DF[movinet_variation],
+        get_variation_metrics(movinet_variation).df,
         x="Activation",
         color="Alarm",
         marginal="rug",
@@ -412,7 +505,7 @@ def get_histogram_by_thresholds(movinet_variation: str) -> go.Figure:
 @app.callback(Output(rates_graph, "figure"), Input(variation_items, "value"))
 def get_true_false_rates(movinet_variation: str) -> go.Figure:
     return px.line(
-        ALL_ROC_CURVES_DF[movinet_variation],
+        get_variation_metrics(movinet_variation).roc_curve_df,
         title="TPR and FPR at every threshold",
         log_x=True,
     )
@@ -421,10 +514,10 @@ def get_true_false_rates(movinet_variation: str) -> go.Figure:
 @app.callback(Output(roc_graph, "figure"), Input(variation_items, "value"))
 def get_roc(movinet_variation: str) -> go.Figure:
     return px.line(
-        ALL_ROC_CURVES_DF[movinet_variation],
+        get_variation_metrics(movinet_variation).roc_curve_df,
         x="False Positive Rate",
         y="True Positive Rate",
-        title=f"{movinet_variation} - AUC: {ALL_AUC_SCORES[movinet_variation]:.3f}",
+        title=f"{movinet_variation} - AUC: {get_variation_metrics(movinet_variation).auc_score:.3f}",
         color_discrete_sequence=["orange"],
         range_x=[0, 1],
         range_y=[0, 1],
@@ -449,12 +542,10 @@ def preview_fn_on_roc_hover(
     point_idx = point["pointIndex"]
 
     # get all TN from -Inf to threshold[idx]
-    threshold = ALL_ROC_CURVES[variation_name][2][point_idx]
+    metrics = get_variation_metrics(variation_name)
+    threshold = metrics.roc_curve[2][point_idx]
 
-    FN_df = ALL_DF[variation_name][
-        (threshold > ALL_DF[variation_name]["Activation"])
-        & ALL_DF[variation_name]["Alarm"]
-    ]
+    FN_df = metrics.df[(threshold > metrics.df["Activation"]) & metrics.df["Alarm"]]
 
     def _get_fn_div(clip_name: str) -> html.Div:
         return html.Div(
@@ -466,7 +557,7 @@ def preview_fn_on_roc_hover(
 
     return [
         html.H4(
-            f"FN clips at this rate: {len(FN_df)}/{len(ALL_DF[variation_name])} with threshold: {threshold:.2f} on {variation_name}"
+            f"FN clips at this rate: {len(FN_df)}/{len(metrics.df)} with threshold: {threshold:.2f} on {variation_name}"
         ),
         html.Div(
             [
@@ -493,13 +584,15 @@ def preview_fn_on_roc_hover(
 def get_elementwise_cost_function(
     movinet_variation: str, cost_ratio_idx: int
 ) -> go.Figure:
-    reversed_thresholds = ALL_ROC_CURVES[movinet_variation][2][::-1]
+    reversed_thresholds = get_variation_metrics(movinet_variation).roc_curve[2][::-1]
 
     fig = go.Figure()
 
     cost_ratio = COST_FN[cost_ratio_idx]
 
-    cost_function_y = ALL_COST_FUNCTION_Z[movinet_variation][cost_ratio_idx]
+    cost_function_y = get_variation_metrics(movinet_variation).cost_function_z[
+        cost_ratio_idx
+    ]
     fig.add_trace(
         go.Scatter(
             x=reversed_thresholds,
@@ -543,11 +636,11 @@ def get_elementwise_cost_function(
     Input(variation_items, "value"),
 )
 def get_elementwise_3d_cost_function(movinet_variation: str) -> go.Figure:
-    reversed_thresholds = ALL_ROC_CURVES[movinet_variation][2][::-1]
+    reversed_thresholds = get_variation_metrics(movinet_variation).roc_curve[2][::-1]
 
     fig = go.Figure()
 
-    z = ALL_COST_FUNCTION_Z[movinet_variation]
+    z = get_variation_metrics(movinet_variation).cost_function_z
 
     y_vals = list(range(len(COST_FN)))
     fig.add_trace(
@@ -614,10 +707,9 @@ def display_cost_function_confusion_matrix(
     cost = point["y"]
     threshold = point["x"]
 
-    df = ALL_DF[movinet_variation]
-    y_true = ALL_PREDICTIONS[movinet_variation][0]
-
-    confusion_matrix_population = get_conf_matrix_with_threshold(threshold, y_true, df)
+    confusion_matrix_population = get_conf_matrix_with_threshold(
+        threshold, movinet_variation
+    )
     TP, FN, FP, TN = confusion_matrix_population.ravel()
 
     Z = [[FP, TN], [TP, FN]]
@@ -692,10 +784,9 @@ def display_cost_function_confusion_matrix_from_contour(
     threshold = point["x"]
     cost = point["z"] if "z" in point else point["customdata"][0]
 
-    df = ALL_DF[movinet_variation]
-    y_true = ALL_PREDICTIONS[movinet_variation][0]
-
-    confusion_matrix_population = get_conf_matrix_with_threshold(threshold, y_true, df)
+    confusion_matrix_population = get_conf_matrix_with_threshold(
+        threshold, movinet_variation
+    )
     TP, FN, FP, TN = confusion_matrix_population.ravel()
 
     Z = [[FP, TN], [TP, FN]]
@@ -752,5 +843,24 @@ def display_cost_function_confusion_matrix_from_contour(
     return fig
 
 
-if __name__ == "__main__":
+def main(
+    build: bool = typer.Option(
+        False,
+        "--build",
+        help="Only build the missing caches of the metrics of all the variations",
+    )
+):
+    if build:
+        for movinet_variation in VARIATION_NAMES:
+            if not get_variation_cache_path(movinet_variation).exists():
+                print(f"Building the metrics of {movinet_variation}")
+                load_or_build_variation_metrics(movinet_variation)
+            # the ROC curve of a variation built before it was cached on its own
+            get_variation_roc_curve(movinet_variation)
+        return
+
     app.run_server(debug=True)
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -0,0 +1,93 @@
+import statistics
+import subprocess
+import sys
+from time import perf_counter
+from typing import Iterator, List, Tuple
+
+import click
+import typer
+
+# Invoke the CLI like the `ilids_cmd` entry point would, the arguments being given after
+# the "-c" code
+ILIDS_CMD_CODE = "from ilids.commands import typer_app; typer_app()"
+
+HEAVY_MODULES = ["torch", "pytorch_lightning", "open_clip", "towhee", "decord"]
+
+
+def _list_commands(
+    command: click.Command, path: Tuple[str, ...] = ()
+) -> Iterator[Tuple[str, ...]]:
+    """Path to all the leaf commands of the CLI"""
+    if not isinstance(command, click.Group):
+        yield path
+        return
+
+    for name, sub_command in command.commands.items():
+        yield from _list_commands(sub_command, (*path, name))
+
+
+def _time_command(args: List[str], repeat: int) -> List[float]:
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        subprocess.run(
+            args, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        timings.append(perf_counter() - start)
+
+    return timings
+
+
+def _loaded_heavy_modules(command_path: Tuple[str, ...]) -> List[str]:
+    """Heavy modules imported once the CLI resolved the given command (without running
+    it, only printing its help)"""
+    code = (
+        "import sys\n"
+        "from ilids.commands import typer_app\n"
+        "try:\n"
+        "    typer_app()\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code, *command_path, "--help"],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+
+    last_line = output.strip().splitlines()[-1] if output.strip() else ""
+    return [module for module in last_line.split(",") if module in HEAVY_MODULES]
+
+
+def main(
+    repeat: int = typer.Option(5, "--repeat", "-n", help="Runs per sub-command"),
+):
+    """Measure the start-up time of each `ilids_cmd` sub-command (printing its help), on
+    top of the bare Python interpreter start-up."""
+    from ilids.commands import typer_app
+
+    python_timings = _time_command([sys.executable, "-c", "pass"], repeat)
+    python_median = statistics.median(python_timings)
+
+    print(f"Python interpreter start-up: {python_median * 1000:.0f} ms (median)")
+    print()
+    print(f"{'sub-command':<45} {'median (ms)':>12} {'min (ms)':>10}  heavy modules")
+
+    for command_path in _list_commands(typer.main.get_command(typer_app)):
+        timings = _time_command(
+            [sys.executable, "-c", ILIDS_CMD_CODE, *command_path, "--help"], repeat
+        )
+        heavy_modules = _loaded_heavy_modules(command_path)
+
+        print(
+            f"{' '.join(command_path):<45} "
+            f"{(statistics.median(timings) - python_median) * 1000:>12.0f} "
+            f"{(min(timings) - python_median) * 1000:>10.0f}  "
+            f"{', '.join(heavy_modules) or '-'}"
+        )
+
+
+if __name__ == "__main__":
+    typer.run(main)
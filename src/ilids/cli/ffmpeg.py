@@ -1,9 +1,12 @@
+import dataclasses
 import logging
+import math
 import subprocess
 from pathlib import Path
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
-from ilids.utils.ffmpeg_tqdm import analyze_stream, ffmpeg_to_tqdm
+from ilids.cli.ffprobe import get_duration
+from ilids.utils.ffmpeg_tqdm import ffmpeg_to_tqdm
 
 
 def _ffmpeg_select(frames_sequence: List[int]) -> str:
@@ -29,6 +32,53 @@ def _ffmpeg_select(frames_sequence: List[int]) -> str:
     return eq_chain
 
 
+@dataclasses.dataclass(frozen=True)
+class FramesWindow:
+    """Window of `total_frames` frames of an input video starting at its frame `start_frame`,
+    of which every `stride` frame is kept, as well as the last frame of the window."""
+
+    start_frame: int
+    total_frames: int
+    stride: int
+
+    @property
+    def last_frame(self) -> int:
+        return self.start_frame + self.total_frames - 1
+
+    def frames_sequence(self) -> List[int]:
+        """Indexes, in the input video, of the frames kept from the window"""
+        return list(range(self.start_frame, self.last_frame + 1, self.stride)) + (
+            [] if (self.total_frames - 1) % self.stride == 0 else [self.last_frame]
+        )
+
+    def __len__(self) -> int:
+        return math.ceil(self.total_frames / self.stride) + (
+            0 if (self.total_frames - 1) % self.stride == 0 else 1
+        )
+
+
+def _ffmpeg_select_window(window: FramesWindow, first_decoded_frame: int) -> str:
+    """Produce a "select" expression keeping the frames of the window, independently of its
+    length, unlike `_ffmpeg_select` which has a term for each frame.
+
+    :param first_decoded_frame: index, in the input video, of the first frame decoded by ffmpeg
+                                after having seeked (`n` restarts at 0 after a seek)
+    """
+    first = window.start_frame - first_decoded_frame
+    last = window.last_frame - first_decoded_frame
+
+    # between(n\\,0\\,61)*not(mod(n-0\\,12))+eq(n\\,61)
+    return f"between(n\\,{first}\\,{last})*not(mod(n-{first}\\,{window.stride}))+eq(n\\,{last})"
+
+
+def _ffmpeg_seek(frame: int, fps: float) -> str:
+    # seek half a frame before the wished frame, for the first decoded frame to be exactly
+    # the wished one, whatever the rounding of the timestamps.
+    # As an input option, ffmpeg jumps to the closest keyframe before the position and
+    # only decodes (and drops) the frames up to the position
+    return f"{max(0.0, (frame - 0.5) / fps):.6f}"
+
+
 def _ffmpeg_setpts(fps: int) -> str:
     # change the 'setpts' filter to correct the new time base of the extracted frames
     # References:
@@ -37,6 +87,22 @@ def _ffmpeg_setpts(fps: int) -> str:
     return f"N/({fps}*TB)"
 
 
+def _get_duration_or_0(logger: logging.Logger, input_video_path: Path) -> float:
+    # the duration is only used to display the progress, therefore, in case the input
+    # can't be probed, let ffmpeg report the actual issue
+    try:
+        return get_duration(input_video_path)
+    except Exception as e:
+        logger.debug(f"Couldn't get the duration of {str(input_video_path)}: {e}")
+        return 0
+
+
+def _ffmpeg_scale(new_short_side: int) -> str:
+    # scale the shortest side to `new_short_side` and keep the aspect ratio, while making sure
+    # the other side stays divisible by 2 (required by most encoders)
+    return f"scale='if(gt(a,1),trunc(oh*a/2)*2,{new_short_side})':'if(gt(a,1),{new_short_side},trunc(ow*a/2)*2)'"
+
+
 # Adapted from CLIP4Clip: https://github.com/ArrowLuo/CLIP4Clip/blob/master/preprocess/compress_video.py
 # but don't change the frame rate as be which to have different frame selection strategies
 # use ffmpeg_to_tqdm helper
@@ -51,14 +117,14 @@ def ffmpeg_scale_compress(
     logger = logging.getLogger(f"ffmpeg-{str(output_video_path)}")
     logger.debug("Using ffmpeg to scale and compress and extract sub sequence")
 
-    stream_info = analyze_stream(logger, str(input_video_path))
+    duration = _get_duration_or_0(logger, input_video_path)
 
     # to avoid carriage return ('\r') in ffmpeg output, to mess with the reading of the
     # progress, use 'universal_newlines' argument
     # https://github.com/chriskiehl/Gooey/issues/495#issuecomment-614991802
     ffmpeg_process = subprocess.Popen(
         f"ffmpeg -i {str(input_video_path)} "
-        f"-vf \"scale='if(gt(a,1),trunc(oh*a/2)*2,{new_short_side})':'if(gt(a,1),{new_short_side},trunc(ow*a/2)*2)'\" "
+        f'-vf "{_ffmpeg_scale(new_short_side)}" '
         f"-map 0:v "
         # -vcodec
         #       get list of codecs with ffmpeg -codecs
@@ -74,7 +140,7 @@ def ffmpeg_scale_compress(
     ffmpeg_to_tqdm(
         logger,
         ffmpeg_process,
-        duration=stream_info.get("duration", 0),
+        duration=duration,
         tqdm_desc=f"FFMPEG scale down to {new_short_side} and encode with {video_codec}",
         tqdm_position=tqdm_position,
     )
@@ -89,8 +155,8 @@ def ffmpeg_scale_compress(
 def scale_compress_select_sequence(
     input_video_path: Path,
     output_video_path: Path,
-    frames_sequence: List[int],
-    fps: int,
+    frames_window: FramesWindow,
+    fps: float,
     overwrite: bool = False,
     new_short_side: int = 224,
     video_codec: str = "libx264",
@@ -98,20 +164,24 @@ def scale_compress_select_sequence(
     logger = logging.getLogger(f"ffmpeg-{str(output_video_path)}")
     logger.debug("Using ffmpeg to scale and compress and extract sub sequence")
 
-    stream_info = analyze_stream(logger, str(input_video_path))
+    duration = _get_duration_or_0(logger, input_video_path)
 
     # to avoid carriage return ('\r') in ffmpeg output, to mess with the reading of the
     # progress, use 'universal_newlines' argument
     # https://github.com/chriskiehl/Gooey/issues/495#issuecomment-614991802
     ffmpeg_process = subprocess.Popen(
+        # -ss
+        #       as input option, seeks in the input file to position, therefore, only
+        #       the frames of the window are decoded
         # -frames:v
         #       -frames[:stream_specifier] framecount (output,per-stream)
         #           Stop writing to the stream after framecount frames.
         # -vcodec
         #       get list of codecs with ffmpeg -codecs
-        f"ffmpeg -i {str(input_video_path)} "
-        f"-frames:v {len(frames_sequence)} "
-        f"-vf \"select={_ffmpeg_select(frames_sequence)},setpts={_ffmpeg_setpts(fps)},scale='if(gt(a,1),trunc(oh*a/2)*2,{new_short_side})':'if(gt(a,1),{new_short_side},trunc(ow*a/2)*2)'\" "
+        f"ffmpeg -ss {_ffmpeg_seek(frames_window.start_frame, fps)} "
+        f"-i {str(input_video_path)} "
+        f"-frames:v {len(frames_window)} "
+        f'-vf "select={_ffmpeg_select_window(frames_window, frames_window.start_frame)},setpts={_ffmpeg_setpts(math.ceil(fps))},{_ffmpeg_scale(new_short_side)}" '
         f"-map 0:v "
         f"-vcodec {video_codec} "
         f"{'-y' if overwrite else ''} "
@@ -125,10 +195,118 @@ def scale_compress_select_sequence(
     ffmpeg_to_tqdm(
         logger,
         ffmpeg_process,
-        duration=stream_info.get("duration"),
+        duration=duration,
         tqdm_desc=f"FFMPEG scale down to {new_short_side}, select frames and encode with {video_codec}",
     )
 
     ffmpeg_process.wait()
 
     return ffmpeg_process.returncode
+
+
+def _ffmpeg_split_select_filter_complex(
+    frames_windows: List[FramesWindow],
+    first_decoded_frame: int,
+    fps: int,
+    new_short_side: int,
+) -> str:
+    """Produce a "filter_complex" graph which splits the decoded input stream in as many
+    branches as there are sequences to extract, each branch selecting its own frames.
+
+    Example for 2 sequences:
+        [0:v]split=2[in0][in1];
+        [in0]select=between(n\\,0\\,61)*...,setpts=...,scale=...[out0];
+        [in1]select=between(n\\,600\\,661)*...,setpts=...,scale=...[out1]
+    """
+    split = f"[0:v]split={len(frames_windows)}" + "".join(
+        f"[in{i}]" for i in range(len(frames_windows))
+    )
+
+    branches = [
+        f"[in{i}]select={_ffmpeg_select_window(frames_window, first_decoded_frame)},setpts={_ffmpeg_setpts(fps)},{_ffmpeg_scale(new_short_side)}[out{i}]"
+        for i, frames_window in enumerate(frames_windows)
+    ]
+
+    return ";".join([split, *branches])
+
+
+# Same as above, but for multiple sequences of the same input video: the input video is
+# only decoded once, and every sequence is cut, scaled and encoded in the same pass
+def scale_compress_select_sequences(
+    input_video_path: Path,
+    sequences: List[Tuple[Path, FramesWindow]],
+    fps: float,
+    overwrite: bool = False,
+    new_short_side: int = 224,
+    video_codec: str = "libx264",
+    tqdm_position: Optional[int] = None,
+) -> int:
+    """
+    :param sequences: list of tuples (output_video_path, frames_window), each output
+                      video will contain the frames of its window of the input video.
+    """
+    logger = logging.getLogger(f"ffmpeg-{str(input_video_path)}")
+    logger.debug(
+        f"Using ffmpeg to scale and compress and extract {len(sequences)} sub sequences"
+    )
+
+    duration = _get_duration_or_0(logger, input_video_path)
+
+    # only decode from the first window of the input video
+    first_decoded_frame = min(
+        frames_window.start_frame for _, frames_window in sequences
+    )
+
+    filter_complex = _ffmpeg_split_select_filter_complex(
+        [frames_window for _, frames_window in sequences],
+        first_decoded_frame,
+        math.ceil(fps),
+        new_short_side,
+    )
+
+    # as the filter graph can be quite long, don't rely on the shell to split the
+    # arguments of the command
+    command = [
+        "ffmpeg",
+        *(["-y"] if overwrite else []),
+        "-ss",
+        _ffmpeg_seek(first_decoded_frame, fps),
+        "-i",
+        str(input_video_path),
+        "-filter_complex",
+        filter_complex,
+    ]
+    for i, (output_video_path, frames_window) in enumerate(sequences):
+        # -frames:v
+        #       Stop writing to the output stream after framecount frames. Once all
+        #       outputs got their frames, ffmpeg stops decoding the input.
+        command.extend(
+            [
+                "-map",
+                f"[out{i}]",
+                "-frames:v",
+                str(len(frames_window)),
+                "-vcodec",
+                video_codec,
+                str(output_video_path),
+            ]
+        )
+
+    ffmpeg_process = subprocess.Popen(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        universal_newlines=True,
+    )
+
+    ffmpeg_to_tqdm(
+        logger,
+        ffmpeg_process,
+        duration=duration,
+        tqdm_desc=f"FFMPEG scale down to {new_short_side}, select frames of {len(sequences)} sequences and encode with {video_codec}",
+        tqdm_position=tqdm_position,
+    )
+
+    ffmpeg_process.wait()
+
+    return ffmpeg_process.returncode
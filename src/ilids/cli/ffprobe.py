@@ -1,8 +1,12 @@
+import json
 import os
 import subprocess
 from pathlib import Path
 
 from ilids.datamodels import FfprobeVideo
+from ilids.utils.cache import file_cache_key, get_cache_dir, write_atomically
+
+FFPROBE_CACHE_NAMESPACE = "ffprobe"
 
 
 # add information from ffprobe (inspiration: https://gist.github.com/nrk/2286511)
@@ -33,7 +37,30 @@ def _get_stream_info_with_ffprobe(video_path: Path) -> str:
     return stdout.decode()
 
 
-def get_stream_info(video_path: Path) -> FfprobeVideo:
+def get_raw_stream_info(video_path: Path) -> str:
+    """Same as `_get_stream_info_with_ffprobe`, but the json is persisted on disk, for
+    ffprobe to only run once for each version (path, modification time and size) of a file
+    """
+    cache_file = (
+        get_cache_dir(FFPROBE_CACHE_NAMESPACE) / f"{file_cache_key(video_path)}.json"
+    )
+
+    if cache_file.exists():
+        return cache_file.read_text()
+
     raw_json = _get_stream_info_with_ffprobe(video_path)
 
+    write_atomically(cache_file, raw_json.encode())
+
+    return raw_json
+
+
+def get_stream_info(video_path: Path) -> FfprobeVideo:
+    raw_json = get_raw_stream_info(video_path)
+
     return FfprobeVideo.parse_raw(raw_json)
+
+
+def get_duration(video_path: Path) -> float:
+    """Duration in seconds of the video, without parsing the whole ffprobe output"""
+    return float(json.loads(get_raw_stream_info(video_path))["format"]["duration"])
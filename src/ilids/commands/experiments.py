@@ -1,63 +1,122 @@
-from enum import Enum
+import contextlib
+import shutil
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Set, Tuple
 
+import pandas as pd
 import typer
 from joblib import cpu_count
-from pytorch_lightning import seed_everything
-from torch.utils.data import DataLoader
 
-from ilids.experiments.actionclip import extract_actionclip_sequences_features
-from ilids.experiments.movinet import extract_movinet_features
 from ilids.models.actionclip.constants import (
     get_base_model_name_from_ckpt_path,
     get_input_frames_from_ckpt_path,
 )
-from ilids.models.actionclip.datasets import ActionDataset
-from ilids.models.actionclip.factory import create_models_and_transforms
-from ilids.models.actionclip.transform import get_augmentation
-from ilids.synchronization.alternate_device import DeviceType, alternate_device
-from ilids.towhee_utils.override.movinet import MovinetModelName
+from ilids.synchronization.device_type import DeviceType
+from ilids.towhee_utils.override.movinet_config import MovinetModelName
+from ilids.utils.cache import file_cache_key
+from ilids.utils.features_shards import FeaturesShardsWriter, ShardsMetadataMismatch
 from ilids.utils.notify import notify_context
-from ilids.utils.persistence_method import (
-    CsvPandasPersistenceMethod,
-    PicklePandasPersistenceMethod,
-)
+from ilids.utils.persistence_method import get_pandas_persistence_method, read_pandas
+
+if TYPE_CHECKING:
+    import torch
 
 typer_app = typer.Typer()
 
+# The ML dependencies (torch, pytorch_lightning, open_clip, towhee, decord) are only
+# imported by the commands using them: it takes seconds, and importing this module is
+# required by any `ilids_cmd` call.
 
-class PersistenceMethodSource(str, Enum):
-    pandas = "pandas"
-    numpy = "numpy"
-    torch = "torch"
 
+def _check_features_output_path(
+    features_output_path: Path, overwrite: bool, incremental: bool
+):
+    if not overwrite and not incremental and features_output_path.exists():
+        raise ValueError(
+            f"Use -f option to overwrite the existing output: {str(features_output_path)}"
+        )
 
-class PersistenceMethod(str, Enum):
-    csv = "csv"
-    pickle = "pickle"
-    torch = "torch"
+    assert features_output_path.parent.exists()
+    assert features_output_path.parent.is_dir()
 
-    @classmethod
-    def get_from_extension(cls, output: Path) -> "PersistenceMethod":
-        suffix = output.suffix
-        if suffix == ".csv":
-            return PersistenceMethod.csv
-        if suffix == ".pkl":
-            return PersistenceMethod.pickle
-        if suffix == ".pt":
-            return PersistenceMethod.torch
 
-        raise NotImplementedError(f"No implemented method for extension {suffix}")
+@contextlib.contextmanager
+def _resumable_features(
+    features_output_path: Path,
+    incremental: bool,
+    resume: bool,
+    flush_every: int,
+    metadata: Dict[str, Any],
+    index_name: Optional[str] = None,
+) -> Iterator[Tuple[FeaturesShardsWriter, Set[str]]]:
+    """
+    Extraction of the features written as shards in `<output>.shards`, next to the
+    output, and only merged into the output once the extraction succeeded.
 
-    def get_persistence_impl(self, source: PersistenceMethodSource):
-        if source == PersistenceMethodSource.pandas:
-            if self == PersistenceMethod.csv:
-                return CsvPandasPersistenceMethod()
-            if self == PersistenceMethod.pickle:
-                return PicklePandasPersistenceMethod()
+    The shards of an interrupted run are only resumed by the same extraction, as
+    described by the `metadata` (model, options changing the features, ...).
 
-        raise NotImplementedError(f"No implement method for {source} and output {self}")
+    Yields the shards writer and the sequences to leave out: the ones already in the
+    shards of a previous, interrupted, run (when resuming) and the ones already in the
+    output (when incremental).
+    """
+    shards_folder = features_output_path.with_name(
+        f"{features_output_path.name}.shards"
+    )
+    if not resume:
+        shutil.rmtree(shards_folder, ignore_errors=True)
+
+    previous_features_df = None
+    if incremental and features_output_path.exists():
+        previous_features_df = read_pandas(features_output_path)
+
+    try:
+        features_writer = FeaturesShardsWriter(
+            shards_folder,
+            flush_every=flush_every,
+            index_name=index_name,
+            metadata=metadata,
+        )
+    except ShardsMetadataMismatch as e:
+        raise ShardsMetadataMismatch(
+            f"{e}. Use --restart to start the extraction over"
+        ) from e
+
+    with features_writer:
+        extracted_sequences = features_writer.extracted_paths()
+        if len(extracted_sequences) > 0:
+            print(f"Resuming: {len(extracted_sequences)} sequences already extracted")
+
+        if previous_features_df is not None:
+            print(f"Incremental: {len(previous_features_df)} sequences in the output")
+            extracted_sequences |= set(previous_features_df.index)
+
+        yield features_writer, extracted_sequences
+
+    features_df = features_writer.read()
+    if previous_features_df is not None:
+        features_df = pd.concat([previous_features_df, features_df])
+
+    get_pandas_persistence_method(features_output_path).persist(
+        features_output_path, features_df
+    )
+
+    features_writer.remove()
+
+
+INCREMENTAL_OPTION = typer.Option(
+    False,
+    "--incremental",
+    help="Only extract the sequences missing from the existing output, and add them to it",
+)
+RESUME_OPTION = typer.Option(
+    True,
+    "--resume/--restart",
+    help="Resume an interrupted extraction from its shards, or start it over",
+)
+FLUSH_EVERY_OPTION = typer.Option(
+    10, "--flush-every", help="Write the extracted features every N batches"
+)
 
 
 @typer_app.command()
@@ -66,30 +125,249 @@ def movinet(
     input_glob: str,
     features_output_path: Path,
     overwrite: bool = typer.Option(False, "-f", "--force"),
+    incremental: bool = INCREMENTAL_OPTION,
+    resume: bool = RESUME_OPTION,
+    flush_every: int = FLUSH_EVERY_OPTION,
+    batch_size: int = typer.Option(
+        1, "-b", "--batch-size", help="Number of clips going through the model at once"
+    ),
     notify: bool = typer.Option(
         False, "--notify", help="notify using ML Notify by Aporia"
     ),
 ):
-    if not overwrite and features_output_path.exists():
-        raise ValueError(
-            f"Use -f option to overwrite the existing output: {str(features_output_path)}"
-        )
+    _check_features_output_path(features_output_path, overwrite, incremental)
 
-    assert features_output_path.parent.exists()
-    assert features_output_path.parent.is_dir()
+    from ilids.experiments.movinet import extract_movinet_features
 
-    with notify_context(enable=notify):
+    with notify_context(enable=notify), _resumable_features(
+        features_output_path,
+        incremental,
+        resume,
+        flush_every,
+        metadata={"model": model_name.value},
+        index_name="path",
+    ) as (features_writer, extracted_sequences):
         print(f"Starting features extract for {model_name}...")
-        features_df = extract_movinet_features(
+        extract_movinet_features(
             model_name,
             input_glob,
+            exclude_sequences=extracted_sequences,
+            features_writer=features_writer,
+            batch_size=batch_size,
         )
 
-        (
-            PersistenceMethod.get_from_extension(features_output_path)
-            .get_persistence_impl(PersistenceMethodSource.pandas)
-            .persist(features_output_path, features_df)
+
+@typer_app.command()
+def multi(
+    input_glob: str,
+    features_output_folder: Path = typer.Argument(..., file_okay=False),
+    model_names: List[MovinetModelName] = typer.Option(
+        MovinetModelName.list(), "-m", "--model", help="Model to extract features with"
+    ),
+    output_suffix: str = typer.Option(
+        ".pkl", "--suffix", help="Extension of the features file of each model"
+    ),
+    batch_size: int = typer.Option(
+        1, "-b", "--batch-size", help="Number of sequences decoded at once"
+    ),
+    overwrite: bool = typer.Option(False, "-f", "--force"),
+    notify: bool = typer.Option(
+        False, "--notify", help="notify using ML Notify by Aporia"
+    ),
+):
+    """Extract the features of several MoViNet models, decoding each sequence once, into
+    one file per model: <features_output_folder>/<model name><suffix>"""
+    features_output_paths = {
+        model_name: features_output_folder / f"{model_name.value}{output_suffix}"
+        for model_name in model_names
+    }
+    features_output_folder.mkdir(parents=True, exist_ok=True)
+    for features_output_path in features_output_paths.values():
+        _check_features_output_path(features_output_path, overwrite, incremental=False)
+
+    from ilids.experiments.movinet import extract_movinet_multi_features
+
+    with notify_context(enable=notify):
+        print(f"Starting features extract for {', '.join(model_names)}...")
+        features_dfs = extract_movinet_multi_features(
+            model_names, input_glob, batch_size=batch_size
+        )
+
+        for model_name, features_df in features_dfs.items():
+            features_output_path = features_output_paths[model_name]
+            get_pandas_persistence_method(features_output_path).persist(
+                features_output_path, features_df
+            )
+
+
+@typer_app.command()
+def movinet_stream(
+    model_name: MovinetModelName,
+    input_video: Path = typer.Argument(..., exists=True, dir_okay=False),
+    features_output_path: Path = typer.Argument(...),
+    chunk_frames: int = typer.Option(
+        16, "--chunk-frames", help="Number of frames going through the model at once"
+    ),
+    stride_frames: int = typer.Option(
+        64,
+        "--stride-frames",
+        help="Number of frames between two features (a multiple of --chunk-frames)",
+    ),
+    frame_step: int = typer.Option(1, "--frame-step", help="Keep one frame out of N"),
+    overwrite: bool = typer.Option(False, "-f", "--force"),
+    notify: bool = typer.Option(
+        False, "--notify", help="notify using ML Notify by Aporia"
+    ),
+):
+    """Stream a whole video through the causal MoViNet, extracting features every
+    --stride-frames, without cutting it into sequences"""
+    _check_features_output_path(features_output_path, overwrite, incremental=False)
+
+    from ilids.experiments.movinet import extract_movinet_stream_features
+
+    with notify_context(enable=notify):
+        print(f"Starting stream features extract for {model_name}...")
+        features_df = extract_movinet_stream_features(
+            model_name,
+            input_video,
+            chunk_frames=chunk_frames,
+            stride_frames=stride_frames,
+            frame_step=frame_step,
+        )
+
+        get_pandas_persistence_method(features_output_path).persist(
+            features_output_path, features_df
+        )
+
+
+def _load_actionclip_models(
+    model_pretrained_checkpoint: Path, device: "torch.device"
+) -> Tuple[Any, ...]:
+    """The models and transforms of the ActionCLIP checkpoint on the device, see
+    `create_models_and_transforms`"""
+    from ilids.models.actionclip.factory import create_models_and_transforms
+
+    return create_models_and_transforms(
+        actionclip_pretrained_ckpt=model_pretrained_checkpoint,
+        openai_model_name=get_base_model_name_from_ckpt_path(
+            model_pretrained_checkpoint
+        ),
+        extracted_frames=get_input_frames_from_ckpt_path(model_pretrained_checkpoint),
+        device=device,
+    )
+
+
+def _extract_actionclip_features(
+    model_pretrained_checkpoint: Path,
+    list_input_sequences_file_csv: Path,
+    device: "torch.device",
+    normalize_features: bool = False,
+    batch_size: int = 2 << 3,
+    loader_num_workers: Optional[int] = None,
+    frames_cache: bool = False,
+    tensor_transform: bool = False,
+    device_transform: bool = False,
+    exclude_sequences: Optional[Set[str]] = None,
+    features_writer: Optional[FeaturesShardsWriter] = None,
+    models: Optional[Tuple[Any, ...]] = None,
+) -> pd.DataFrame:
+    """Features of the sequences with the ActionCLIP checkpoint, see `actionclip`
+
+    Args:
+        models: the models of the checkpoint already loaded on the device (see
+            `_load_actionclip_models`), loaded otherwise.
+    """
+    from torch.utils.data import DataLoader
+
+    from ilids.experiments.actionclip import (
+        StageTimings,
+        extract_actionclip_sequences_features,
+    )
+    from ilids.models.actionclip.datasets import ActionDataset
+    from ilids.models.actionclip.datasets.frames_cache import PreprocessedFramesCache
+    from ilids.models.actionclip.transform import (
+        TensorGroupFromFrames,
+        get_augmentation,
+        get_device_augmentation,
+        get_normalize_augmentation,
+        get_tensor_augmentation,
+        get_tensor_normalize_augmentation,
+    )
+
+    frames_to_extract = get_input_frames_from_ckpt_path(model_pretrained_checkpoint)
+
+    model_image, model_text, fusion_model, preprocess_image = (
+        models
+        if models is not None
+        else _load_actionclip_models(model_pretrained_checkpoint, device)
+    )
+
+    device_augmentation = None
+    if device_transform:
+        # the DataLoader only yields the uint8 frames, transformed on the device
+        transform = TensorGroupFromFrames()
+        device_augmentation = get_device_augmentation(scale_crop=not frames_cache)
+    elif frames_cache:
+        # the cache already holds the frames scaled and cropped
+        transform = (
+            get_tensor_normalize_augmentation()
+            if tensor_transform
+            else get_normalize_augmentation()
         )
+    else:
+        transform = (
+            get_tensor_augmentation() if tensor_transform else get_augmentation()
+        )  # could also be replaced by preprocess_image
+
+    ilids_dataset = ActionDataset(
+        list_input_sequences_file_csv,
+        frames_to_extract=frames_to_extract,
+        transform=transform,
+        frames_cache=PreprocessedFramesCache() if frames_cache else None,
+        tensor_transform=tensor_transform or device_transform,
+        exclude_sequences=exclude_sequences,
+    )
+    loader_num_workers = loader_num_workers or cpu_count()
+    ilids_loader = DataLoader(
+        ilids_dataset,
+        batch_size=batch_size,
+        num_workers=loader_num_workers,
+        shuffle=False,
+        pin_memory=True,
+    )
+
+    timings = StageTimings()
+    features_df = extract_actionclip_sequences_features(
+        model_image,
+        fusion_model,
+        ilids_loader,
+        extracted_frames=frames_to_extract,
+        normalize_features=normalize_features,
+        device=device,
+        device_transform=device_augmentation,
+        timings=timings,
+        features_writer=features_writer,
+    )
+
+    print(f"Time per stage: {timings}")
+
+    return features_df
+
+
+def _actionclip_extraction_metadata(
+    model_pretrained_checkpoint: Path,
+    normalize_features: bool,
+    tensor_transform: bool,
+    device_transform: bool,
+) -> Dict[str, Any]:
+    """The checkpoint (and its version) along with the options changing the features"""
+    return {
+        "checkpoint": str(model_pretrained_checkpoint.resolve()),
+        "checkpoint_key": file_cache_key(model_pretrained_checkpoint),
+        "normalize": normalize_features,
+        "tensor_transform": tensor_transform,
+        "device_transform": device_transform,
+    }
 
 
 @typer_app.command()
@@ -109,68 +387,228 @@ def actionclip(
         None, "--sync-server-port", "--port", "-P"
     ),
     overwrite: bool = typer.Option(False, "-f", "--force"),
+    incremental: bool = INCREMENTAL_OPTION,
+    resume: bool = RESUME_OPTION,
+    flush_every: int = FLUSH_EVERY_OPTION,
     batch_size: int = typer.Option(2 << 3, "-b", "--batch-size"),
     seed: int = typer.Option(16896375, "--seed"),  # default to student number
     loader_num_workers: Optional[int] = typer.Option(
         None, "-w", "--workers", help="Number of workers for the Torch.DataLoader"
     ),
+    frames_cache: bool = typer.Option(
+        False,
+        "--frames-cache/--no-frames-cache",
+        help="Cache on disk the decoded, scaled and cropped frames of the sequences",
+    ),
+    tensor_transform: bool = typer.Option(
+        False,
+        "--tensor-transform/--pil-transform",
+        help="Transform all the frames of a sequence at once as a tensor, instead of "
+        "one PIL image at a time",
+    ),
+    device_transform: bool = typer.Option(
+        False,
+        "--device-transform",
+        help="Only load the uint8 frames of the sequences and transform them on the "
+        "device (requires all the sequences to have the same dimensions)",
+    ),
     notify: bool = typer.Option(
         False, "--notify", help="notify using ML Notify by Aporia"
     ),
 ):
-    seed_everything(seed)
+    from pytorch_lightning import seed_everything
 
-    if not overwrite and features_output_path.exists():
-        raise ValueError(
-            f"Use -f option to overwrite the existing output: {str(features_output_path)}"
-        )
+    from ilids.synchronization.alternate_device import alternate_device
 
-    assert features_output_path.parent.exists()
-    assert features_output_path.parent.is_dir()
+    seed_everything(seed)
 
-    openai_model_name = get_base_model_name_from_ckpt_path(model_pretrained_checkpoint)
-    frames_to_extract = get_input_frames_from_ckpt_path(model_pretrained_checkpoint)
+    _check_features_output_path(features_output_path, overwrite, incremental)
 
     with notify_context(enable=notify), alternate_device(
         device_type, distributed, sync_server_host, sync_server_port
-    ) as device:
+    ) as device, _resumable_features(
+        features_output_path,
+        incremental,
+        resume,
+        flush_every,
+        metadata=_actionclip_extraction_metadata(
+            model_pretrained_checkpoint,
+            normalize_features=normalize_features,
+            tensor_transform=tensor_transform,
+            device_transform=device_transform,
+        ),
+    ) as (
+        features_writer,
+        extracted_sequences,
+    ):
         print(f"Starting features extract for {model_pretrained_checkpoint}...")
 
-        (
-            model_image,
-            model_text,
-            fusion_model,
-            preprocess_image,
-        ) = create_models_and_transforms(
-            actionclip_pretrained_ckpt=model_pretrained_checkpoint,
-            openai_model_name=openai_model_name,
-            extracted_frames=frames_to_extract,
-            device=device,
-        )
-
-        ilids_dataset = ActionDataset(
+        _extract_actionclip_features(
+            model_pretrained_checkpoint,
             list_input_sequences_file_csv,
-            frames_to_extract=frames_to_extract,
-            transform=get_augmentation(),  # could also be replaced by preprocess_image
-        )
-        loader_num_workers = loader_num_workers or cpu_count()
-        ilids_loader = DataLoader(
-            ilids_dataset,
+            device,
+            normalize_features=normalize_features,
             batch_size=batch_size,
-            num_workers=loader_num_workers,
-            shuffle=False,
-            pin_memory=True,
+            loader_num_workers=loader_num_workers,
+            frames_cache=frames_cache,
+            tensor_transform=tensor_transform,
+            device_transform=device_transform,
+            exclude_sequences=extracted_sequences,
+            features_writer=features_writer,
         )
 
-        features_df = extract_actionclip_sequences_features(
-            model_image,
-            fusion_model,
-            ilids_loader,
-            extracted_frames=frames_to_extract,
-            normalize_features=normalize_features,
-            device=device,
+
+def _queue_features_output_path(
+    features_output_folder: Path, model: str, output_suffix: str
+) -> Path:
+    # MoViNet model name, or ActionCLIP checkpoint file
+    return features_output_folder / f"{Path(model).stem}{output_suffix}"
+
+
+@typer_app.command()
+def queue_serve(
+    list_input_sequences_file_csv: Path = typer.Argument(
+        ..., help="CSV file expecting at least the columns: 'sequence', 'frame_count'"
+    ),
+    features_output_folder: Path = typer.Argument(..., file_okay=False),
+    models: List[str] = typer.Option(
+        ...,
+        "-m",
+        "--model",
+        help="MoViNet model name, or ActionCLIP checkpoint (as seen by the workers)",
+    ),
+    shard_size: int = typer.Option(
+        200, "--shard-size", help="Number of sequences of each job"
+    ),
+    port: int = typer.Option(..., "-p", "--port"),
+    output_suffix: str = typer.Option(
+        ".pkl", "--suffix", help="Extension of the features file of each model"
+    ),
+    lease_timeout: float = typer.Option(
+        300.0,
+        "--lease-timeout",
+        help="Seconds without heartbeat before the job of a worker is handed out again",
+    ),
+    max_attempts: int = typer.Option(3, "--max-attempts"),
+    overwrite: bool = typer.Option(False, "-f", "--force"),
+    notify: bool = typer.Option(
+        False, "--notify", help="notify using ML Notify by Aporia"
+    ),
+):
+    """Split the features extraction of the sequences with each model into jobs, handed
+    out to the workers (see `queue-worker`), and write the features of each model into
+    <features_output_folder>/<model name><suffix>"""
+    from ilids.synchronization.job_queue import JobQueue, serve_job_queue, shard_jobs
+
+    features_output_folder.mkdir(parents=True, exist_ok=True)
+    for model in models:
+        _check_features_output_path(
+            _queue_features_output_path(features_output_folder, model, output_suffix),
+            overwrite,
+            incremental=False,
         )
 
-        PersistenceMethod.get_from_extension(features_output_path).get_persistence_impl(
-            PersistenceMethodSource.pandas
-        ).persist(features_output_path, features_df)
+    jobs = shard_jobs(models, pd.read_csv(list_input_sequences_file_csv), shard_size)
+    job_queue = JobQueue(jobs, lease_timeout=lease_timeout, max_attempts=max_attempts)
+
+    with notify_context(enable=notify):
+        serve_job_queue(job_queue, port)
+        print(f"Serving {len(jobs)} jobs on port {port}...")
+
+        job_queue.wait()
+
+        failed_models = {job.model for job in job_queue.failed_jobs()}
+        for model, features_df in job_queue.features().items():
+            if model in failed_models:
+                continue
+
+            features_output_path = _queue_features_output_path(
+                features_output_folder, model, output_suffix
+            )
+            get_pandas_persistence_method(features_output_path).persist(
+                features_output_path, features_df
+            )
+
+        if len(failed_models) > 0:
+            raise RuntimeError(
+                f"Jobs failed, no features written for: {', '.join(failed_models)}"
+            )
+
+
+@typer_app.command()
+def queue_worker(
+    host: str = typer.Option("localhost", "--host"),
+    port: int = typer.Option(..., "-p", "--port"),
+    normalize_features: bool = typer.Option(False, "--normalize"),
+    device_type: DeviceType = typer.Option(DeviceType.cpu, "--device-type"),
+    distributed: bool = typer.Option(False, "--distributed/--single"),
+    sync_server_host: Optional[str] = typer.Option(None, "--sync-sever-host"),
+    sync_server_port: Optional[int] = typer.Option(None, "--sync-server-port"),
+    batch_size: int = typer.Option(2 << 3, "-b", "--batch-size"),
+    loader_num_workers: Optional[int] = typer.Option(
+        None, "-w", "--workers", help="Number of workers for the Torch.DataLoader"
+    ),
+    frames_cache: bool = typer.Option(
+        False,
+        "--frames-cache/--no-frames-cache",
+        help="Cache on disk the decoded, scaled and cropped frames of the sequences",
+    ),
+    heartbeat_interval: float = typer.Option(10.0, "--heartbeat-interval"),
+):
+    """Run the features extraction jobs of a queue (see `queue-serve`), until none is
+    left"""
+    import tempfile
+
+    from ilids.synchronization.alternate_device import alternate_device
+    from ilids.synchronization.job_queue import ExtractionJob, run_worker
+
+    worker_stack = contextlib.ExitStack()
+    device: Optional["torch.device"] = None
+    loaded_models: Dict[str, Tuple[Any, ...]] = {}
+
+    def _run_job(job: ExtractionJob) -> pd.DataFrame:
+        nonlocal device
+
+        if job.model in MovinetModelName.list():
+            from ilids.experiments.movinet import extract_movinet_features
+
+            return extract_movinet_features(
+                MovinetModelName(job.model),
+                [row["sequence"] for row in job.sequences],
+                batch_size=batch_size,
+            )
+
+        if device is None:
+            # the device is held from the first ActionCLIP job until the worker stops
+            device = worker_stack.enter_context(
+                alternate_device(
+                    device_type, distributed, sync_server_host, sync_server_port
+                )
+            )
+
+        if job.model not in loaded_models:
+            # the jobs of a model follow each other (see `shard_jobs`), only the
+            # models of the last checkpoint are kept on the device
+            loaded_models.clear()
+            loaded_models[job.model] = _load_actionclip_models(Path(job.model), device)
+
+        with tempfile.TemporaryDirectory() as tmp_folder:
+            sequences_csv = Path(tmp_folder) / "sequences.csv"
+            pd.DataFrame(job.sequences).to_csv(sequences_csv, index=False)
+
+            return _extract_actionclip_features(
+                Path(job.model),
+                sequences_csv,
+                device,
+                normalize_features=normalize_features,
+                batch_size=batch_size,
+                loader_num_workers=loader_num_workers,
+                frames_cache=frames_cache,
+                models=loaded_models[job.model],
+            )
+
+    with worker_stack:
+        jobs_count = run_worker(
+            host, port, _run_job, heartbeat_interval=heartbeat_interval
+        )
+    print(f"No job left, {jobs_count} jobs run")
@@ -1,15 +1,25 @@
 import logging
 import math
+import os
+from dataclasses import dataclass
 from datetime import date, datetime, time, timedelta
 from pathlib import Path
-from time import gmtime, strftime
-from typing import Optional
+from time import gmtime, perf_counter, strftime
+from typing import List, Optional, Tuple
 
-import numpy as np
+import pandas as pd
 import typer
+from joblib import cpu_count, delayed
+from tqdm import tqdm
 
-from ilids.cli.ffmpeg import scale_compress_select_sequence
+from ilids.cli.ffmpeg import (
+    FramesWindow,
+    scale_compress_select_sequence,
+    scale_compress_select_sequences,
+)
 from ilids.cli.ffprobe import get_stream_info
+from ilids.utils.cache import file_cache_key, write_atomically
+from ilids.utils.progress_parallel import ProgressParallel
 
 typer_app = typer.Typer()
 
@@ -43,6 +53,26 @@ def _trivial_frame_selection(stride: int, total_frames: int):
     )
 
 
+def _parse_time(time_str: str) -> timedelta:
+    return datetime.combine(date.min, time.fromisoformat(time_str)) - datetime.min
+
+
+def _frames_window(
+    start: timedelta, end: timedelta, frame_stride: int, fps: float
+) -> FramesWindow:
+    """Window of the frames between `start` and `end`, selecting every `frame_stride` frames.
+
+    Its frames sequence is the same as the `_trivial_frame_selection` shifted to the frame at
+    `start`."""
+    total_seconds = (end - start).total_seconds()
+
+    return FramesWindow(
+        start_frame=int(start.total_seconds() * fps),
+        total_frames=math.ceil(total_seconds * fps),
+        stride=frame_stride,
+    )
+
+
 @typer_app.command()
 def extract(
     input_video: Path,
@@ -58,15 +88,13 @@ def extract(
 
     assert frame_stride > 0
 
-    start = datetime.combine(date.min, time.fromisoformat(start_time)) - datetime.min
-    end = datetime.combine(date.min, time.fromisoformat(end_time)) - datetime.min
+    start = _parse_time(start_time)
+    end = _parse_time(end_time)
 
     assert start >= timedelta.min
     assert end > timedelta.min
     assert start < end
 
-    total_seconds = (end - start).total_seconds()
-
     output = _parse_output(input_video, start, output)
 
     if not overwrite and output.exists():
@@ -75,17 +103,299 @@ def extract(
     fps = fps or _get_fps(input_video)
     assert fps is not None and fps > 0
 
-    frames_sequence_to_extract_0_shifted = _trivial_frame_selection(
-        frame_stride, math.ceil(total_seconds * fps)
-    )
-    frames_sequence_to_extract = (
-        (np.array(frames_sequence_to_extract_0_shifted) + (start.total_seconds() * fps))
-        .astype(int)
-        .tolist()
-    )
+    frames_window = _frames_window(start, end, frame_stride, fps)
 
     returncode = scale_compress_select_sequence(
-        input_video, output, frames_sequence_to_extract, math.ceil(fps), overwrite
+        input_video, output, frames_window, fps, overwrite
     )
 
     assert returncode == 0, "Issue while extract sequence from input video"
+
+
+def _sequences_windows(
+    sequences_df: pd.DataFrame, output_folder: Path, frame_stride: int, fps: float
+) -> List[Tuple[Path, FramesWindow]]:
+    """For each row of the sequences CSV, its output path and frames window"""
+    return [
+        (
+            output_folder / row.id_sequence,
+            _frames_window(
+                _parse_time(row.StartTime),
+                _parse_time(row.EndTime),
+                frame_stride,
+                fps,
+            ),
+        )
+        for row in sequences_df.itertuples()
+    ]
+
+
+@dataclass
+class _VideoSequences:
+    """Sequences to extract from an input video"""
+
+    input_video: Path
+    fps: float
+    sequences: List[Tuple[Path, FramesWindow]]
+    keys: List[str]  # version of each sequence, see `_sequence_key`
+
+
+def _sequence_key(
+    input_video: Path,
+    frame_stride: int,
+    fps: Optional[float],
+    start_time: str,
+    end_time: str,
+) -> str:
+    """Version of an extracted sequence: a new version of its input video, or of any
+    parameter of its frames window, outdates it"""
+    return file_cache_key(input_video, frame_stride, fps, start_time, end_time)
+
+
+def _key_path(output: Path) -> Path:
+    """Hidden file next to the output, holding the key of the extracted sequence"""
+    return output.with_name(f".{output.name}.key")
+
+
+def _is_up_to_date(output: Path, key: str) -> bool:
+    return (
+        output.exists()
+        and _key_path(output).exists()
+        and _key_path(output).read_text() == key
+    )
+
+
+def _videos_sequences(
+    sequences_file_csv: Path,
+    input_videos_folder: Path,
+    frame_stride: int,
+    output_folder: Path,
+    fps: Optional[float],
+    only_outdated: bool = False,
+) -> Tuple[int, List[_VideoSequences]]:
+    """
+    Check the arguments of the batch extraction commands, and group the sequences of the
+    CSV file by input video.
+
+    Args:
+        fps: frame rate of the input videos, read from each one if not given.
+        only_outdated: only keep the missing or outdated sequences (see
+            `_is_up_to_date`), the frame rate of a video being only read if it has
+            some.
+
+    Returns:
+        The number of sequences of the CSV file, and the sequences of each input video.
+    """
+    if not sequences_file_csv.exists() or not sequences_file_csv.is_file():
+        raise ValueError("Expected a CSV file as first argument")
+    if not output_folder.exists():
+        raise ValueError("Output folder doesn't exists")
+    if not output_folder.is_dir():
+        raise ValueError("Output isn't a folder")
+
+    assert frame_stride > 0
+
+    sequences_df = pd.read_csv(sequences_file_csv)
+
+    videos_sequences: List[_VideoSequences] = []
+    for filename, video_sequences_df in sequences_df.groupby("filename", sort=False):
+        input_video = input_videos_folder / filename
+
+        if not input_video.exists() or not input_video.is_file():
+            raise ValueError(f"Invalid input video: {str(input_video)}")
+
+        keys = [
+            _sequence_key(input_video, frame_stride, fps, row.StartTime, row.EndTime)
+            for row in video_sequences_df.itertuples()
+        ]
+        if only_outdated:
+            outdated = [
+                not _is_up_to_date(output_folder / id_sequence, key)
+                for id_sequence, key in zip(video_sequences_df["id_sequence"], keys)
+            ]
+            video_sequences_df = video_sequences_df[outdated]
+            keys = [key for key, is_outdated in zip(keys, outdated) if is_outdated]
+
+            if len(video_sequences_df) == 0:
+                continue
+
+        video_fps = fps or _get_fps(input_video)
+        assert video_fps is not None and video_fps > 0
+
+        videos_sequences.append(
+            _VideoSequences(
+                input_video,
+                video_fps,
+                _sequences_windows(
+                    video_sequences_df, output_folder, frame_stride, video_fps
+                ),
+                keys,
+            )
+        )
+
+    return len(sequences_df), videos_sequences
+
+
+def _partial_output(output: Path) -> Path:
+    """Hidden file next to the output, with the same extension for ffmpeg to pick the
+    same container"""
+    return output.with_name(f".{output.stem}.partial{output.suffix}")
+
+
+def _extract_video_sequences(
+    video_sequences: _VideoSequences, tqdm_position: Optional[int] = None
+) -> bool:
+    # ffmpeg writes to temporary outputs, only renamed once it succeeded: an output
+    # truncated by a failed or killed ffmpeg would otherwise be up to date
+    partial_sequences = [
+        (_partial_output(output), frames_window)
+        for output, frames_window in video_sequences.sequences
+    ]
+
+    # the outputs are either missing, outdated or to overwrite, therefore, always
+    # overwrite
+    returncode = scale_compress_select_sequences(
+        video_sequences.input_video,
+        partial_sequences,
+        video_sequences.fps,
+        overwrite=True,
+        tqdm_position=tqdm_position,
+    )
+
+    if returncode != 0:
+        for partial_output, _ in partial_sequences:
+            partial_output.unlink(missing_ok=True)
+
+        print(
+            f"Issue while extracting sequences from {str(video_sequences.input_video)}"
+        )
+        return False
+
+    for (output, _), (partial_output, _), key in zip(
+        video_sequences.sequences, partial_sequences, video_sequences.keys
+    ):
+        os.replace(partial_output, output)
+        write_atomically(_key_path(output), key.encode())
+
+    return True
+
+
+@typer_app.command()
+def batch(
+    sequences_file_csv: Path = typer.Argument(
+        ...,
+        help="CSV file expecting at least the columns: 'id_sequence', 'filename', 'StartTime', 'EndTime'",
+    ),
+    input_videos_folder: Path = typer.Argument(
+        ..., help="Folder to which the 'filename' column of the CSV is relative to"
+    ),
+    frame_stride: int = typer.Argument(...),
+    output_folder: Path = typer.Argument(...),
+    fps: Optional[float] = typer.Option(None, "--fps", "-r"),
+    overwrite: bool = typer.Option(False, "--overwrite", "-y"),
+) -> None:
+    """Extract all the sequences of the CSV file, but decode each input video only once."""
+    _, videos_sequences = _videos_sequences(
+        sequences_file_csv, input_videos_folder, frame_stride, output_folder, fps
+    )
+
+    if not overwrite:
+        existing_outputs = [
+            output.name
+            for video_sequences in videos_sequences
+            for output, _ in video_sequences.sequences
+            if output.exists()
+        ]
+        if len(existing_outputs) > 0:
+            raise ValueError(
+                f"Use -y option to overwrite the existing outputs: {', '.join(existing_outputs)}"
+            )
+
+    failed_videos = [
+        str(video_sequences.input_video)
+        for video_sequences in tqdm(videos_sequences, desc="Input videos", position=0)
+        if not _extract_video_sequences(video_sequences, tqdm_position=1)
+    ]
+
+    assert (
+        len(failed_videos) == 0
+    ), f"Issue while extracting sequences from input videos: {', '.join(failed_videos)}"
+
+
+@typer_app.command(name="extract-all")
+def extract_all(
+    sequences_file_csv: Path = typer.Argument(
+        ...,
+        help="CSV file expecting at least the columns: 'id_sequence', 'filename', 'StartTime', 'EndTime'",
+    ),
+    input_videos_folder: Path = typer.Argument(
+        ..., help="Folder to which the 'filename' column of the CSV is relative to"
+    ),
+    frame_stride: int = typer.Argument(...),
+    output_folder: Path = typer.Argument(...),
+    fps: Optional[float] = typer.Option(None, "--fps", "-r"),
+    overwrite: bool = typer.Option(
+        False, "--overwrite", "-y", help="Also extract the up to date sequences"
+    ),
+    jobs: Optional[int] = typer.Option(None, "--jobs", "-j"),
+) -> None:
+    """Extract all the missing or outdated sequences of the CSV file, with a pool of
+    workers each decoding a different input video. A sequence is outdated by a new
+    version of its input video, or by other frames to extract (frame stride, fps, start
+    or end time)."""
+    total_count, videos_sequences = _videos_sequences(
+        sequences_file_csv,
+        input_videos_folder,
+        frame_stride,
+        output_folder,
+        fps,
+        only_outdated=not overwrite,
+    )
+
+    sequences_count = sum(
+        len(video_sequences.sequences) for video_sequences in videos_sequences
+    )
+    print(
+        f"{sequences_count} sequences to extract ({total_count - sequences_count} up to date)"
+    )
+    if sequences_count == 0:
+        return
+
+    jobs = jobs or cpu_count()
+
+    print(f"Starting {jobs} concurrent jobs...")
+
+    start = perf_counter()
+
+    # the ffmpeg progress bars of the workers aren't given a position, as joblib
+    # doesn't tell which worker runs a task
+    successes = ProgressParallel(
+        n_jobs=jobs,
+        position=0,
+        desc="Processed input videos",
+        total=len(videos_sequences),
+        unit="video",
+    )(
+        delayed(_extract_video_sequences)(video_sequences)
+        for video_sequences in videos_sequences
+    )
+
+    elapsed = perf_counter() - start
+
+    extracted_count = sum(
+        len(video_sequences.sequences)
+        for success, video_sequences in zip(successes, videos_sequences)
+        if success
+    )
+    print(
+        f"Extracted {extracted_count} sequences in {elapsed:.1f}s ({extracted_count / elapsed:.2f} clips/s)"
+    )
+
+    failed_videos = [
+        str(video_sequences.input_video)
+        for success, video_sequences in zip(successes, videos_sequences)
+        if not success
+    ]
+    assert (
+        len(failed_videos) == 0
+    ), f"Issue while extracting sequences from input videos: {', '.join(failed_videos)}"
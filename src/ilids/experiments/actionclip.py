@@ -1,4 +1,7 @@
-from typing import Dict
+import contextlib
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
@@ -8,6 +11,76 @@ from tqdm import tqdm
 
 from ilids.models.actionclip.model import ImageCLIP
 from ilids.models.actionclip.modules.visual_prompt import VisualPrompt
+from ilids.utils.features_shards import FeaturesShardsWriter
+from ilids.utils.features_store import FeaturesStore
+
+EXTRACTION_STAGES = ["load", "h2d", "transform", "encode", "fusion", "d2h"]
+
+
+@dataclass
+class StageTimings:
+    """
+    Time spent in each stage of the features extraction, in seconds.
+
+    On CUDA, the stages run asynchronously: their time is measured on the GPU with
+    events, hence, the stages overlapping each other sum up to more than the wall time.
+    """
+
+    seconds: Dict[str, float] = field(
+        default_factory=lambda: {stage: 0.0 for stage in EXTRACTION_STAGES}
+    )
+    _cuda_events: List[Tuple[str, torch.cuda.Event, torch.cuda.Event]] = field(
+        default_factory=list, repr=False
+    )
+
+    @contextlib.contextmanager
+    def measure(self, stage: str, stream: Optional[torch.cuda.Stream] = None):
+        """Time the work of the stage, either on the given CUDA stream (without
+        synchronizing it), or on the CPU."""
+        if stream is None:
+            start = perf_counter()
+            try:
+                yield
+            finally:
+                self.seconds[stage] += perf_counter() - start
+            return
+
+        start_event = torch.cuda.Event(enable_timing=True)
+        end_event = torch.cuda.Event(enable_timing=True)
+
+        start_event.record(stream)
+        try:
+            yield
+        finally:
+            end_event.record(stream)
+            self._cuda_events.append((stage, start_event, end_event))
+
+    def resolve(self):
+        """Add up the time of the CUDA events, once they all completed"""
+        for stage, start_event, end_event in self._cuda_events:
+            end_event.synchronize()
+            self.seconds[stage] += start_event.elapsed_time(end_event) / 1000
+        self._cuda_events.clear()
+
+    def __str__(self) -> str:
+        return ", ".join(
+            f"{stage}: {seconds:.2f}s" for stage, seconds in self.seconds.items()
+        )
+
+
+@dataclass
+class _DeviceBatch:
+    frames: torch.Tensor
+    paths: List[str]
+    copied: Optional[torch.cuda.Event]
+
+
+@dataclass
+class _PendingReadback:
+    host_features: torch.Tensor
+    paths: List[str]
+    rows: np.ndarray
+    copied: Optional[torch.cuda.Event]
 
 
 def extract_actionclip_sequences_features(
@@ -17,43 +90,168 @@ def extract_actionclip_sequences_features(
     extracted_frames: int,
     normalize_features: bool,
     device: torch.device,
+    device_transform: Optional[Callable[[torch.Tensor], torch.Tensor]] = None,
+    timings: Optional[StageTimings] = None,
+    features_writer: Optional[FeaturesShardsWriter] = None,
 ) -> pd.DataFrame:
+    """
+    On CUDA, the batches go through a pipeline so that the GPU never waits: while a batch
+    is encoded, the next one is loaded and copied to the device (non-blocking, on its own
+    stream) and the features of the previous one are read back into the preallocated
+    output.
+
+    Args:
+        device_transform: if given, the dataloader yields the uint8 frames of the
+            sequences (B x T x C x H x W), which are only transformed once on the
+            device with it (see `ilids.models.actionclip.transform.get_device_augmentation`).
+            Otherwise, the frames are expected to be already transformed.
+        timings: if given, accumulate in it the time spent in each stage.
+        features_writer: if given, also append to it the features of each batch, as
+            soon as they are read back.
+    """
     image_model.eval()
     fusion_model.eval()
 
-    extracted_features: Dict[str, np.ndarray] = dict()
+    timings = timings if timings is not None else StageTimings()
+
+    is_cuda = device.type == "cuda"
+    compute_stream = torch.cuda.current_stream(device) if is_cuda else None
+    copy_stream = torch.cuda.Stream(device) if is_cuda else None
+
+    # To speed up computation with cuda, during the model creation, we initialise its
+    # weight to float16.
+    # But for other device, like CPU, nothing is done. Therefore, no need to autocast.
+    # autocast: https://github.com/mlfoundations/open_clip/pull/80#issuecomment-1118621323
+    enable_autocast = False if device == torch.device("cpu") else True
+
+    # allocated once the features size is known
+    features_store: Optional[FeaturesStore] = None
+    # 2 pinned buffers for the asynchronous readback: one being copied, one being read
+    host_buffers: List[torch.Tensor] = []
+
+    def _load_to_device(batches_iterator) -> Optional[_DeviceBatch]:
+        with timings.measure("load"):
+            batch = next(batches_iterator, None)
+        if batch is None:
+            return None
+
+        frames_batch, paths_batch = batch
+
+        with timings.measure("h2d", copy_stream), torch.cuda.stream(
+            copy_stream
+        ) if is_cuda else contextlib.nullcontext():
+            frames_batch = frames_batch.to(device, non_blocking=True)
+
+        copied = None
+        if is_cuda:
+            # the frames are allocated by the copy stream but used by the compute one
+            frames_batch.record_stream(compute_stream)
+            copied = torch.cuda.Event()
+            copied.record(copy_stream)
+
+        return _DeviceBatch(frames_batch, list(paths_batch), copied)
+
+    def _complete_readback(readback: _PendingReadback):
+        if readback.copied is not None:
+            readback.copied.synchronize()
+
+        readback.rows[:] = readback.host_features.numpy()
+
+        if features_writer is not None:
+            features_writer.append(readback.paths, readback.rows)
+
+    batches_iterator = iter(sequences_dataloader)
+    next_batch = _load_to_device(batches_iterator)
+    pending_readback: Optional[_PendingReadback] = None
+
+    progress = tqdm(total=len(sequences_dataloader))
+    batch_index = 0
+    while next_batch is not None:
+        current_batch = next_batch
+
+        if current_batch.copied is not None:
+            compute_stream.wait_event(current_batch.copied)
+
+        frames_batch = current_batch.frames
+
+        if device_transform is not None:
+            # copy the uint8 frames, 4 times smaller than the transformed ones
+            with timings.measure("transform", compute_stream), torch.no_grad():
+                frames_batch = device_transform(frames_batch.flatten(end_dim=1))
 
-    for iii, (frames_batch, paths_batch) in enumerate(tqdm(sequences_dataloader)):
         frames_batch = frames_batch.view(
             (-1, extracted_frames, 3) + frames_batch.size()[-2:]
         )
         b, t, c, h, w = frames_batch.size()
-        images_input = frames_batch.to(device).view(-1, c, h, w)
+        images_input = frames_batch.view(-1, c, h, w)
 
-        # To speed up computation with cuda, during the model creation, we initialise its
-        # weight to float16.
-        # But for other device, like CPU, nothing is done. Therefore, no need to autocast.
-        # autocast: https://github.com/mlfoundations/open_clip/pull/80#issuecomment-1118621323
-        enable_autocast = False if device == torch.device("cpu") else True
         with torch.autocast(
             device_type=device.type, enabled=enable_autocast
         ), torch.no_grad():
-            images_features = image_model(images_input).view(
-                b, t, -1
-            )  # Tensor: (B, Features), Features = 512
+            with timings.measure("encode", compute_stream):
+                images_features = image_model(images_input).view(
+                    b, t, -1
+                )  # Tensor: (B, Features), Features = 512
 
-            images_features = fusion_model(
-                images_features
-            )  # Tensor: (B, Features), Features = 512
+            with timings.measure("fusion", compute_stream):
+                images_features = fusion_model(
+                    images_features
+                )  # Tensor: (B, Features), Features = 512
 
         if normalize_features:
             images_features /= images_features.norm(
                 dim=-1, keepdim=True
             )  # Tensor: (T, Features), Features = 512
 
-        images_features = images_features.detach().cpu().numpy()
+        images_features = images_features.detach().float()
+
+        if features_store is None:
+            features_store = FeaturesStore(
+                len(sequences_dataloader.dataset), images_features.size(-1)
+            )
+            host_buffers = [
+                torch.empty(
+                    (sequences_dataloader.batch_size or b, images_features.size(-1)),
+                    dtype=torch.float32,
+                    pin_memory=is_cuda,
+                )
+                for _ in range(2)
+            ]
+
+        # launch the readback of the features, only waited on at the next batch
+        host_features = host_buffers[batch_index % 2][:b]
+        with timings.measure("d2h", compute_stream):
+            host_features.copy_(images_features, non_blocking=is_cuda)
+
+        copied = None
+        if is_cuda:
+            copied = torch.cuda.Event()
+            copied.record(compute_stream)
+
+        readback = _PendingReadback(
+            host_features,
+            current_batch.paths,
+            features_store.reserve(current_batch.paths),
+            copied,
+        )
+
+        # while the device computes the current batch, load and copy the next one
+        next_batch = _load_to_device(batches_iterator)
+
+        if pending_readback is not None:
+            _complete_readback(pending_readback)
+        pending_readback = readback
+
+        batch_index += 1
+        progress.update()
+
+    if pending_readback is not None:
+        _complete_readback(pending_readback)
+    progress.close()
+
+    timings.resolve()
 
-        for path, image_features in zip(paths_batch, images_features):
-            extracted_features[path] = image_features
+    if features_store is None:
+        return pd.DataFrame()
 
-    return pd.DataFrame.from_dict(extracted_features, orient="index")
+    return features_store.to_dataframe()
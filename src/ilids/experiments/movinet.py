@@ -1,40 +1,294 @@
+import itertools
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Collection, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
 import pandas as pd
 import torch
 import towhee
 import tqdm
+from decord import VideoReader, cpu
 
 import ilids.towhee_utils.log_progress_operator
 from ilids.towhee_utils.override.movinet import Movinet, MovinetModelName
+from ilids.towhee_utils.override.movinet_config import MOVINET_STREAM_MODEL_NAMES
+from ilids.utils.features_shards import FeaturesShardsWriter
+from ilids.utils.features_store import FeaturesStore
+
+MOVINET_FEATURES_SIZE = 600
+"""Number of classes of Kinetics 600, the features being the logits of the classifier"""
+
+
+def _batches_by_shape(
+    clips: Iterable[Tuple[str, torch.Tensor]], batch_size: int
+) -> Iterator[Tuple[List[str], torch.Tensor]]:
+    """
+    Group the preprocessed clips (C x T x H x W) in batches (B x C x T x H x W) of clips
+    with the same shape, each batch being yielded as soon as it is full.
+
+    The preprocessing subsamples the clips to the number of frames of the model and crops
+    them to the same size, hence, there is a single bucket unless the preprocessing is
+    skipped (or the videos have different aspect ratios).
+    """
+    buckets: Dict[torch.Size, List[Tuple[str, torch.Tensor]]] = defaultdict(list)
+
+    def _stack(bucket: List[Tuple[str, torch.Tensor]]):
+        paths, inputs = zip(*bucket)
+        bucket.clear()
+        return list(paths), torch.stack(inputs)
+
+    for path, inputs in clips:
+        bucket = buckets[inputs.shape]
+        bucket.append((path, inputs))
+
+        if len(bucket) >= batch_size:
+            yield _stack(bucket)
+
+    # the incomplete batches
+    for bucket in buckets.values():
+        if len(bucket) > 0:
+            yield _stack(bucket)
 
 
 def extract_movinet_features(
     model_name: MovinetModelName,
-    input_glob_pattern: str,
+    input_glob_pattern: Union[str, List[str]],
+    exclude_sequences: Optional[Collection[str]] = None,
+    features_writer: Optional[FeaturesShardsWriter] = None,
+    batch_size: int = 1,
 ) -> pd.DataFrame:
+    """
+    Args:
+        input_glob_pattern: glob pattern of the sequences, or the list of them.
+        exclude_sequences: sequences to leave out, e.g. as their features were already
+            extracted.
+        features_writer: if given, also append to it the features of each batch, as soon
+            as they are extracted.
+        batch_size: number of clips going through the model at once.
+    """
     assert model_name.value in Movinet.supported_model_names()
+    assert batch_size > 0
 
-    all_sequences = towhee.glob["path"](input_glob_pattern)
+    if isinstance(input_glob_pattern, str):
+        all_sequences = towhee.glob["path"](input_glob_pattern)
+    else:
+        all_sequences = towhee.dc["path"](list(input_glob_pattern))
+    if exclude_sequences:
+        all_sequences = all_sequences.filter(
+            lambda entity: entity.path not in exclude_sequences
+        )
+    total_sequences = len(all_sequences.to_list())
 
     progress = tqdm.tqdm(
-        f"Features extraction with {model_name}", total=len(all_sequences.to_list())
+        f"Features extraction with {model_name}", total=total_sequences
+    )
+
+    features_store = FeaturesStore(
+        total_sequences, MOVINET_FEATURES_SIZE, index_name="path"
     )
 
+    movinet = Movinet(model_name=model_name.value)
+
     with torch.no_grad():
-        movinet_entites = (
+        decoded_entities = (
             all_sequences.video_decode.ffmpeg["path", "frames"]()
             .stream()
-            .ilids.movinet["frames", ("labels", "scores", "features")](
-                model_name=model_name.value
-            )
-            .select["path", "features"]()
             .ilids.log_progress(progress)
-            .unstream()
-            .to_list()
         )
+        clips = (
+            (entity.path, movinet.preprocess(entity.frames))
+            for entity in decoded_entities
+        )
+
+        # write the features of each batch as soon as it is extracted
+        for paths, inputs in _batches_by_shape(clips, batch_size):
+            features = np.stack(
+                [features for _, _, features in movinet.predict(inputs)]
+            )
+            features_store.append(paths, features)
+
+            if features_writer is not None:
+                features_writer.append(paths, features)
+
+    return features_store.to_dataframe()
+
+
+def _chunked(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def _predict_videos(
+    movinet: Movinet,
+    videos: List[Tuple[str, np.ndarray]],
+    batch_size: int,
+    stream: Optional[torch.cuda.Stream],
+) -> List[Tuple[List[str], np.ndarray]]:
+    """Features of the decoded videos, in batches of `batch_size` clips, the kernels being
+    queued on the given CUDA stream (if any)"""
+    # `no_grad` only applies to the current thread
+    with torch.no_grad(), torch.cuda.stream(stream):
+        clips = ((path, movinet.preprocess(frames)) for path, frames in videos)
+
+        return [
+            (
+                paths,
+                np.stack([features for _, _, features in movinet.predict(inputs)]),
+            )
+            for paths, inputs in _batches_by_shape(clips, batch_size)
+        ]
+
+
+def extract_movinet_multi_features(
+    model_names: List[MovinetModelName],
+    input_glob_pattern: str,
+    batch_size: int = 1,
+) -> Dict[MovinetModelName, pd.DataFrame]:
+    """
+    Features of several MoViNet models, decoding each sequence only once: its frames are
+    kept in a single uint8 buffer, then subsampled, scaled and cropped by each model
+    according to its own configuration (see `get_movinet_transform_config`).
+
+    The models process each batch of decoded sequences concurrently, each one in its own
+    thread and, on GPU, its own CUDA stream, for the kernels of the small models to
+    overlap. On CPU, the models share the intra-op threads of torch instead.
+
+    Args:
+        batch_size: number of sequences decoded, then going through each model, at once.
+
+    Returns:
+        The features of each model.
+    """
+    assert len(model_names) > 0
+    assert all(m.value in Movinet.supported_model_names() for m in model_names)
+    assert batch_size > 0
+
+    all_sequences = towhee.glob["path"](input_glob_pattern)
+    total_sequences = len(all_sequences.to_list())
+
+    progress = tqdm.tqdm(
+        f"Features extraction with {', '.join(model_names)}", total=total_sequences
+    )
+
+    movinets = {
+        model_name: Movinet(model_name=model_name.value) for model_name in model_names
+    }
+    streams = {
+        model_name: torch.cuda.Stream() if movinet.device == "cuda" else None
+        for model_name, movinet in movinets.items()
+    }
+    features_stores = {
+        model_name: FeaturesStore(
+            total_sequences, MOVINET_FEATURES_SIZE, index_name="path"
+        )
+        for model_name in model_names
+    }
+
+    decoded_entities = (
+        all_sequences.video_decode.ffmpeg["path", "frames"]()
+        .stream()
+        .ilids.log_progress(progress)
+    )
+
+    with ThreadPoolExecutor(max_workers=len(movinets)) as executor:
+        for entities in _chunked(decoded_entities, batch_size):
+            videos = [(entity.path, np.stack(entity.frames)) for entity in entities]
+
+            # the decoded frames are only read by the models
+            futures = {
+                model_name: executor.submit(
+                    _predict_videos, movinet, videos, batch_size, streams[model_name]
+                )
+                for model_name, movinet in movinets.items()
+            }
+
+            for model_name, future in futures.items():
+                for paths, features in future.result():
+                    features_stores[model_name].append(paths, features)
+
+    return {
+        model_name: features_store.to_dataframe()
+        for model_name, features_store in features_stores.items()
+    }
+
+
+def _stream_windows(
+    frame_count: int, frame_step: int, stride_frames: int
+) -> List[np.ndarray]:
+    """Indices of the frames of each window of a streamed video, keeping one frame out of
+    `frame_step` and `stride_frames` of them per window (the last one possibly shorter)
+    """
+    frame_indices = np.arange(0, frame_count, frame_step)
+
+    return [
+        frame_indices[start : start + stride_frames]
+        for start in range(0, len(frame_indices), stride_frames)
+    ]
+
+
+def extract_movinet_stream_features(
+    model_name: MovinetModelName,
+    video_path: Path,
+    chunk_frames: int = 16,
+    stride_frames: int = 64,
+    frame_step: int = 1,
+) -> pd.DataFrame:
+    """
+    Features of a whole (long) video, streamed through the causal MoViNet chunk after
+    chunk, instead of cut into sequences beforehand.
+
+    The stream buffers of the model carry on from a chunk to the next one, along the
+    whole video, while its temporal pooling is reset every `stride_frames`: the features
+    of each window average its frames only, with the context of the previous ones.
+
+    Args:
+        chunk_frames: number of frames going through the model at once.
+        stride_frames: number of frames of each window (a multiple of `chunk_frames`),
+            i.e. the stride between two features.
+        frame_step: keep one frame out of `frame_step`.
+
+    Returns:
+        The features of each window, indexed by its first frame in the video.
+    """
+    if model_name not in MOVINET_STREAM_MODEL_NAMES:
+        raise ValueError(
+            f"No pretrained stream weights for {model_name}, only for: "
+            f"{', '.join(m.value for m in MOVINET_STREAM_MODEL_NAMES)}"
+        )
+    if stride_frames % chunk_frames != 0:
+        raise ValueError(
+            f"The stride ({stride_frames}) should be a multiple of the chunk size "
+            f"({chunk_frames})"
+        )
+
+    video_reader = VideoReader(str(video_path), ctx=cpu(0))
+    windows = _stream_windows(len(video_reader), frame_step, stride_frames)
+
+    features_store = FeaturesStore(
+        len(windows), MOVINET_FEATURES_SIZE, index_name="frame"
+    )
+
+    movinet = Movinet(model_name=model_name.value, causal=True)
+    movinet.model.clean_activation_buffers()
+
+    with torch.no_grad():
+        for window in tqdm.tqdm(windows, f"Streaming {video_path.name}"):
+            movinet.reset_temporal_pooling()
+
+            for start in range(0, len(window), chunk_frames):
+                frames = video_reader.get_batch(
+                    window[start : start + chunk_frames]
+                ).asnumpy()
+                inputs = movinet.preprocess(frames, temporal_subsample=False)
+
+                # the features average all the frames of the window so far
+                ((_, _, features),) = movinet.predict(
+                    inputs[None, ...], clean_activation_buffers=False
+                )
 
-    df = pd.DataFrame(
-        [[entity.path, *entity.features] for entity in movinet_entites],
-        columns=(["path"] + list(range(600))),
-    ).set_index("path")
+            features_store.append([int(window[0])], features[None, :])
 
-    return df
+    return features_store.to_dataframe()
@@ -2,7 +2,7 @@
 # arXiv:
 # Mengmeng Wang, Jiazheng Xing, Yong Liu
 from pathlib import Path
-from typing import Tuple
+from typing import TYPE_CHECKING, Collection, Optional, Tuple
 
 import numpy as np
 import pandas as pd
@@ -13,6 +13,11 @@ from decord import VideoReader, cpu
 from numpy.random import randint
 from PIL import Image
 
+if TYPE_CHECKING:
+    # only for typing, as the cache depends on `ilids.models.actionclip.transform` which
+    # imports this package
+    from ilids.models.actionclip.datasets.frames_cache import PreprocessedFramesCache
+
 
 class ActionDataset(data.Dataset):
     """
@@ -32,6 +37,9 @@ class ActionDataset(data.Dataset):
         seg_length: int = 1,
         random_shift: bool = False,
         index_bias: int = 1,
+        frames_cache: Optional["PreprocessedFramesCache"] = None,
+        tensor_transform: bool = False,
+        exclude_sequences: Optional[Collection[str]] = None,
     ):
         """
         Args:
@@ -42,6 +50,14 @@ class ActionDataset(data.Dataset):
             seg_length (int):
             random_shift (bool): Whether to randomly shift the frames or extract them uniformly.
             index_bias (int): shift in the selection of the frames.
+            frames_cache (PreprocessedFramesCache): if given, the frames are loaded
+                already scaled and center cropped from this cache, `transform` must then
+                only handle the remaining steps (see `get_normalize_augmentation`).
+            tensor_transform (bool): whether `transform` takes in the uint8 frames as a
+                single array (T x H x W x C) rather than a sequence of PIL images (see
+                `get_tensor_augmentation`).
+            exclude_sequences (Collection[str]): sequences to leave out, e.g. as their
+                features were already extracted.
         """
 
         self.frames_to_extract = frames_to_extract  # 8
@@ -49,6 +65,8 @@ class ActionDataset(data.Dataset):
         self.transform = transform
         self.random_shift = random_shift
         self.index_bias = index_bias
+        self.frames_cache = frames_cache
+        self.tensor_transform = tensor_transform
 
         self._sequences_df = pd.read_csv(sequences_details_file)
         # require at least those 2 columns for visual features extraction
@@ -65,6 +83,10 @@ class ActionDataset(data.Dataset):
         self._sequences_df = self._sequences_df[
             self._sequences_df["frame_count"] >= self.frames_to_extract
         ]
+        if exclude_sequences:
+            self._sequences_df = self._sequences_df[
+                ~self._sequences_df["sequence"].isin(exclude_sequences)
+            ]
         self._sequences_df.reset_index(inplace=True)
 
     @property
@@ -144,11 +166,25 @@ class ActionDataset(data.Dataset):
         return self.get(sequence_path, sequence_frame_indices), sequence_path
 
     def get(self, sequence_path: str, sequence_frame_indices: np.ndarray):
-        """Extract the frames for the record, transform them as PIL.Images and transform them with
-        `self.transform`"""
+        """Extract the frames for the record, transform them as PIL.Images (unless
+        `self.tensor_transform`) and transform them with `self.transform`"""
+        if self.frames_cache is not None:
+            frames = self.frames_cache.get(sequence_path, sequence_frame_indices)
+
+            if self.tensor_transform:
+                # copy out of the read-only memory-mapped file
+                return self.transform(np.array(frames))
+
+            pil_frames = [PIL.Image.fromarray(frame) for frame in frames]
+
+            return self.transform(pil_frames)
+
         vr = VideoReader(sequence_path, ctx=cpu(0))
         frames = vr.get_batch(sequence_frame_indices)
 
+        if self.tensor_transform:
+            return self.transform(frames.asnumpy())
+
         pil_frames = [PIL.Image.fromarray(frame) for frame in frames.asnumpy()]
 
         process_data = self.transform(pil_frames)
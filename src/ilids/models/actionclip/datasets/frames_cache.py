@@ -0,0 +1,77 @@
+import io
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from decord import VideoReader, cpu
+from PIL import Image
+
+from ilids.models.actionclip.transform import get_scale_crop_augmentation
+from ilids.utils.cache import file_cache_key, get_cache_dir, write_atomically
+
+FRAMES_CACHE_NAMESPACE = "actionclip-frames"
+
+
+class PreprocessedFramesCache:
+    """
+    On-disk cache of the frames of a sequence, once decoded, scaled and center cropped
+    (see `get_scale_crop_augmentation`).
+
+    Each selection of frames of a sequence is stored as a uint8 array
+    (frames, input_size, input_size, channels) in a `.npy` file, read back memory-mapped.
+    Therefore, the different ActionCLIP checkpoints sharing the same input size only
+    decode and resize each sequence once, whatever the number of extractions.
+    """
+
+    def __init__(self, input_size: int = 224, cache_dir: Optional[Path] = None):
+        """
+        Args:
+            input_size (int): side of the square frames stored in the cache.
+            cache_dir (Path): folder of the cached arrays, default to the
+                `FRAMES_CACHE_NAMESPACE` folder of `ilids.utils.cache.get_cache_dir`.
+        """
+        self.input_size = input_size
+        self.scale_crop_transform = get_scale_crop_augmentation(input_size)
+        self.cache_dir = cache_dir or get_cache_dir(FRAMES_CACHE_NAMESPACE)
+
+    def _cache_path(
+        self, sequence_path: str, sequence_frame_indices: np.ndarray
+    ) -> Path:
+        key = file_cache_key(
+            Path(sequence_path),
+            ",".join(str(i) for i in sequence_frame_indices),
+            f"scale-crop-{self.input_size}",
+        )
+        return self.cache_dir / f"{key}.npy"
+
+    def _decode(
+        self, sequence_path: str, sequence_frame_indices: np.ndarray
+    ) -> np.ndarray:
+        vr = VideoReader(sequence_path, ctx=cpu(0))
+        frames = vr.get_batch(sequence_frame_indices)
+
+        pil_frames = [Image.fromarray(frame) for frame in frames.asnumpy()]
+
+        return np.stack(
+            [np.asarray(frame) for frame in self.scale_crop_transform(pil_frames)]
+        )
+
+    def get(self, sequence_path: str, sequence_frame_indices: np.ndarray) -> np.ndarray:
+        """Scaled and center cropped frames of the sequence, decoding them only if they
+        aren't cached yet.
+
+        Returns:
+            uint8 array of shape (frames, input_size, input_size, channels)
+        """
+        cache_path = self._cache_path(sequence_path, sequence_frame_indices)
+
+        if cache_path.exists():
+            return np.load(cache_path, mmap_mode="r")
+
+        frames = self._decode(sequence_path, sequence_frame_indices)
+
+        buffer = io.BytesIO()
+        np.save(buffer, frames)
+        write_atomically(cache_path, buffer.getvalue())
+
+        return frames
@@ -93,3 +93,63 @@ class ToTorchFormatTensor(object):
             # yikes, this transpose takes 80% of the loading time/CPU
             img = img.transpose(0, 1).transpose(0, 2).contiguous()
         return img.float().div(255) if self.div else img.float()
+
+
+class TensorGroupFromFrames(object):
+    """Converts the uint8 frames (T x H x W x C) returned by `decord.VideoReader.get_batch`
+    (or its numpy version) to a uint8 torch.Tensor of shape (T x C x H x W), without copy
+    whenever possible"""
+
+    def __call__(self, frames):
+        if hasattr(frames, "asnumpy"):
+            # decord.NDArray
+            frames = frames.asnumpy()
+        if isinstance(frames, np.ndarray):
+            frames = torch.from_numpy(np.ascontiguousarray(frames))
+        return frames.permute(0, 3, 1, 2)
+
+
+class TensorGroupScale(object):
+    """Tensor version of `GroupScale`, rescaling all the frames (T x C x H x W) at once.
+    As with PIL, the interpolation is antialiased and the result rounded to uint8 values.
+    """
+
+    def __init__(self, size, interpolation=InterpolationMode.BICUBIC):
+        self.size = size
+        self.interpolation = interpolation
+
+    def __call__(self, tensor):
+        scaled = torchvision.transforms.functional.resize(
+            tensor.float(), self.size, interpolation=self.interpolation, antialias=True
+        )
+        return scaled.round_().clamp_(0, 255)
+
+
+class TensorGroupCenterCrop(object):
+    """Tensor version of `GroupCenterCrop`, cropping all the frames (T x C x H x W) at once"""
+
+    def __init__(self, size):
+        self.size = size
+
+    def __call__(self, tensor):
+        return torchvision.transforms.functional.center_crop(tensor, self.size)
+
+
+class TensorGroupNormalize(object):
+    """Tensor version of `Stack`, `ToTorchFormatTensor(div=True)` and `GroupNormalize`:
+    from frames (T x C x H x W) in the range [0, 255] to a normalized torch.FloatTensor
+    of shape (T*C x H x W). The normalization constants are computed once, already
+    scaled to the [0, 255] range."""
+
+    def __init__(self, mean, std):
+        self.mean = torch.tensor(mean, dtype=torch.float32)[:, None, None] * 255
+        self.std = torch.tensor(std, dtype=torch.float32)[:, None, None] * 255
+
+    def __call__(self, tensor):
+        if self.mean.device != tensor.device:
+            # only move the constants once to the device of the frames
+            self.mean = self.mean.to(tensor.device)
+            self.std = self.std.to(tensor.device)
+
+        normalized = (tensor.float() - self.mean) / self.std
+        return normalized.flatten(start_dim=-4, end_dim=-3)
@@ -0,0 +1,97 @@
+import io
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import torch
+
+from ilids.utils.cache import file_cache_key, get_cache_dir, write_atomically
+
+PROMPT_EMBEDDINGS_NAMESPACE = "actionclip-prompt-embeddings"
+
+
+class PromptEmbeddings:
+    """
+    Table of the text features of a vocabulary of prompts, a row per prompt.
+
+    Selecting the features of some prompts only gathers their rows, instead of running
+    the text encoder again.
+    """
+
+    def __init__(self, prompts: Sequence[str], features: torch.Tensor):
+        assert len(prompts) == features.shape[0]
+
+        self.prompts = list(prompts)
+        self.features = features
+        self._rows: Dict[str, int] = {prompt: i for i, prompt in enumerate(prompts)}
+
+    def indices(self, prompts: Sequence[str]) -> torch.Tensor:
+        return torch.tensor([self._rows[prompt] for prompt in prompts])
+
+    def __getitem__(self, prompts: Sequence[str]) -> torch.Tensor:
+        """Features of the prompts (prompts x features), as a new tensor which can be
+        modified in place"""
+        return self.features.index_select(0, self.indices(prompts))
+
+    def __len__(self) -> int:
+        return len(self.prompts)
+
+
+class PromptEmbeddingsCache:
+    """
+    On-disk cache of the text features of the prompts given to an ActionCLIP checkpoint.
+
+    The features of each prompt are stored as a float32 array in a `.npy` file, keyed by
+    the checkpoint (see `file_cache_key`) and the prompt: only the prompts never seen
+    with this checkpoint go through the text encoder.
+    """
+
+    def __init__(self, actionclip_ckpt: Path, cache_dir: Optional[Path] = None):
+        """
+        Args:
+            actionclip_ckpt (Path): checkpoint of the text encoder.
+            cache_dir (Path): folder of the cached arrays, default to the
+                `PROMPT_EMBEDDINGS_NAMESPACE` folder of `ilids.utils.cache.get_cache_dir`.
+        """
+        self.actionclip_ckpt = actionclip_ckpt
+        self.cache_dir = cache_dir or get_cache_dir(PROMPT_EMBEDDINGS_NAMESPACE)
+
+    def _cache_path(self, prompt: str) -> Path:
+        return self.cache_dir / f"{file_cache_key(self.actionclip_ckpt, prompt)}.npy"
+
+    def get(
+        self,
+        prompts: Sequence[str],
+        encode_texts: Callable[[List[str]], torch.Tensor],
+    ) -> PromptEmbeddings:
+        """
+        Args:
+            prompts: vocabulary of the table, the duplicates being dropped.
+            encode_texts: text features of the given prompts (prompts x features), only
+                called once, with all the prompts missing from the cache, if any.
+        """
+        prompts = list(dict.fromkeys(prompts))
+
+        features: Dict[str, np.ndarray] = {
+            prompt: np.load(self._cache_path(prompt))
+            for prompt in prompts
+            if self._cache_path(prompt).exists()
+        }
+
+        missing_prompts = [prompt for prompt in prompts if prompt not in features]
+        if len(missing_prompts) > 0:
+            encoded_features = (
+                encode_texts(missing_prompts).detach().cpu().numpy().astype(np.float32)
+            )
+
+            for prompt, prompt_features in zip(missing_prompts, encoded_features):
+                buffer = io.BytesIO()
+                np.save(buffer, prompt_features)
+                write_atomically(self._cache_path(prompt), buffer.getvalue())
+
+                features[prompt] = prompt_features
+
+        return PromptEmbeddings(
+            prompts,
+            torch.from_numpy(np.stack([features[prompt] for prompt in prompts])),
+        )
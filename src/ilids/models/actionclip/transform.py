@@ -4,22 +4,69 @@
 
 from ilids.models.actionclip.datasets.transforms_ss import *
 
+INPUT_MEAN = [0.48145466, 0.4578275, 0.40821073]
+INPUT_STD = [0.26862954, 0.26130258, 0.27577711]
 
-def get_augmentation(input_size: int = 224):
-    input_mean = [0.48145466, 0.4578275, 0.40821073]
-    input_std = [0.26862954, 0.26130258, 0.27577711]
 
+def get_scale_crop_augmentation(input_size: int = 224):
+    """Part of `get_augmentation` only depending on the frames and the input size: scale
+    and center crop each PIL image of the group."""
     scale_size = input_size * 256 // 224
 
-    unique = torchvision.transforms.Compose(
+    return torchvision.transforms.Compose(
         [GroupScale(scale_size), GroupCenterCrop(input_size)]
     )
 
-    common = torchvision.transforms.Compose(
+
+def get_normalize_augmentation():
+    """Part of `get_augmentation` stacking the (already scaled and cropped) group of PIL
+    images into a normalized tensor."""
+    return torchvision.transforms.Compose(
         [
             Stack(roll=False),
             ToTorchFormatTensor(div=True),
-            GroupNormalize(input_mean, input_std),
+            GroupNormalize(INPUT_MEAN, INPUT_STD),
         ]
     )
+
+
+def get_augmentation(input_size: int = 224):
+    unique = get_scale_crop_augmentation(input_size)
+
+    common = get_normalize_augmentation()
+
     return torchvision.transforms.Compose([unique, common])
+
+
+def get_device_augmentation(input_size: int = 224, scale_crop: bool = True):
+    """Tensor transform of uint8 frames (N x C x H x W), wherever they are (CPU or
+    GPU): scale and center crop them (unless already done, e.g. by the frames cache) and
+    normalize them into a torch.FloatTensor (N*C x H x W)."""
+    scale_size = input_size * 256 // 224
+
+    scale_crop_transforms = (
+        [TensorGroupScale(scale_size), TensorGroupCenterCrop(input_size)]
+        if scale_crop
+        else []
+    )
+
+    return torchvision.transforms.Compose(
+        [*scale_crop_transforms, TensorGroupNormalize(INPUT_MEAN, INPUT_STD)]
+    )
+
+
+def get_tensor_normalize_augmentation():
+    """Tensor version of `get_normalize_augmentation`, on the uint8 frames
+    (T x H x W x C) already scaled and cropped."""
+    return torchvision.transforms.Compose(
+        [TensorGroupFromFrames(), get_device_augmentation(scale_crop=False)]
+    )
+
+
+def get_tensor_augmentation(input_size: int = 224):
+    """Tensor version of `get_augmentation`, transforming all the uint8 frames
+    (T x H x W x C) returned by `decord.VideoReader.get_batch` at once, without going
+    through PIL images."""
+    return torchvision.transforms.Compose(
+        [TensorGroupFromFrames(), get_device_augmentation(input_size)]
+    )
@@ -1,21 +1,56 @@
+import threading
 from contextlib import contextmanager
+from logging import getLogger
 from typing import Generator, Optional
 
 from ilids.synchronization.gpu_sync_manager import get_client
 
+logger = getLogger(__name__)
+
 
 @contextmanager
 def acquire_free_gpu(
-    host: str, port: int, auth_key: bytes = b"16-896-375"
+    host: str,
+    port: int,
+    auth_key: bytes = b"16-896-375",
+    timeout: Optional[float] = None,
+    heartbeat_interval: float = 10.0,
 ) -> Generator[int, None, None]:
+    """
+    Wait for a free GPU, given by the `ilids_sync` server, and keep it while in the
+    context, sending heartbeats from a background thread.
+
+    Args:
+        timeout: seconds to wait for a GPU before raising a `TimeoutError`, forever by
+            default.
+        heartbeat_interval: seconds between two heartbeats, to be shorter than the lease
+            timeout of the server.
+    """
     client = get_client(host, port, auth_key)
     client.connect()
 
-    gpu_id: Optional[int] = None
+    lease_id: Optional[str] = None
+    stop_heartbeat = threading.Event()
+
+    def _heartbeat():
+        while not stop_heartbeat.wait(heartbeat_interval):
+            if not client.heartbeat_gpu(lease_id)._getvalue():
+                logger.warning(f"The lease {lease_id} of the GPU expired")
+                return
+
+    heartbeat_thread = threading.Thread(target=_heartbeat, daemon=True)
 
     try:
-        gpu_id = client.acquire_gpu()._getvalue()
+        acquired = client.acquire_gpu(timeout)._getvalue()
+        if acquired is None:
+            raise TimeoutError(f"No free GPU after {timeout}s")
+
+        gpu_id, lease_id = acquired
+        heartbeat_thread.start()
         yield gpu_id
     finally:
-        if gpu_id is not None:
-            client.release_gpu(gpu_id)
+        stop_heartbeat.set()
+        if heartbeat_thread.is_alive():
+            heartbeat_thread.join()
+        if lease_id is not None:
+            client.release_gpu(lease_id)
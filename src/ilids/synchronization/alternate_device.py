@@ -4,12 +4,7 @@ from typing import Generator, Optional
 import torch
 
 from ilids.synchronization.acquire_gpu_client import acquire_free_gpu
-from ilids.utils.extended_enums import ExtendedEnum
-
-
-class DeviceType(str, ExtendedEnum):
-    cpu = "cpu"
-    cuda = "cuda"
+from ilids.synchronization.device_type import DeviceType
 
 
 @contextlib.contextmanager
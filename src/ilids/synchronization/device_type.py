@@ -0,0 +1,6 @@
+from ilids.utils.extended_enums import ExtendedEnum
+
+
+class DeviceType(str, ExtendedEnum):
+    cpu = "cpu"
+    cuda = "cuda"
@@ -0,0 +1,220 @@
+import atexit
+import itertools
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Iterable, Optional, Tuple
+
+RECLAIM_CHECK_INTERVAL = 1.0
+"""Seconds between two checks of the expired leases (or the free memory) while waiting"""
+
+
+class NvmlFreeMemory:
+    """Free memory of the GPUs in bytes, as reported by NVML, None if not available.
+
+    NVML is only initialised once, and shut down at exit (or by `close`)."""
+
+    def __init__(self):
+        self._pynvml = None
+        self._handles: Dict[int, object] = dict()
+
+        try:
+            import pynvml
+        except ImportError:
+            return
+
+        try:
+            pynvml.nvmlInit()
+        except pynvml.NVMLError:
+            # e.g. no driver
+            return
+
+        self._pynvml = pynvml
+        atexit.register(self.close)
+
+    def __call__(self, gpu_id: int) -> Optional[int]:
+        if self._pynvml is None:
+            return None
+
+        try:
+            if gpu_id not in self._handles:
+                self._handles[gpu_id] = self._pynvml.nvmlDeviceGetHandleByIndex(gpu_id)
+            return self._pynvml.nvmlDeviceGetMemoryInfo(self._handles[gpu_id]).free
+        except self._pynvml.NVMLError:
+            return None
+
+    def close(self):
+        if self._pynvml is not None:
+            self._pynvml.nvmlShutdown()
+            self._pynvml = None
+            self._handles.clear()
+
+
+@dataclass
+class _Lease:
+    gpu_id: int
+    expires_at: float
+
+
+class GpuScheduler:
+    """
+    Share GPUs among clients (e.g. features extractions), in the order they asked for
+    one.
+
+    - each GPU runs up to `jobs_per_gpu` jobs at once, and only gets a new one if it has
+      at least `min_free_memory` bytes free (when known). The free memory is read at
+      most once per `RECLAIM_CHECK_INTERVAL`, and `min_free_memory` is reserved for
+      each job given since the last reading, as a new job didn't allocate its memory
+      yet.
+    - a GPU is given with a lease, to be renewed by its client with a heartbeat: the
+      GPU of a client that died without releasing it is reclaimed once its lease
+      expired.
+
+    It is thread-safe, the manager serving each client from its own thread.
+    """
+
+    def __init__(
+        self,
+        gpu_ids: Iterable[int],
+        jobs_per_gpu: int = 1,
+        lease_timeout: float = 60.0,
+        min_free_memory: Optional[int] = None,
+        free_memory: Optional[Callable[[int], Optional[int]]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            gpu_ids: GPUs to share.
+            jobs_per_gpu: maximum number of jobs running at once on a GPU.
+            lease_timeout: seconds without heartbeat before a GPU is reclaimed.
+            min_free_memory: bytes a GPU needs to have free to get a new job.
+            free_memory: free memory of a GPU in bytes, None if not available, default
+                to `NvmlFreeMemory` (only used along with `min_free_memory`).
+            clock: current time in seconds.
+        """
+        assert jobs_per_gpu > 0
+        assert lease_timeout > 0
+
+        self.jobs_per_gpu = jobs_per_gpu
+        self.lease_timeout = lease_timeout
+        self.min_free_memory = min_free_memory
+        self._free_memory = free_memory
+        if self._free_memory is None and min_free_memory is not None:
+            self._free_memory = NvmlFreeMemory()
+        self._clock = clock
+
+        self._jobs: Dict[int, int] = {gpu_id: 0 for gpu_id in sorted(set(gpu_ids))}
+        # last reading of the free memory of each GPU, and when it was read
+        self._memory_readings: Dict[int, Tuple[float, Optional[int]]] = dict()
+        self._jobs_since_reading: Dict[int, int] = {gpu_id: 0 for gpu_id in self._jobs}
+        self._leases: Dict[str, _Lease] = dict()
+        self._waiting: Deque[int] = deque()
+        self._tickets = itertools.count()
+        self._condition = threading.Condition()
+
+        assert len(self._jobs) > 0
+
+    def _has_enough_memory(self, gpu_id: int) -> bool:
+        if self.min_free_memory is None:
+            return True
+
+        now = self._clock()
+        read_at, free_memory = self._memory_readings.get(gpu_id, (None, None))
+        if read_at is None or now - read_at >= RECLAIM_CHECK_INTERVAL:
+            free_memory = self._free_memory(gpu_id)
+            self._memory_readings[gpu_id] = (now, free_memory)
+            self._jobs_since_reading[gpu_id] = 0
+
+        if free_memory is None:
+            return True
+
+        reserved_memory = self._jobs_since_reading[gpu_id] * self.min_free_memory
+        return free_memory - reserved_memory >= self.min_free_memory
+
+    def _pick_gpu(self) -> Optional[int]:
+        """The least busy GPU able to run one more job"""
+        candidates = [
+            gpu_id
+            for gpu_id, jobs in self._jobs.items()
+            if jobs < self.jobs_per_gpu and self._has_enough_memory(gpu_id)
+        ]
+        if len(candidates) == 0:
+            return None
+
+        return min(candidates, key=lambda gpu_id: self._jobs[gpu_id])
+
+    def _reclaim_expired_leases(self):
+        now = self._clock()
+        for lease_id, lease in list(self._leases.items()):
+            if lease.expires_at <= now:
+                print(f"Reclaiming GPU {lease.gpu_id}, lease {lease_id} expired")
+                self._end_lease(lease_id)
+
+    def _end_lease(self, lease_id: str):
+        lease = self._leases.pop(lease_id)
+        self._jobs[lease.gpu_id] -= 1
+        self._condition.notify_all()
+
+    def acquire(self, timeout: Optional[float] = None) -> Tuple[int, str]:
+        """
+        Wait for a GPU, after the clients which asked before.
+
+        Returns:
+            The GPU id and the id of its lease (see `heartbeat` and `release`).
+
+        Raises:
+            TimeoutError: if no GPU could be given within the timeout (in seconds).
+        """
+        with self._condition:
+            ticket = next(self._tickets)
+            self._waiting.append(ticket)
+            deadline = None if timeout is None else time.monotonic() + timeout
+
+            try:
+                while True:
+                    self._reclaim_expired_leases()
+
+                    gpu_id = self._pick_gpu() if self._waiting[0] == ticket else None
+                    if gpu_id is not None:
+                        break
+
+                    wait_timeout = RECLAIM_CHECK_INTERVAL
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise TimeoutError(f"No free GPU after {timeout}s")
+                        wait_timeout = min(wait_timeout, remaining)
+
+                    self._condition.wait(wait_timeout)
+            finally:
+                self._waiting.remove(ticket)
+                # the next client in line might get a GPU now
+                self._condition.notify_all()
+
+            lease_id = uuid.uuid4().hex
+            self._leases[lease_id] = _Lease(gpu_id, self._clock() + self.lease_timeout)
+            self._jobs[gpu_id] += 1
+            self._jobs_since_reading[gpu_id] += 1
+
+            return gpu_id, lease_id
+
+    def heartbeat(self, lease_id: str) -> bool:
+        """Renew the lease, returns False if it already expired (the GPU was reclaimed)"""
+        with self._condition:
+            if lease_id not in self._leases:
+                return False
+
+            self._leases[lease_id].expires_at = self._clock() + self.lease_timeout
+            return True
+
+    def release(self, lease_id: str):
+        with self._condition:
+            if lease_id in self._leases:
+                self._end_lease(lease_id)
+
+    def jobs(self) -> Dict[int, int]:
+        """Number of jobs running on each GPU"""
+        with self._condition:
+            return dict(self._jobs)
@@ -1,28 +1,58 @@
 from multiprocessing.managers import BaseManager
-from typing import Set
+from typing import Optional, Set, Tuple
+
+from ilids.synchronization.gpu_scheduler import GpuScheduler
 
 
 class SharedSetManager(BaseManager):
-    def acquire_gpu(self) -> int:
+    def acquire_gpu(self, timeout: Optional[float] = None) -> Optional[Tuple[int, str]]:
+        pass
+
+    def heartbeat_gpu(self, lease_id: str) -> bool:
         pass
 
-    def release_gpu(self, gpu_id: int):
+    def release_gpu(self, lease_id: str):
         pass
 
 
 def get_server_manager(
-    free_gpus: Set[int], port: int, auth_key: bytes = b"16-896-375"
+    free_gpus: Set[int],
+    port: int,
+    auth_key: bytes = b"16-896-375",
+    jobs_per_gpu: int = 1,
+    lease_timeout: float = 60.0,
+    min_free_memory: Optional[int] = None,
 ) -> SharedSetManager:
-    def _acquire_gpu() -> int:
-        free_gpu = free_gpus.pop()
-        print(f"Giving free GPU {free_gpu}")
-        return free_gpu
+    """
+    Manager sharing the GPUs among its clients (see `GpuScheduler`): a client waits for a
+    GPU, then has to send heartbeats until releasing it.
+    """
+    scheduler = GpuScheduler(
+        free_gpus,
+        jobs_per_gpu=jobs_per_gpu,
+        lease_timeout=lease_timeout,
+        min_free_memory=min_free_memory,
+    )
+
+    def _acquire_gpu(timeout: Optional[float] = None) -> Optional[Tuple[int, str]]:
+        try:
+            gpu_id, lease_id = scheduler.acquire(timeout)
+        except TimeoutError:
+            # the exceptions reach the client as a `RemoteError`
+            return None
+
+        print(f"Giving GPU {gpu_id} (lease {lease_id}), jobs: {scheduler.jobs()}")
+        return gpu_id, lease_id
+
+    def _heartbeat_gpu(lease_id: str) -> bool:
+        return scheduler.heartbeat(lease_id)
 
-    def _release_gpu(gpu_id: int):
-        free_gpus.add(gpu_id)
-        print(f"GPU {gpu_id} is free")
+    def _release_gpu(lease_id: str):
+        scheduler.release(lease_id)
+        print(f"Lease {lease_id} released, jobs: {scheduler.jobs()}")
 
     SharedSetManager.register("acquire_gpu", callable=_acquire_gpu)
+    SharedSetManager.register("heartbeat_gpu", callable=_heartbeat_gpu)
     SharedSetManager.register("release_gpu", callable=_release_gpu)
 
     manager = SharedSetManager(address=("", port), authkey=auth_key)
@@ -34,6 +64,7 @@ def get_client(
     host: str, port: int, auth_key: bytes = b"16-896-375"
 ) -> SharedSetManager:
     SharedSetManager.register("acquire_gpu")
+    SharedSetManager.register("heartbeat_gpu")
     SharedSetManager.register("release_gpu")
 
     manager = SharedSetManager(address=(host, port), authkey=auth_key)
@@ -0,0 +1,344 @@
+import itertools
+import os
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+from logging import getLogger
+from multiprocessing.managers import BaseManager
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+logger = getLogger(__name__)
+
+REQUEUE_CHECK_INTERVAL = 1.0
+"""Seconds between two checks of the expired jobs while waiting"""
+
+
+@dataclass
+class ExtractionJob:
+    """Features extraction of a shard of the sequences with a single model"""
+
+    job_id: int
+    model: str
+    """MoViNet model name, or ActionCLIP checkpoint"""
+    sequences: List[Dict[str, Any]]
+    """Rows of the sequences CSV ('sequence', 'frame_count', ...)"""
+    attempts: int = 0
+
+
+def shard_jobs(
+    models: List[str], sequences_df: pd.DataFrame, shard_size: int
+) -> List[ExtractionJob]:
+    """A job per model and per shard of `shard_size` sequences"""
+    assert shard_size > 0
+
+    records = sequences_df.to_dict(orient="records")
+    job_ids = itertools.count()
+
+    return [
+        ExtractionJob(next(job_ids), model, records[start : start + shard_size])
+        for model in models
+        for start in range(0, len(records), shard_size)
+    ]
+
+
+class JobStatus(str, Enum):
+    pending = "pending"
+    running = "running"
+    done = "done"
+    failed = "failed"
+
+
+@dataclass
+class _JobState:
+    job: ExtractionJob
+    status: JobStatus = JobStatus.pending
+    worker: Optional[str] = None
+    expires_at: float = 0.0
+    errors: List[str] = field(default_factory=list)
+
+
+class JobQueue:
+    """
+    Queue of the extraction jobs, handed out to the workers in order and collecting
+    their features.
+
+    A worker renews the lease of its job with heartbeats: the job of a worker that
+    disconnected is handed out again once its lease expired, as is a failed job, up to
+    `max_attempts` times.
+
+    It is thread-safe, the manager serving each worker from its own thread.
+    """
+
+    def __init__(
+        self,
+        jobs: List[ExtractionJob],
+        lease_timeout: float = 120.0,
+        max_attempts: int = 3,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        assert lease_timeout > 0
+        assert max_attempts > 0
+
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        self._clock = clock
+
+        self._states: Dict[int, _JobState] = {
+            job.job_id: _JobState(job) for job in jobs
+        }
+        self._features: Dict[int, pd.DataFrame] = dict()
+        self._condition = threading.Condition()
+
+    def _retry_or_fail(self, state: _JobState, error: str):
+        state.errors.append(error)
+        state.worker = None
+
+        if state.job.attempts >= self.max_attempts:
+            logger.error(f"Job {state.job.job_id} failed: {state.errors}")
+            state.status = JobStatus.failed
+        else:
+            state.status = JobStatus.pending
+
+        self._condition.notify_all()
+
+    def _requeue_expired_jobs(self):
+        now = self._clock()
+        for state in self._states.values():
+            if state.status == JobStatus.running and state.expires_at <= now:
+                self._retry_or_fail(state, f"lease of worker {state.worker} expired")
+
+    def _is_finished(self) -> bool:
+        return all(
+            state.status in (JobStatus.done, JobStatus.failed)
+            for state in self._states.values()
+        )
+
+    def take(
+        self, worker: str, timeout: Optional[float] = None
+    ) -> Optional[ExtractionJob]:
+        """
+        Wait for a pending job, given to the worker with a lease (see `heartbeat`).
+
+        Returns:
+            The job, or None once all of them are finished (or after the timeout).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self._condition:
+            while True:
+                self._requeue_expired_jobs()
+
+                state = next(
+                    (s for s in self._states.values() if s.status == JobStatus.pending),
+                    None,
+                )
+                if state is not None:
+                    state.status = JobStatus.running
+                    state.worker = worker
+                    state.expires_at = self._clock() + self.lease_timeout
+                    state.job.attempts += 1
+                    return state.job
+
+                if self._is_finished():
+                    return None
+
+                wait_timeout = REQUEUE_CHECK_INTERVAL
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    wait_timeout = min(wait_timeout, remaining)
+
+                self._condition.wait(wait_timeout)
+
+    def heartbeat(self, job_id: int, worker: str) -> bool:
+        """Renew the lease of the job, returns False if it was handed out again"""
+        with self._condition:
+            state = self._states[job_id]
+            if state.status != JobStatus.running or state.worker != worker:
+                return False
+
+            state.expires_at = self._clock() + self.lease_timeout
+            return True
+
+    def complete(self, job_id: int, features: pd.DataFrame):
+        """Collect the features of the job, only the first ones if it ran several times"""
+        with self._condition:
+            state = self._states[job_id]
+            if state.status == JobStatus.done:
+                return
+
+            self._features[job_id] = features
+            state.status = JobStatus.done
+            state.worker = None
+            self._condition.notify_all()
+
+    def fail(self, job_id: int, worker: str, error: str):
+        with self._condition:
+            state = self._states[job_id]
+            if state.status == JobStatus.running and state.worker == worker:
+                self._retry_or_fail(state, f"worker {worker}: {error}")
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait for all the jobs to be finished, returns False after the timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self._condition:
+            while not self._is_finished():
+                self._requeue_expired_jobs()
+
+                wait_timeout = REQUEUE_CHECK_INTERVAL
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    wait_timeout = min(wait_timeout, remaining)
+
+                self._condition.wait(wait_timeout)
+
+            return True
+
+    def statuses(self) -> Dict[JobStatus, int]:
+        with self._condition:
+            return {
+                status: sum(1 for s in self._states.values() if s.status == status)
+                for status in JobStatus
+            }
+
+    def failed_jobs(self) -> List[ExtractionJob]:
+        with self._condition:
+            return [
+                s.job for s in self._states.values() if s.status == JobStatus.failed
+            ]
+
+    def features(self) -> Dict[str, pd.DataFrame]:
+        """Features of each model, concatenated in the order of the jobs"""
+        with self._condition:
+            features_by_model: Dict[str, List[pd.DataFrame]] = dict()
+            for job_id in sorted(self._features.keys()):
+                model = self._states[job_id].job.model
+                features_by_model.setdefault(model, []).append(self._features[job_id])
+
+            return {model: pd.concat(dfs) for model, dfs in features_by_model.items()}
+
+
+class JobQueueManager(BaseManager):
+    def take_job(
+        self, worker: str, timeout: Optional[float] = None
+    ) -> Optional[ExtractionJob]:
+        pass
+
+    def heartbeat_job(self, job_id: int, worker: str) -> bool:
+        pass
+
+    def complete_job(self, job_id: int, features: pd.DataFrame):
+        pass
+
+    def fail_job(self, job_id: int, worker: str, error: str):
+        pass
+
+
+def get_job_queue_server_manager(
+    job_queue: JobQueue, port: int, auth_key: bytes = b"16-896-375"
+) -> JobQueueManager:
+    JobQueueManager.register("take_job", callable=job_queue.take)
+    JobQueueManager.register("heartbeat_job", callable=job_queue.heartbeat)
+    JobQueueManager.register("complete_job", callable=job_queue.complete)
+    JobQueueManager.register("fail_job", callable=job_queue.fail)
+
+    return JobQueueManager(address=("", port), authkey=auth_key)
+
+
+def get_job_queue_client(
+    host: str, port: int, auth_key: bytes = b"16-896-375"
+) -> JobQueueManager:
+    JobQueueManager.register("take_job")
+    JobQueueManager.register("heartbeat_job")
+    JobQueueManager.register("complete_job")
+    JobQueueManager.register("fail_job")
+
+    return JobQueueManager(address=(host, port), authkey=auth_key)
+
+
+def serve_job_queue(
+    job_queue: JobQueue, port: int, auth_key: bytes = b"16-896-375"
+) -> threading.Thread:
+    """Serve the queue to the workers from a background thread of this process, to
+    collect their features in it"""
+    server = get_job_queue_server_manager(job_queue, port, auth_key).get_server()
+
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+
+    return server_thread
+
+
+def run_worker(
+    host: str,
+    port: int,
+    run_job: Callable[[ExtractionJob], pd.DataFrame],
+    auth_key: bytes = b"16-896-375",
+    heartbeat_interval: float = 10.0,
+    worker: Optional[str] = None,
+) -> int:
+    """
+    Run the jobs of the queue, one after the other, until none is left.
+
+    Args:
+        run_job: extract the features of a job.
+        heartbeat_interval: seconds between two heartbeats, to be shorter than the lease
+            timeout of the queue.
+        worker: name of the worker, default to `<host name>:<process id>`.
+
+    Returns:
+        The number of jobs run by this worker.
+    """
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+
+    client = get_job_queue_client(host, port, auth_key)
+    client.connect()
+
+    jobs_count = 0
+    while True:
+        try:
+            job: Optional[ExtractionJob] = client.take_job(worker)._getvalue()
+        except (EOFError, ConnectionError):
+            # the queue stopped once all the jobs were finished
+            break
+
+        if job is None:
+            break
+
+        stop_heartbeat = threading.Event()
+
+        def _heartbeat():
+            while not stop_heartbeat.wait(heartbeat_interval):
+                if not client.heartbeat_job(job.job_id, worker)._getvalue():
+                    logger.warning(f"Job {job.job_id} was handed out again")
+                    return
+
+        heartbeat_thread = threading.Thread(target=_heartbeat, daemon=True)
+        heartbeat_thread.start()
+
+        print(
+            f"[{worker}] job {job.job_id}: {job.model}, "
+            f"{len(job.sequences)} sequences (attempt {job.attempts})"
+        )
+        try:
+            features = run_job(job)
+        except Exception as e:
+            logger.exception(f"Job {job.job_id} failed")
+            client.fail_job(job.job_id, worker, repr(e))
+        else:
+            client.complete_job(job.job_id, features)
+        finally:
+            stop_heartbeat.set()
+            heartbeat_thread.join()
+
+        jobs_count += 1
+
+    return jobs_count
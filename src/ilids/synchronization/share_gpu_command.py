@@ -15,6 +15,19 @@ def serve_gpu_sync(
     port: int = typer.Option(..., "-p", "--port"),
     gpu_count: Optional[int] = typer.Option(None, "--count"),
     available_gpus: Optional[List[int]] = typer.Option(None, "--available"),
+    jobs_per_gpu: int = typer.Option(
+        1, "--jobs-per-gpu", help="Maximum number of jobs running at once on a GPU"
+    ),
+    min_free_memory_mib: Optional[int] = typer.Option(
+        None,
+        "--min-free-memory",
+        help="Free memory (MiB) a GPU needs to get a new job, as reported by NVML",
+    ),
+    lease_timeout: float = typer.Option(
+        60.0,
+        "--lease-timeout",
+        help="Seconds without heartbeat before the GPU of a client is reclaimed",
+    ),
 ):
     # instead of empty list, set to None, which reverts a bit typer's logic
     available_gpus = None if len(available_gpus) == 0 else set(available_gpus)
@@ -29,7 +42,15 @@ def serve_gpu_sync(
     lock = DeleteFileLock(FILE_LOCK_PATH, timeout=1)
 
     with lock:
-        server = get_server_manager(free_gpus, port).get_server()
+        server = get_server_manager(
+            free_gpus,
+            port,
+            jobs_per_gpu=jobs_per_gpu,
+            lease_timeout=lease_timeout,
+            min_free_memory=None
+            if min_free_memory_mib is None
+            else min_free_memory_mib * 2**20,
+        ).get_server()
         print(f"Starting multiprocess Manager on port {port}...")
 
         server.serve_forever()
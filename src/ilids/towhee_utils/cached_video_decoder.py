@@ -1,12 +1,33 @@
+import io
+from collections import OrderedDict
+from dataclasses import dataclass
 from logging import getLogger
-from typing import Dict, List
+from pathlib import Path
+from typing import Dict, List, Optional
 
+import numpy as np
 from towhee import register
 from towhee.operator import PyOperator
 from towhee.types import VideoFrame
 
+from ilids.utils.cache import file_cache_key, get_cache_dir, write_atomically
+
 logger = getLogger(__name__)
 
+DECODED_FRAMES_CACHE_NAMESPACE = "decoded-frames"
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    """Videos served from memory"""
+    spill_hits: int = 0
+    """Videos served from the disk, once evicted from memory"""
+    misses: int = 0
+    """Videos decoded"""
+    evictions: int = 0
+    """Videos evicted from memory"""
+
 
 @register(name="ilids/cached_video_decoder")
 class CachedVideoDecoder(PyOperator):
@@ -20,17 +41,105 @@ class CachedVideoDecoder(PyOperator):
 
     This operator can be used as a checkpoint to serve multiple times the list of frames
     of a decoded video file.
+
+    The memory is bounded by a number of videos and/or a number of bytes: once over, the
+    least recently used videos are evicted. Optionally, the evicted videos are spilled to
+    disk (a uint8 `.npy` file per video, read back memory-mapped and without the
+    timestamps of the frames), instead of being decoded again.
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        spill_to_disk: bool = False,
+        cache_dir: Optional[Path] = None,
+    ):
+        """
+        Args:
+            max_entries: maximum number of videos kept in memory, unbounded by default.
+            max_bytes: maximum size of the frames kept in memory, unbounded by default.
+                The latest video is always kept, even if bigger on its own.
+            spill_to_disk: write the evicted videos to disk.
+            cache_dir: folder of the spilled videos, default to the
+                `DECODED_FRAMES_CACHE_NAMESPACE` folder of
+                `ilids.utils.cache.get_cache_dir`.
+        """
         super().__init__()
-        self.latest_frames: Dict[str, List[VideoFrame]] = dict()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.spill_to_disk = spill_to_disk
+        self.cache_dir = cache_dir
+
+        self.latest_frames: "OrderedDict[str, List[VideoFrame]]" = OrderedDict()
+        # the memory-mapped frames, read back from the disk, don't take any memory
+        self._frames_bytes: Dict[str, int] = dict()
+        self.cached_bytes = 0
+        self.stats = CacheStats()
+
+    def _spill_path(self, path: str) -> Path:
+        if self.cache_dir is None:
+            self.cache_dir = get_cache_dir(DECODED_FRAMES_CACHE_NAMESPACE)
+
+        return self.cache_dir / f"{file_cache_key(Path(path))}.npy"
+
+    def _read_spilled(self, path: str) -> Optional[List[VideoFrame]]:
+        if not self.spill_to_disk:
+            return None
+
+        spill_path = self._spill_path(path)
+        if not spill_path.exists():
+            return None
+
+        return [VideoFrame(frame) for frame in np.load(spill_path, mmap_mode="r")]
+
+    def _spill(self, path: str, frames: List[VideoFrame]):
+        spill_path = self._spill_path(path)
+        if spill_path.exists() or len(frames) == 0:
+            return
+
+        spill_path.parent.mkdir(parents=True, exist_ok=True)
+
+        buffer = io.BytesIO()
+        np.save(buffer, np.stack(frames))
+        write_atomically(spill_path, buffer.getvalue())
+
+    def _is_over_budget(self) -> bool:
+        return (
+            self.max_entries is not None and len(self.latest_frames) > self.max_entries
+        ) or (self.max_bytes is not None and self.cached_bytes > self.max_bytes)
+
+    def _evict(self):
+        # always keep the latest video, just returned
+        while len(self.latest_frames) > 1 and self._is_over_budget():
+            path, frames = self.latest_frames.popitem(last=False)
+            self.cached_bytes -= self._frames_bytes.pop(path)
+            self.stats.evictions += 1
+
+            logger.debug(f"Evicting cached frames of {path}")
+            if self.spill_to_disk:
+                self._spill(path, frames)
 
     def __call__(self, path: str, video: List[VideoFrame]) -> List[VideoFrame]:
         if path in self.latest_frames:
             logger.debug(f"Returning cached frames for {path}")
+            self.stats.hits += 1
+            self.latest_frames.move_to_end(path)
             return self.latest_frames[path]
 
-        self.latest_frames[path] = list(video)
+        frames = self._read_spilled(path)
+        if frames is not None:
+            logger.debug(f"Returning spilled frames for {path}")
+            self.stats.spill_hits += 1
+            frames_bytes = 0
+        else:
+            self.stats.misses += 1
+            frames = list(video)
+            frames_bytes = sum(frame.nbytes for frame in frames)
+
+        self.latest_frames[path] = frames
+        self._frames_bytes[path] = frames_bytes
+        self.cached_bytes += frames_bytes
+        self._evict()
 
-        return self.latest_frames[path]
+        return frames
@@ -2,34 +2,32 @@ import csv
 import logging
 import os
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple, Union
 
 import numpy
 import torch
 from einops import rearrange
+from torchvision.transforms import Compose
 from towhee import register
 from towhee.models.movinet.movinet import create_model
-from towhee.models.utils.video_transforms import get_configs, transform_video
+from towhee.models.utils.video_transforms import (
+    CenterCropVideo,
+    NormalizeVideo,
+    ShortSideScale,
+    UniformTemporalSubsample,
+    get_configs,
+)
 from towhee.operator.base import NNOperator
 from towhee.types.video_frame import VideoFrame
 
-from ilids.towhee_utils.override.movinet_config import get_movinet_transform_config
-from ilids.utils.extended_enums import ExtendedEnum
+from ilids.towhee_utils.override.movinet_config import (
+    MovinetModelName,
+    get_movinet_transform_config,
+)
 
 log = logging.getLogger()
 
 
-class MovinetModelName(str, ExtendedEnum):
-    """Declare a list of all models supported by Movinet."""
-
-    movineta0 = "movineta0"
-    movineta1 = "movineta1"
-    movineta2 = "movineta2"
-    movineta3 = "movineta3"
-    movineta4 = "movineta4"
-    movineta5 = "movineta5"
-
-
 @register(name="ilids/movinet", output_schema=["labels", "scores", "features"])
 class Movinet(NNOperator):
     """
@@ -100,6 +98,28 @@ class Movinet(NNOperator):
             std=self.input_std,
         )
         self.transform_cfgs.update(**get_movinet_transform_config(model_name))
+        if self.skip_preprocess:
+            self.transform_cfgs.update(num_frames=None)
+
+        # same transforms as `towhee.models.utils.video_transforms.VideoTransforms`, but
+        # the frames are only subsampled while still uint8 and then converted to float
+        # at once (see `preprocess`)
+        self.subsample = (
+            UniformTemporalSubsample(self.transform_cfgs["num_frames"])
+            if self.transform_cfgs["num_frames"] is not None
+            else None
+        )
+        self.transform = Compose(
+            [
+                NormalizeVideo(
+                    mean=self.transform_cfgs["mean"],
+                    std=self.transform_cfgs["std"],
+                    inplace=True,
+                ),
+                ShortSideScale(size=self.transform_cfgs["side_size"]),
+                CenterCropVideo(crop_size=self.transform_cfgs["crop_size"]),
+            ]
+        )
         self.model.eval()
 
     def save_model(self):
@@ -112,54 +132,105 @@ class Movinet(NNOperator):
     def supported_model_names(cls) -> List[str]:
         return MovinetModelName.list()
 
-    def __call__(self, video: List[VideoFrame]):
+    def preprocess(
+        self,
+        video: Union[List[VideoFrame], numpy.ndarray],
+        temporal_subsample: bool = True,
+    ) -> torch.Tensor:
         """
         Args:
-            video (`List[VideoFrame]`):
-                Video path in string.
+            video (`List[VideoFrame]` or `numpy.ndarray`):
+                Frames of the video, or all of them in a single uint8 buffer: (T, H, W, C).
+            temporal_subsample (`bool=True`):
+                Flag to keep all the frames, e.g. for a chunk of a streamed video.
 
         Returns:
-            (labels, scores, features)
-                A tuple of lists (labels, scores, features).
+            The model input of the video, on the device: (C, T, H, W), T being the number
+            of frames of the model configuration (unless the preprocessing is skipped).
         """
-        # Convert list of towhee.types.Image to numpy.ndarray in float32
-        video: numpy.ndarray = numpy.stack(
-            [img.astype(numpy.float32) / 255.0 for img in video], axis=0
+        # a single uint8 copy of the frames (none if already in a single buffer)
+        frames = torch.from_numpy(
+            video if isinstance(video, numpy.ndarray) else numpy.stack(video, axis=0)
         )
-        assert len(video.shape) == 4
+        assert len(frames.shape) == 4
         # re-write the following line using einops for readability
         # video = video.transpose(3, 0, 1, 2)  # twhc -> ctwh
-        video = rearrange(video, "t w h c -> c t w h")
+        frames = rearrange(frames, "t w h c -> c t w h")
 
-        # Transform video data given configs
-        if self.skip_preprocess:
-            self.transform_cfgs.update(num_frames=None)
+        if self.subsample is not None and temporal_subsample:
+            frames = self.subsample(frames)
+
+        # only the subsampled uint8 frames are copied to the device, 4 times smaller than
+        # the float32 ones, then converted and scaled in a single step
+        inputs = frames.to(self.device).to(torch.float32).div_(255.0)
+
+        return self.transform(inputs)
 
-        data = transform_video(video=video, **self.transform_cfgs)
-        inputs = data.to(self.device)[None, ...]
+    def predict(
+        self, inputs: torch.Tensor, clean_activation_buffers: bool = True
+    ) -> List[Tuple[List[str], List[float], numpy.ndarray]]:
+        """
+        Args:
+            inputs (`torch.Tensor`):
+                Batch of model inputs: (B, C, T, H, W), see `preprocess`.
+            clean_activation_buffers (`bool=True`):
+                Flag to carry on the stream buffers of the causal model, from the
+                previous chunk of the same video.
+
+        Returns:
+            List[(labels, scores, features)]
+                The labels, scores and features of each video of the batch.
+        """
+        inputs = inputs.to(self.device)
 
-        self.model.clean_activation_buffers()
+        if clean_activation_buffers:
+            self.model.clean_activation_buffers()
 
         feats = self.model.forward_features(
             inputs
-        )  # 1, 480, 1, 1, 1 (480 might change between model variation)
-        outs = self.model.head(feats)  # 1, 600
+        )  # B, 480, 1, 1, 1 (480 might change between model variation)
+        outs = self.model.head(feats).flatten(1)  # B, 600
 
-        features = outs.flatten(1).cpu().squeeze(0).detach().numpy()  # 600
+        features = outs.cpu().detach().numpy()  # B, 600
 
         post_act = torch.nn.Softmax(dim=1)
-        preds = post_act(outs)  # 1, 600 (sum of each element_i = 1.0)
+        preds = post_act(outs)  # B, 600 (sum of each element_i = 1.0)
         pred_scores, pred_classes = preds.topk(
             k=self.topk
-        )  # both returned tuple have shape: 1, topk
-        labels = [
-            self.classmap[int(i)] for i in pred_classes[0]
-        ]  # list of string with topk elements
-        scores = [
-            round(float(x), 5) for x in pred_scores[0]
-        ]  # float percentages (e.g. 0.34 -> 34%; sum doesn't sum to 1, as topk from preds)
-
-        return labels, scores, features
+        )  # both returned tuple have shape: B, topk
+
+        return [
+            (
+                # list of string with topk elements
+                [self.classmap[int(i)] for i in pred_classes[b]],
+                # float percentages (e.g. 0.34 -> 34%; sum doesn't sum to 1, as topk
+                # from preds)
+                [round(float(x), 5) for x in pred_scores[b]],
+                features[b],  # 600
+            )
+            for b in range(len(features))
+        ]
+
+    def reset_temporal_pooling(self):
+        """
+        Only reset the cumulative average pooling of the causal model, for the next
+        predictions to average the frames from now on, while its other stream buffers
+        carry on.
+        """
+        assert self.causal
+        self.model.cgap.reset_activation()
+
+    def __call__(self, video: List[VideoFrame]):
+        """
+        Args:
+            video (`List[VideoFrame]`):
+                Frames of the video.
+
+        Returns:
+            (labels, scores, features)
+                A tuple of lists (labels, scores, features).
+        """
+        return self.predict(self.preprocess(video)[None, ...])[0]
 
 
 def read_kinetics_600_classmap() -> Dict[int, str]:
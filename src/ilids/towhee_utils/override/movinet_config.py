@@ -1,8 +1,30 @@
 import logging
 from typing import Dict
 
+from ilids.utils.extended_enums import ExtendedEnum
+
 logger = logging.getLogger(__name__)
 
+
+class MovinetModelName(str, ExtendedEnum):
+    """Declare a list of all models supported by Movinet."""
+
+    movineta0 = "movineta0"
+    movineta1 = "movineta1"
+    movineta2 = "movineta2"
+    movineta3 = "movineta3"
+    movineta4 = "movineta4"
+    movineta5 = "movineta5"
+
+
+MOVINET_STREAM_MODEL_NAMES = [
+    MovinetModelName.movineta0,
+    MovinetModelName.movineta1,
+    MovinetModelName.movineta2,
+]
+"""Models with pretrained weights for the causal (stream) variant"""
+
+
 # Inspired from: https://github.com/Atze00/MoViNet-pytorch
 # But also: https://github.com/tensorflow/models/tree/master/official/projects/movinet/configs/yaml
 _movinet_transform_cfgs = dict(
@@ -0,0 +1,56 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+CACHE_DIR_ENV_VARIABLE = "ILIDS_CACHE_DIR"
+"""Environment variable to change the root folder of all the caches (default: ~/.cache/ilids)"""
+
+
+def get_cache_dir(namespace: str) -> Path:
+    """Folder in which the cached values of the given namespace are persisted, created if
+    missing."""
+    cache_root = Path(
+        os.environ.get(CACHE_DIR_ENV_VARIABLE, Path.home() / ".cache" / "ilids")
+    )
+
+    cache_dir = cache_root / namespace
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    return cache_dir
+
+
+def file_cache_key(file_path: Path, *extra_keys) -> str:
+    """Key identifying a version of a file, using its resolved path, last modification time
+    and size. Any modification of the file produces a new key, which invalidates the cached
+    values of the previous version.
+
+    Args:
+        file_path: the file to identify.
+        extra_keys: other values the cached value depends on (parameters, ...).
+    """
+    stat_result = os.stat(file_path)
+
+    key = ":".join(
+        [
+            str(file_path.resolve()),
+            str(stat_result.st_mtime_ns),
+            str(stat_result.st_size),
+            *(str(extra_key) for extra_key in extra_keys),
+        ]
+    )
+
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def write_atomically(path: Path, data: bytes) -> None:
+    """Write the file through a temporary file renamed at the end, for concurrent
+    processes to never read a partially written file."""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
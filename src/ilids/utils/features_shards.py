@@ -0,0 +1,154 @@
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+import numpy as np
+import pandas as pd
+
+from ilids.utils.cache import write_atomically
+from ilids.utils.persistence_method import NpyPandasPersistenceMethod
+
+
+class ShardsMetadataMismatch(ValueError):
+    """The shards of a folder were written by another extraction"""
+
+
+class FeaturesShardsWriter:
+    """
+    Append-only writer of the extracted features, flushing them every `flush_every`
+    appends (e.g. batches) as a new shard in a folder: a `.npy` file and its index (see
+    `NpyPandasPersistenceMethod`).
+
+    If the extraction dies halfway, the shards already flushed are kept: a new writer
+    on the same folder lists the sequences already extracted, to only process the
+    missing ones. The metadata of the extraction (model, options, ...) is written next
+    to the shards, for the writer of another extraction to refuse them.
+    """
+
+    METADATA_FILE_NAME = "metadata.json"
+
+    def __init__(
+        self,
+        folder: Path,
+        flush_every: int = 10,
+        index_name: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        Args:
+            folder: folder of the shards, created if missing.
+            flush_every: number of appends buffered before writing a new shard.
+            index_name: name of the index of the DataFrame returned by `read`.
+            metadata: JSON serializable description of the extraction, which must be
+                the same as the one of the shards already in the folder, if any.
+
+        Raises:
+            ShardsMetadataMismatch: if the folder has shards of another extraction.
+        """
+        assert flush_every > 0
+
+        self.folder = folder
+        self.flush_every = flush_every
+        self.index_name = index_name
+
+        self._persistence = NpyPandasPersistenceMethod()
+        self._pending_paths: List[str] = []
+        self._pending_features: List[np.ndarray] = []
+        self._pending_appends = 0
+
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self._check_metadata(metadata or {})
+
+    def _check_metadata(self, metadata: Dict[str, Any]):
+        metadata_path = self.folder / self.METADATA_FILE_NAME
+        # as read back from the file
+        metadata = json.loads(json.dumps(metadata))
+
+        if metadata_path.exists():
+            shards_metadata = json.loads(metadata_path.read_text())
+        elif len(self._shard_files()) > 0:
+            # shards written before the metadata
+            shards_metadata = None
+        else:
+            write_atomically(metadata_path, json.dumps(metadata, indent=2).encode())
+            return
+
+        if shards_metadata != metadata:
+            raise ShardsMetadataMismatch(
+                f"The shards in {str(self.folder)} come from another extraction: "
+                f"{shards_metadata}, instead of {metadata}"
+            )
+
+    def __enter__(self) -> "FeaturesShardsWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # also keep what was extracted before an error
+        self.flush()
+
+    def _shard_files(self) -> List[Path]:
+        # the temporary files, starting with a ".", aren't listed
+        return sorted(self.folder.glob("shard-*.npy"))
+
+    def extracted_paths(self) -> Set[str]:
+        """Paths of the sequences in the shards already flushed"""
+        return {
+            path
+            for shard_file in self._shard_files()
+            for path in pd.read_csv(
+                self._persistence.index_path(shard_file), header=None
+            )[0]
+        }
+
+    def append(self, paths: Sequence[str], features: np.ndarray):
+        # copy, as the features might be a view on a buffer reused for the next batch
+        self._pending_paths.extend(paths)
+        self._pending_features.append(np.array(features, dtype=np.float32))
+        self._pending_appends += 1
+
+        if self._pending_appends >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        """Write the pending features as a new shard"""
+        if len(self._pending_paths) > 0:
+            shard_name = f"shard-{len(self._shard_files()):05d}.npy"
+
+            # write the shard under a temporary name, then rename its index and lastly
+            # its values: a shard is only listed once completely written
+            tmp_shard_file = self.folder / f".{shard_name}"
+            self._persistence.persist(
+                tmp_shard_file,
+                pd.DataFrame(
+                    np.concatenate(self._pending_features), index=self._pending_paths
+                ),
+            )
+
+            shard_file = self.folder / shard_name
+            os.replace(
+                self._persistence.index_path(tmp_shard_file),
+                self._persistence.index_path(shard_file),
+            )
+            os.replace(tmp_shard_file, shard_file)
+
+        self._pending_paths = []
+        self._pending_features = []
+        self._pending_appends = 0
+
+    def read(self) -> pd.DataFrame:
+        """All the features flushed so far, in a single DataFrame"""
+        shards = [
+            self._persistence.read(shard_file, mmap_mode=None)
+            for shard_file in self._shard_files()
+        ]
+
+        df = pd.concat(shards) if len(shards) > 0 else pd.DataFrame()
+        df.index.name = self.index_name
+
+        return df
+
+    def remove(self):
+        """Delete the shards, e.g. once merged into the final output"""
+        shutil.rmtree(self.folder, ignore_errors=True)
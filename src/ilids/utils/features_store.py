@@ -0,0 +1,57 @@
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+class FeaturesStore:
+    """
+    Features of the sequences, written batch after batch into a single preallocated
+    float32 matrix (sequences x features), along with the path of each row.
+
+    Avoids building a Python object per sequence (dict of rows, lists of floats) before
+    converting them all to a DataFrame at the end.
+    """
+
+    def __init__(
+        self, capacity: int, features_size: int, index_name: Optional[str] = None
+    ):
+        """
+        Args:
+            capacity: maximum number of sequences.
+            features_size: number of features per sequence.
+            index_name: name of the index of the DataFrame (see `to_dataframe`).
+        """
+        self.features = np.empty((capacity, features_size), dtype=np.float32)
+        self.paths: List[str] = []
+        self.index_name = index_name
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def reserve(self, paths: Sequence[str]) -> np.ndarray:
+        """Reserve the rows of the given paths, returning them to be written in place
+        (possibly later, e.g. once an asynchronous copy completed)."""
+        start = len(self.paths)
+        end = start + len(paths)
+
+        if end > len(self.features):
+            raise ValueError(
+                f"Not enough capacity ({len(self.features)}) to store {end} sequences"
+            )
+
+        self.paths.extend(paths)
+
+        return self.features[start:end]
+
+    def append(self, paths: Sequence[str], features: np.ndarray):
+        self.reserve(paths)[:] = features
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """DataFrame of the stored features (without copy), indexed by path and with one
+        column per feature"""
+        return pd.DataFrame(
+            self.features[: len(self)],
+            index=pd.Index(self.paths, name=self.index_name),
+            copy=False,
+        )
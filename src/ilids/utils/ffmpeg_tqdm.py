@@ -15,8 +15,7 @@ import os
 import re
 import shutil
 import subprocess
-from collections import defaultdict
-from typing import Dict, Optional
+from typing import Optional
 
 from tqdm import tqdm
 
@@ -39,74 +38,6 @@ def parse_ffmpeg_duration(dt: str) -> float:
     return hour * (60**2) + minute * 60 + seconds
 
 
-def iter_audio(stderr):
-    """
-    Goes over the audio part of the ffmpeg output and gets the mapping index and
-    the frequency.
-
-    Returns
-    ---
-
-    `Generator[tuple(str, int)]`
-
-    """
-
-    def it():
-        """
-        A generator, that is made for sorting and sending to another generator.
-        """
-        for match in re.finditer(b"Stream #(\\d+):(\\d+): Audio:.+ (\\d+) Hz", stderr):
-            program, stream_id, freq = (_.decode() for _ in match.groups())
-            yield "{}:a:{}".format(program, stream_id), int(freq)
-
-    yield from sorted(it(), key=lambda x: x[1], reverse=True)
-
-
-def analyze_stream(logger: logging.Logger, url: str, headers: Optional[Dict] = None):
-    """
-    Converts the output of `ffmpeg -i $URL` to a partial stream info default dict.
-
-    In logging level DEBUG, it shows the ffmpeg output.
-
-    Returns
-    ---
-
-    `collections.defaultdict`
-
-    """
-    if headers is None:
-        headers = dict()
-
-    info = defaultdict(lambda: defaultdict(lambda: defaultdict(defaultdict)))
-
-    args = [executable, "-hide_banner"]
-
-    if headers:
-        args.extend(
-            ("-headers", "\r\n".join("{}:{}".format(k, v) for k, v in headers.items()))
-        )
-
-    args.extend(("-i", url))
-
-    logger.debug("Calling PIPE child process for ffmpeg: {}".format(args))
-    process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-
-    stderr = b"".join(iter(process.stdout))
-
-    duration = re.search(b"Duration: ((?:\\d+:)+\\d+)", stderr)
-    if duration:
-        info["duration"] = parse_ffmpeg_duration(duration.group(1).decode())
-
-    audio = [*iter_audio(stderr)]
-
-    for match in re.finditer(b"Stream #(\\d+):(\\d+): Video: .+x(\\d+)", stderr):
-        program, stream_index, resolution = (int(_.decode()) for _ in match.groups())
-        info["streams"][program][stream_index]["quality"] = resolution
-        info["streams"][program][stream_index]["audio"] = audio
-
-    return info
-
-
 def get_last(iterable):
     """
     Gets the last element from the iterable. Pretty self-explanatory.
@@ -0,0 +1,89 @@
+from typing import Sequence, Tuple
+
+import numpy as np
+
+
+class ThresholdSweep:
+    """
+    Confusion matrices of binary scores for any number of thresholds, a sample being
+    predicted positive when its score is at least the threshold.
+
+    The scores are sorted once: the confusion matrix at a threshold is then read from
+    the cumulative count of positive samples below it, instead of comparing every score
+    with each threshold.
+    """
+
+    def __init__(self, y_true: np.ndarray, y_score: np.ndarray):
+        y_true = np.asarray(y_true, dtype=bool)
+        y_score = np.asarray(y_score)
+        assert y_true.shape == y_score.shape
+
+        order = np.argsort(y_score, kind="stable")
+        self._sorted_scores = y_score[order]
+        # positive samples among the i lowest scores
+        self._positives_below = np.concatenate(
+            [[0], np.cumsum(y_true[order], dtype=np.int64)]
+        )
+
+        self.positives = int(self._positives_below[-1])
+        self.negatives = len(y_true) - self.positives
+
+    def thresholds(self) -> np.ndarray:
+        """Distinct scores, in decreasing order: every threshold leading to a different
+        confusion matrix"""
+        return np.unique(self._sorted_scores)[::-1]
+
+    def confusion_matrices(self, thresholds: Sequence[float]) -> np.ndarray:
+        """
+        Returns:
+            int array (thresholds x 2 x 2), each confusion matrix being [[TP, FN], [FP, TN]]
+        """
+        below = np.searchsorted(self._sorted_scores, thresholds, side="left")
+
+        FN = self._positives_below[below]
+        TN = below - FN
+        TP = self.positives - FN
+        FP = self.negatives - TN
+
+        return np.stack([TP, FN, FP, TN], axis=-1).reshape((-1, 2, 2))
+
+
+def cost_curves(
+    confusion_matrices: np.ndarray, cost_fn_ratios: Sequence[float]
+) -> np.ndarray:
+    """
+    Cost of each confusion matrix, for each cost of a false negative X, a false positive
+    costing 1 - X:
+
+        [[TP, FN],  x  [[C(TP) = 0,     C(FN) = X],  = Cost(T)
+         [FP, TN]]      [C(FP) = 1 - X, C(TN) = 0]]
+
+    Returns:
+        array (cost ratios x confusion matrices)
+    """
+    cost_fn_ratios = np.asarray(cost_fn_ratios)[:, np.newaxis]
+
+    FN = confusion_matrices[:, 0, 1]
+    FP = confusion_matrices[:, 1, 0]
+
+    return cost_fn_ratios * FN + (1 - cost_fn_ratios) * FP
+
+
+def confusion_matrix_fn_equals_0(
+    y_true: np.ndarray, y_score: np.ndarray
+) -> Tuple[int, int, int, int]:
+    """Confusion matrix with the highest threshold without false negatives: the lowest
+    score of the positive samples.
+
+    Returns:
+        TP, FN, FP, TN
+    """
+    y_true = np.asarray(y_true, dtype=bool)
+    y_score = np.asarray(y_score)
+
+    y_pred = y_score >= y_score[y_true].min()
+
+    TP = int(np.count_nonzero(y_pred & y_true))
+    FP = int(np.count_nonzero(y_pred & ~y_true))
+
+    return TP, 0, FP, len(y_true) - TP - FP
@@ -1,7 +1,8 @@
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Any
+from typing import Any, Dict, List, Optional, Sequence
 
+import numpy as np
 import pandas as pd
 
 
@@ -16,12 +17,196 @@ class PandasPersistenceMethod(PersistenceMethod, ABC):
     def persist(self, path: Path, df: pd.DataFrame):
         ...
 
+    @abstractmethod
+    def read(self, path: Path, columns: Optional[Sequence[Any]] = None) -> pd.DataFrame:
+        """Read back the DataFrame, optionally only the given columns"""
+        ...
+
+
+def _to_float32(df: pd.DataFrame) -> pd.DataFrame:
+    """Downcast the float columns to float32, the precision of the extracted features"""
+    float_columns = df.select_dtypes(include="floating").columns
+    return df.astype({column: np.float32 for column in float_columns})
+
+
+def _restore_int_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """The columnar formats only support string column names, while the features columns
+    are their integer index"""
+    if all(isinstance(column, str) and column.isdigit() for column in df.columns):
+        df.columns = df.columns.astype(int)
+    return df
+
 
 class CsvPandasPersistenceMethod(PandasPersistenceMethod):
     def persist(self, path: Path, df: pd.DataFrame):
         df.to_csv(path)
 
+    def read(self, path: Path, columns: Optional[Sequence[Any]] = None) -> pd.DataFrame:
+        df = _restore_int_columns(pd.read_csv(path, index_col=0))
+        return df if columns is None else df[list(columns)]
+
 
 class PicklePandasPersistenceMethod(PandasPersistenceMethod):
     def persist(self, path: Path, df: pd.DataFrame):
         df.to_pickle(str(path))
+
+    def read(self, path: Path, columns: Optional[Sequence[Any]] = None) -> pd.DataFrame:
+        df = pd.read_pickle(str(path))
+        return df if columns is None else df[list(columns)]
+
+
+class ParquetPandasPersistenceMethod(PandasPersistenceMethod):
+    """Columnar storage of the DataFrame (index included), with its float columns as
+    float32 and compressed. Only the requested columns are read back."""
+
+    def __init__(self, compression: str = "zstd"):
+        self.compression = compression
+
+    def persist(self, path: Path, df: pd.DataFrame):
+        _to_float32(df).rename(columns=str).to_parquet(
+            path, compression=self.compression
+        )
+
+    def read(self, path: Path, columns: Optional[Sequence[Any]] = None) -> pd.DataFrame:
+        return _restore_int_columns(
+            pd.read_parquet(
+                path,
+                columns=None if columns is None else [str(c) for c in columns],
+            )
+        )
+
+
+class FeatherPandasPersistenceMethod(PandasPersistenceMethod):
+    """Arrow IPC (Feather v2) storage of the DataFrame, with its float columns as float32
+    and compressed. Only the requested columns are read back.
+
+    As Feather doesn't store the index, it is persisted as the first column."""
+
+    def __init__(self, compression: str = "zstd"):
+        self.compression = compression
+
+    def persist(self, path: Path, df: pd.DataFrame):
+        _to_float32(df).rename(columns=str).reset_index().to_feather(
+            path, compression=self.compression
+        )
+
+    def read(self, path: Path, columns: Optional[Sequence[Any]] = None) -> pd.DataFrame:
+        index_column = pd.read_feather(path, columns=[0]).columns[0]
+
+        df = pd.read_feather(
+            path,
+            columns=None
+            if columns is None
+            else [index_column, *(str(c) for c in columns)],
+        ).set_index(index_column)
+
+        if index_column == "index":
+            # unnamed index, see `DataFrame.reset_index`
+            df.index.name = None
+
+        return _restore_int_columns(df)
+
+
+class NpyPandasPersistenceMethod(PandasPersistenceMethod):
+    """Persist the values of a numerical DataFrame as a single contiguous float32 array
+    in a `.npy` file, and its index in a `.index.csv` file next to it. The columns are
+    expected to be a range index (one per feature), and the index name isn't kept."""
+
+    @staticmethod
+    def index_path(path: Path) -> Path:
+        return path.with_suffix(".index.csv")
+
+    def persist(self, path: Path, df: pd.DataFrame):
+        np.save(path, np.ascontiguousarray(df.to_numpy(dtype=np.float32)))
+        df.index.to_series().to_csv(self.index_path(path), index=False, header=False)
+
+    def read(
+        self,
+        path: Path,
+        columns: Optional[Sequence[Any]] = None,
+        mmap_mode: Optional[str] = "r",
+    ) -> pd.DataFrame:
+        """Read back the DataFrame, its values being memory-mapped by default (then,
+        only the requested columns are actually read)"""
+        values = np.load(path, mmap_mode=mmap_mode)
+        index = pd.read_csv(self.index_path(path), header=None)[0].to_numpy()
+
+        if columns is None:
+            return pd.DataFrame(values, index=pd.Index(index), copy=False)
+
+        return pd.DataFrame(
+            values[:, list(columns)], index=pd.Index(index), columns=list(columns)
+        )
+
+
+class NpzPandasPersistenceMethod(PandasPersistenceMethod):
+    """Persist the values of a numerical DataFrame as a float32 array, along with its
+    index, in a single (compressed) `.npz` file. The columns are expected to be a range
+    index (one per feature), and the index name isn't kept."""
+
+    def __init__(self, compressed: bool = True):
+        self.compressed = compressed
+
+    def persist(self, path: Path, df: pd.DataFrame):
+        save = np.savez_compressed if self.compressed else np.savez
+        save(
+            path,
+            values=df.to_numpy(dtype=np.float32),
+            index=df.index.to_numpy(dtype=str),
+        )
+
+    def read(self, path: Path, columns: Optional[Sequence[Any]] = None) -> pd.DataFrame:
+        with np.load(path) as npz:
+            values = npz["values"]
+            index = npz["index"]
+
+        if columns is None:
+            return pd.DataFrame(values, index=pd.Index(index), copy=False)
+
+        return pd.DataFrame(
+            values[:, list(columns)], index=pd.Index(index), columns=list(columns)
+        )
+
+
+PANDAS_PERSISTENCE_METHODS: Dict[str, type] = {
+    ".csv": CsvPandasPersistenceMethod,
+    ".pkl": PicklePandasPersistenceMethod,
+    ".parquet": ParquetPandasPersistenceMethod,
+    ".feather": FeatherPandasPersistenceMethod,
+    ".arrow": FeatherPandasPersistenceMethod,
+    ".npy": NpyPandasPersistenceMethod,
+    ".npz": NpzPandasPersistenceMethod,
+}
+"""Persistence method of a DataFrame, from the extension of its file"""
+
+
+def get_pandas_persistence_method(path: Path) -> PandasPersistenceMethod:
+    if path.suffix not in PANDAS_PERSISTENCE_METHODS:
+        raise NotImplementedError(f"No implemented method for extension {path.suffix}")
+
+    return PANDAS_PERSISTENCE_METHODS[path.suffix]()
+
+
+FEATURES_FILE_EXTENSIONS = [".parquet", ".feather", ".arrow", ".npy", ".npz", ".pkl"]
+"""Extensions of the persisted features, the columnar formats first, as the quickest to
+read. CSV is left out, as the results folders also contain CSV files of metrics."""
+
+
+def find_pandas_persisted_file(
+    folder: Path, stem: str, extensions: Optional[List[str]] = None
+) -> Path:
+    """First existing file `folder/stem.<extension>`, following the order of the given
+    extensions (default: `FEATURES_FILE_EXTENSIONS`)"""
+    extensions = extensions or FEATURES_FILE_EXTENSIONS
+
+    for extension in extensions:
+        path = folder / f"{stem}{extension}"
+        if path.exists():
+            return path
+
+    raise FileNotFoundError(f"No persisted file for {stem} in {str(folder)}")
+
+
+def read_pandas(path: Path, columns: Optional[Sequence[Any]] = None) -> pd.DataFrame:
+    """Read a persisted DataFrame, with the method matching its extension"""
+    return get_pandas_persistence_method(path).read(path, columns=columns)
@@ -21,17 +21,17 @@ class ProgressParallel(joblib.Parallel):
         **tqdm_kwargs
     ):
         super().__init__(
-            n_jobs,
-            backend,
-            verbose,
-            timeout,
-            pre_dispatch,
-            batch_size,
-            temp_folder,
-            max_nbytes,
-            mmap_mode,
-            prefer,
-            require,
+            n_jobs=n_jobs,
+            backend=backend,
+            verbose=verbose,
+            timeout=timeout,
+            pre_dispatch=pre_dispatch,
+            batch_size=batch_size,
+            temp_folder=temp_folder,
+            max_nbytes=max_nbytes,
+            mmap_mode=mmap_mode,
+            prefer=prefer,
+            require=require,
         )
         self._tqdm_kwargs = tqdm_kwargs
 
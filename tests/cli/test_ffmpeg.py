@@ -0,0 +1,107 @@
+import subprocess
+from pathlib import Path
+
+import pytest
+from hamcrest import *
+
+from ilids.cli.ffmpeg import (
+    FramesWindow,
+    _ffmpeg_scale,
+    _ffmpeg_select,
+    _ffmpeg_setpts,
+    scale_compress_select_sequence,
+    scale_compress_select_sequences,
+)
+
+
+def _frames_md5(video_path: Path) -> str:
+    process = subprocess.run(
+        ["ffmpeg", "-i", str(video_path), "-f", "framemd5", "-"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        check=True,
+    )
+
+    # skip the header, only keep the lines with the hash of each frame
+    return "\n".join(
+        line
+        for line in process.stdout.decode().splitlines()
+        if not line.startswith("#")
+    )
+
+
+def _select_reference_frames(
+    input_video_path: Path, output_video_path: Path, frames_window: FramesWindow
+):
+    """Extract the frames of the window by evaluating a 'select=eq(n,...)+...'
+    expression on every frame of the input video"""
+    subprocess.run(
+        [
+            "ffmpeg",
+            "-i",
+            str(input_video_path),
+            "-frames:v",
+            str(len(frames_window)),
+            "-vf",
+            f"select={_ffmpeg_select(frames_window.frames_sequence())},setpts={_ffmpeg_setpts(25)},{_ffmpeg_scale(224)}",
+            "-vcodec",
+            "libx264",
+            str(output_video_path),
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        check=True,
+    )
+
+
+@pytest.mark.parametrize(
+    "frames_window",
+    [
+        FramesWindow(start_frame=0, total_frames=250, stride=12),
+        FramesWindow(start_frame=1150, total_frames=400, stride=12),
+        FramesWindow(start_frame=1337, total_frames=97, stride=8),
+    ],
+)
+def test_scale_compress_select_sequence__same_frames_as_select_eq(
+    create_sample_video, tmp_path: Path, frames_window: FramesWindow
+):
+    input_video_path = create_sample_video(80, (720, 576), 25, ".mov")
+
+    reference_output = tmp_path / "reference.mov"
+    _select_reference_frames(input_video_path, reference_output, frames_window)
+
+    output = tmp_path / "output.mov"
+    returncode = scale_compress_select_sequence(
+        input_video_path, output, frames_window, 25
+    )
+
+    assert returncode == 0
+
+    assert_that(_frames_md5(output), is_(equal_to(_frames_md5(reference_output))))
+
+
+def test_scale_compress_select_sequences__same_frames_as_select_eq(
+    create_sample_video, tmp_path: Path
+):
+    input_video_path = create_sample_video(80, (720, 576), 25, ".mov")
+
+    frames_windows = [
+        FramesWindow(start_frame=1150, total_frames=400, stride=12),
+        FramesWindow(start_frame=300, total_frames=250, stride=12),
+        FramesWindow(start_frame=1200, total_frames=101, stride=12),
+    ]
+
+    sequences = [
+        (tmp_path / f"output_{i}.mov", frames_window)
+        for i, frames_window in enumerate(frames_windows)
+    ]
+
+    returncode = scale_compress_select_sequences(input_video_path, sequences, 25)
+
+    assert returncode == 0
+
+    for i, (output, frames_window) in enumerate(sequences):
+        reference_output = tmp_path / f"reference_{i}.mov"
+        _select_reference_frames(input_video_path, reference_output, frames_window)
+
+        assert_that(_frames_md5(output), is_(equal_to(_frames_md5(reference_output))))
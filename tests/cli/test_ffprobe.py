@@ -1,10 +1,11 @@
 import glob
 from pathlib import Path
+from unittest.mock import patch
 
 import pytest
 from hamcrest import *
 
-from ilids.cli.ffprobe import get_stream_info
+from ilids.cli.ffprobe import get_duration, get_raw_stream_info, get_stream_info
 
 
 @pytest.mark.szte_files(("video", "video_folder"))
@@ -17,3 +18,24 @@ def test_ffprobe(video_folder: Path):
 
     assert_that(len(ffprobe.streams), is_(1))
     assert_that(ffprobe.format.filename, ends_with(".mov"))
+
+
+def test_get_stream_info__cached(tmp_path: Path):
+    video = tmp_path / "video.mov"
+    video.write_bytes(b"not really a video")
+
+    raw_json = '{"streams": [], "format": {"duration": "12.5"}}'
+
+    with patch(
+        "ilids.cli.ffprobe._get_stream_info_with_ffprobe", return_value=raw_json
+    ) as ffprobe_mock:
+        assert_that(get_duration(video), is_(close_to(12.5, 0.0001)))
+        assert_that(get_raw_stream_info(video), is_(equal_to(raw_json)))
+
+        ffprobe_mock.assert_called_once()
+
+        # a modified file isn't served from the cache anymore
+        video.write_bytes(b"definitely not a video")
+        get_raw_stream_info(video)
+
+        assert_that(ffprobe_mock.call_count, is_(2))
@@ -1,10 +1,18 @@
+import contextlib
 from pathlib import Path
+from typing import List, Optional, Set
 
+import numpy as np
 import pandas as pd
 import pytest
+from hamcrest import *
 from typer.testing import CliRunner
 
+from ilids.commands import experiments
 from ilids.commands.experiments import typer_app
+from ilids.synchronization import alternate_device, job_queue
+from ilids.synchronization.job_queue import ExtractionJob
+from ilids.utils.features_shards import FeaturesShardsWriter, ShardsMetadataMismatch
 
 runner = CliRunner(mix_stderr=False)
 
@@ -37,3 +45,154 @@ def test_actionclip(actionclip_sequences: Path, actionclip_ckpt: Path, tmp_path:
 
     assert len(df) == 2
     assert len(df.columns) == 512, df.columns
+
+
+class FakeActionClipExtractor:
+    """Extract the features of each sequence as its row number in the CSV, failing after
+    `interrupt_after` sequences"""
+
+    def __init__(self, interrupt_after: Optional[int] = None):
+        self.interrupt_after = interrupt_after
+        self.extracted_sequences: List[str] = []
+
+    def __call__(
+        self,
+        model_pretrained_checkpoint: Path,
+        list_input_sequences_file_csv: Path,
+        device,
+        exclude_sequences: Set[str],
+        features_writer: FeaturesShardsWriter,
+        **kwargs,
+    ):
+        sequences = pd.read_csv(list_input_sequences_file_csv)["sequence"]
+        for row, sequence in enumerate(sequences):
+            if sequence in exclude_sequences:
+                continue
+            if len(self.extracted_sequences) == self.interrupt_after:
+                raise RuntimeError("Interrupted")
+
+            self.extracted_sequences.append(sequence)
+            features_writer.append([sequence], np.full((1, 4), row))
+
+
+def test_actionclip__interrupted_resumed_incremental(monkeypatch, tmp_path: Path):
+    checkpoint = tmp_path / "vit-b-16-8f.pt"
+    checkpoint.write_bytes(b"weights")
+
+    sequences_csv = tmp_path / "sequences.csv"
+    pd.DataFrame({"sequence": ["a", "b", "c", "d"], "frame_count": 10}).to_csv(
+        sequences_csv, index=False
+    )
+
+    output_path = tmp_path / "output.pkl"
+    shards_folder = tmp_path / "output.pkl.shards"
+
+    def run(extractor: FakeActionClipExtractor, *options: str):
+        monkeypatch.setattr(experiments, "_extract_actionclip_features", extractor)
+        return runner.invoke(
+            typer_app,
+            [
+                "actionclip",
+                str(checkpoint),
+                str(sequences_csv),
+                str(output_path),
+                "--flush-every",
+                "1",
+                *options,
+            ],
+        )
+
+    # interrupted: the features extracted so far are kept in the shards only
+    result = run(FakeActionClipExtractor(interrupt_after=2))
+
+    assert_that(result.exit_code, is_not(0))
+    assert_that(output_path.exists(), is_(False))
+    assert_that(shards_folder.exists(), is_(True))
+
+    # another extraction doesn't resume them
+    result = run(FakeActionClipExtractor(), "--normalize")
+
+    assert_that(result.exit_code, is_not(0))
+    assert_that(result.exception, is_(instance_of(ShardsMetadataMismatch)))
+
+    # the same one only extracts the missing sequences
+    extractor = FakeActionClipExtractor()
+    result = run(extractor)
+
+    assert result.exit_code == 0, result.stdout
+    assert_that(extractor.extracted_sequences, is_(["c", "d"]))
+    assert_that(shards_folder.exists(), is_(False))
+
+    df = pd.read_pickle(output_path)
+    assert_that(list(df.index), is_(["a", "b", "c", "d"]))
+    assert_that(df[0].tolist(), is_([0.0, 1.0, 2.0, 3.0]))
+
+    # incremental: only the new sequences are extracted and added to the output
+    pd.DataFrame({"sequence": ["a", "b", "c", "d", "e"], "frame_count": 10}).to_csv(
+        sequences_csv, index=False
+    )
+    extractor = FakeActionClipExtractor()
+    result = run(extractor, "--incremental")
+
+    assert result.exit_code == 0, result.stdout
+    assert_that(extractor.extracted_sequences, is_(["e"]))
+    assert_that(list(pd.read_pickle(output_path).index), is_(["a", "b", "c", "d", "e"]))
+
+    # restart: the shards of an interrupted run are dropped
+    run(FakeActionClipExtractor(interrupt_after=1), "-f")
+    extractor = FakeActionClipExtractor()
+    result = run(extractor, "-f", "--restart")
+
+    assert result.exit_code == 0, result.stdout
+    assert_that(extractor.extracted_sequences, is_(["a", "b", "c", "d", "e"]))
+
+
+def test_queue_worker__models_and_device_reused_across_jobs(monkeypatch):
+    jobs = [
+        ExtractionJob(0, "a.pt", [{"sequence": "s0", "frame_count": 10}]),
+        ExtractionJob(1, "a.pt", [{"sequence": "s1", "frame_count": 10}]),
+        ExtractionJob(2, "b.pt", [{"sequence": "s2", "frame_count": 10}]),
+    ]
+    events: List[str] = []
+
+    @contextlib.contextmanager
+    def fake_alternate_device(*args):
+        events.append("acquire")
+        yield "device"
+        events.append("release")
+
+    def fake_run_worker(host, port, run_job, heartbeat_interval):
+        for job in jobs:
+            run_job(job)
+        return len(jobs)
+
+    def fake_extract(checkpoint, sequences_csv, device, models, **kwargs):
+        assert_that(models, is_((str(checkpoint), device)))
+        events.append(f"extract {checkpoint}")
+
+    def fake_load(checkpoint, device):
+        events.append(f"load {checkpoint}")
+        return str(checkpoint), device
+
+    monkeypatch.setattr(alternate_device, "alternate_device", fake_alternate_device)
+    monkeypatch.setattr(job_queue, "run_worker", fake_run_worker)
+    monkeypatch.setattr(experiments, "_load_actionclip_models", fake_load)
+    monkeypatch.setattr(experiments, "_extract_actionclip_features", fake_extract)
+
+    result = runner.invoke(typer_app, ["queue-worker", "--port", "1234"])
+
+    assert result.exit_code == 0, result.stdout
+    assert_that(
+        events,
+        is_(
+            [
+                "acquire",
+                "load a.pt",
+                "extract a.pt",
+                "extract a.pt",
+                "load b.pt",
+                "extract b.pt",
+                "release",
+            ]
+        ),
+    )
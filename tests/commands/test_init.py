@@ -0,0 +1,35 @@
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = ["torch", "pytorch_lightning", "open_clip", "towhee", "decord"]
+
+
+@pytest.mark.parametrize(
+    "command",
+    [
+        ["szte", "index", "meta", "--help"],
+        ["videos", "frames", "extract", "--help"],
+        ["experiments", "actionclip", "--help"],
+    ],
+)
+def test_typer_app__no_heavy_imports(command):
+    # run in a new interpreter, as the current one might already have imported them
+    code = (
+        "import sys\n"
+        "from ilids.commands import typer_app\n"
+        "try:\n"
+        "    typer_app()\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        f"print([m for m in {HEAVY_MODULES!r} if m in sys.modules])\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code, *command],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+
+    assert output.strip().splitlines()[-1] == "[]"
@@ -1,11 +1,24 @@
+import math
+import os
+from datetime import timedelta
 from pathlib import Path
 
+import numpy as np
 import pytest
 from hamcrest import *
 from typer.testing import CliRunner
 
 from ilids.cli.ffprobe import get_stream_info
-from ilids.commands.videos.frames_extraction import typer_app
+from ilids.commands.videos import frames_extraction
+from ilids.commands.videos.frames_extraction import (
+    _extract_video_sequences,
+    _frames_window,
+    _is_up_to_date,
+    _parse_time,
+    _trivial_frame_selection,
+    _VideoSequences,
+    typer_app,
+)
 
 runner = CliRunner()
 
@@ -26,7 +39,15 @@ def test_extract__SZTEA101a_issue_frame_count(
 
     result = runner.invoke(
         typer_app,
-        [str(input_sequence), start_time, end_time, "12", "-o", str(output_file)],
+        [
+            "extract",
+            str(input_sequence),
+            start_time,
+            end_time,
+            "12",
+            "-o",
+            str(output_file),
+        ],
     )
 
     assert result.exit_code == 0
@@ -53,7 +74,15 @@ def test_extract(create_sample_video, tmp_path: Path):
 
     result = runner.invoke(
         typer_app,
-        [str(input_video_path), "00:00:46", "00:01:48", "12", "-o", str(output_file)],
+        [
+            "extract",
+            str(input_video_path),
+            "00:00:46",
+            "00:01:48",
+            "12",
+            "-o",
+            str(output_file),
+        ],
     )
 
     assert result.exit_code == 0
@@ -81,7 +110,15 @@ def test_extract__long_video_with_start_time_0(create_sample_video, tmp_path: Pa
 
     result = runner.invoke(
         typer_app,
-        [str(input_video_path), "01:12:46", "01:13:48", "12", "-o", str(output_file)],
+        [
+            "extract",
+            str(input_video_path),
+            "01:12:46",
+            "01:13:48",
+            "12",
+            "-o",
+            str(output_file),
+        ],
     )
 
     assert result.exit_code == 0
@@ -98,3 +135,284 @@ def test_extract__long_video_with_start_time_0(create_sample_video, tmp_path: Pa
     assert_that(output_info.format.start_time, is_(close_to(0, 0.001)))
     new_duration = (48 + 60 - 46 + 1) / 12
     assert_that(output_info.format.duration, is_(close_to(new_duration, 0.1)))
+
+
+def test_batch(create_sample_video, tmp_path: Path):
+    # create 2 videos of 2 minutes
+    first_video_path = create_sample_video(120, (720, 576), 25, ".mov")
+    second_video_path = create_sample_video(120, (720, 576), 25, ".mov")
+
+    sequences_csv = tmp_path / "sequences.csv"
+    sequences_csv.write_text(
+        "id_sequence,filename,StartTime,EndTime\n"
+        f"first_00_00_46.mov,{first_video_path.name},00:00:46,00:01:48\n"
+        f"second_00_00_10.mov,{second_video_path.name},00:00:10,00:00:20\n"
+        f"first_00_00_10.mov,{first_video_path.name},00:00:10,00:00:20\n"
+    )
+
+    output_folder = tmp_path / "sequences"
+    output_folder.mkdir()
+
+    result = runner.invoke(
+        typer_app,
+        ["batch", str(sequences_csv), str(tmp_path), "12", str(output_folder)],
+    )
+
+    assert result.exit_code == 0
+
+    for output_name, new_duration in [
+        ("first_00_00_46.mov", (48 + 60 - 46 + 1) / 12),
+        ("second_00_00_10.mov", (10 + 1) / 12),
+        ("first_00_00_10.mov", (10 + 1) / 12),
+    ]:
+        output_file = output_folder / output_name
+
+        assert output_file.exists()
+
+        output_info = get_stream_info(output_file)
+
+        assert len(output_info.streams) == 1
+
+        assert_that(output_info.streams[0].avg_fps, is_(close_to(25, 0.1)))
+        assert_that(output_info.streams[0].height, is_(224))
+        assert_that(output_info.streams[0].width, is_(280))
+        assert_that(output_info.format.start_time, is_(close_to(0, 0.001)))
+        assert_that(output_info.format.duration, is_(close_to(new_duration, 0.1)))
+
+
+def test_batch_fail__existing_output(create_sample_video, tmp_path: Path):
+    input_video_path = create_sample_video(30, (720, 576), 25, ".mov")
+
+    sequences_csv = tmp_path / "sequences.csv"
+    sequences_csv.write_text(
+        "id_sequence,filename,StartTime,EndTime\n"
+        f"output.mov,{input_video_path.name},00:00:02,00:00:10\n"
+    )
+    (tmp_path / "output.mov").touch()
+
+    result = runner.invoke(
+        typer_app,
+        ["batch", str(sequences_csv), str(tmp_path), "12", str(tmp_path)],
+    )
+
+    assert result.exit_code == 1
+
+
+def test_extract_all__skip_up_to_date_outputs(create_sample_video, tmp_path: Path):
+    first_video_path = create_sample_video(30, (720, 576), 25, ".mov")
+    second_video_path = create_sample_video(30, (720, 576), 25, ".mov")
+
+    sequences_csv = tmp_path / "sequences.csv"
+    sequences_csv.write_text(
+        "id_sequence,filename,StartTime,EndTime\n"
+        f"first_00_00_02.mov,{first_video_path.name},00:00:02,00:00:10\n"
+        f"second_00_00_10.mov,{second_video_path.name},00:00:10,00:00:20\n"
+    )
+
+    output_folder = tmp_path / "sequences"
+    output_folder.mkdir()
+
+    command = [
+        "extract-all",
+        str(sequences_csv),
+        str(tmp_path),
+        "12",
+        str(output_folder),
+        "-j",
+        "2",
+    ]
+
+    result = runner.invoke(typer_app, command)
+
+    assert result.exit_code == 0
+    assert_that(result.stdout, contains_string("2 sequences to extract"))
+
+    for output_name, new_duration in [
+        ("first_00_00_02.mov", (8 + 1) / 12),
+        ("second_00_00_10.mov", (10 + 1) / 12),
+    ]:
+        output_info = get_stream_info(output_folder / output_name)
+
+        assert_that(output_info.streams[0].height, is_(224))
+        assert_that(output_info.format.duration, is_(close_to(new_duration, 0.1)))
+
+    # nothing to do as long as the outputs are more recent than the input videos
+    result = runner.invoke(typer_app, command)
+
+    assert result.exit_code == 0
+    assert_that(result.stdout, contains_string("0 sequences to extract (2 up to date)"))
+
+    # an updated input video outdates only its own sequences
+    second_video_path.touch()
+
+    result = runner.invoke(typer_app, command)
+
+    assert result.exit_code == 0
+    assert_that(result.stdout, contains_string("1 sequences to extract (1 up to date)"))
+
+
+@pytest.fixture()
+def fake_ffmpeg(monkeypatch):
+    """Replace the ffmpeg extraction of the sequences, which writes (part of) each output
+    before exiting with the returned code"""
+    calls = []
+
+    def fake_scale_compress_select_sequences(input_video, sequences, *args, **kwargs):
+        calls.append([output for output, _ in sequences])
+        for output, _ in sequences:
+            output.write_bytes(b"frames")
+        return fake_scale_compress_select_sequences.returncode
+
+    fake_scale_compress_select_sequences.returncode = 0
+    fake_scale_compress_select_sequences.calls = calls
+
+    monkeypatch.setattr(
+        frames_extraction,
+        "scale_compress_select_sequences",
+        fake_scale_compress_select_sequences,
+    )
+
+    return fake_scale_compress_select_sequences
+
+
+@pytest.mark.parametrize("returncode", [0, 1])
+def test_extract_video_sequences__only_complete_outputs(
+    fake_ffmpeg, tmp_path: Path, returncode: int
+):
+    fake_ffmpeg.returncode = returncode
+
+    outputs = [tmp_path / "first_00_00_02.mov", tmp_path / "second_00_00_10.mov"]
+    frames_window = _frames_window(timedelta(seconds=2), timedelta(seconds=10), 12, 25)
+
+    success = _extract_video_sequences(
+        _VideoSequences(
+            tmp_path / "input.mov",
+            25,
+            [(output, frames_window) for output in outputs],
+            ["first key", "second key"],
+        )
+    )
+
+    assert_that(success, is_(returncode == 0))
+    # no output of a failed ffmpeg is left to be taken as up to date
+    assert_that(
+        sorted(path.name for path in tmp_path.iterdir() if path.suffix == ".mov"),
+        is_(equal_to([output.name for output in outputs] if success else [])),
+    )
+    assert_that(_is_up_to_date(outputs[0], "first key"), is_(success))
+    assert_that(_is_up_to_date(outputs[0], "second key"), is_(False))
+
+
+def _write_sequences_csv(tmp_path: Path, end_time: str = "00:00:10") -> Path:
+    for filename in ["first.mov", "second.mov"]:
+        (tmp_path / filename).write_bytes(b"video")
+
+    sequences_csv = tmp_path / "sequences.csv"
+    sequences_csv.write_text(
+        "id_sequence,filename,StartTime,EndTime\n"
+        "first_00_00_02.mov,first.mov,00:00:02,00:00:10\n"
+        f"second_00_00_02.mov,second.mov,00:00:02,{end_time}\n"
+    )
+
+    return sequences_csv
+
+
+def test_extract_all__outdated_by_frames_window(fake_ffmpeg, tmp_path: Path):
+    output_folder = tmp_path / "sequences"
+    output_folder.mkdir()
+
+    def extract_all(frame_stride: int = 12, end_time: str = "00:00:10"):
+        sequences_csv = _write_sequences_csv(tmp_path, end_time)
+        # the input videos are rewritten, but keep their modification time
+        for filename in ["first.mov", "second.mov"]:
+            os.utime(tmp_path / filename, ns=(0, 0))
+
+        return runner.invoke(
+            typer_app,
+            [
+                "extract-all",
+                str(sequences_csv),
+                str(tmp_path),
+                str(frame_stride),
+                str(output_folder),
+                "--fps",
+                "25",
+                "-j",
+                "1",
+            ],
+        )
+
+    result = extract_all()
+    assert result.exit_code == 0
+    assert_that(result.stdout, contains_string("2 sequences to extract"))
+
+    result = extract_all()
+    assert_that(result.stdout, contains_string("0 sequences to extract (2 up to date)"))
+
+    # another frame stride outdates all the sequences
+    result = extract_all(frame_stride=6)
+    assert_that(result.stdout, contains_string("2 sequences to extract"))
+
+    # another window only its own sequence
+    result = extract_all(frame_stride=6, end_time="00:00:08")
+    assert_that(result.stdout, contains_string("1 sequences to extract (1 up to date)"))
+
+
+def test_batch__failed_ffmpeg(fake_ffmpeg, tmp_path: Path):
+    output_folder = tmp_path / "sequences"
+    output_folder.mkdir()
+
+    fake_ffmpeg.returncode = 1
+
+    result = runner.invoke(
+        typer_app,
+        [
+            "batch",
+            str(_write_sequences_csv(tmp_path)),
+            str(tmp_path),
+            "12",
+            str(output_folder),
+            "--fps",
+            "25",
+        ],
+    )
+
+    assert result.exit_code == 1
+    assert_that(len(fake_ffmpeg.calls), is_(2))
+    # no truncated sequence is left behind
+    assert_that(list(output_folder.iterdir()), is_(empty()))
+
+
+@pytest.mark.parametrize(
+    "start_time,end_time,frame_stride",
+    [
+        ("00:00:00", "00:00:10", 12),
+        ("00:27:58", "00:28:59", 12),
+        ("00:17:01", "00:17:48", 12),
+        ("01:12:46", "01:13:48", 7),
+        ("00:00:03", "00:00:04", 25),
+    ],
+)
+def test_frames_window__same_frames_as_trivial_frame_selection(
+    start_time: str, end_time: str, frame_stride: int
+):
+    fps = 25
+    start = _parse_time(start_time)
+    end = _parse_time(end_time)
+
+    frames_window = _frames_window(start, end, frame_stride, fps)
+
+    expected_frames_sequence = (
+        np.array(
+            _trivial_frame_selection(
+                frame_stride, math.ceil((end - start).total_seconds() * fps)
+            )
+        )
+        + (start.total_seconds() * fps)
+    ).astype(int)
+
+    assert_that(
+        frames_window.frames_sequence(),
+        is_(equal_to(expected_frames_sequence.tolist())),
+    )
+    assert_that(len(frames_window), is_(len(expected_frames_sequence)))
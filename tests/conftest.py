@@ -7,6 +7,8 @@ from typing import Callable, List, Tuple
 
 import pytest
 
+from ilids.utils.cache import CACHE_DIR_ENV_VARIABLE
+
 
 @pytest.fixture()
 def szte_path() -> Path:
@@ -33,6 +35,15 @@ def ckpt_path() -> Path:
     return Path(os.getcwd()) / "ckpt"
 
 
+@pytest.fixture(autouse=True)
+def isolated_cache_dir(monkeypatch, tmp_path_factory) -> Path:
+    """Don't read nor pollute the user's cache while testing"""
+    cache_dir = tmp_path_factory.mktemp("cache")
+    monkeypatch.setenv(CACHE_DIR_ENV_VARIABLE, str(cache_dir))
+
+    return cache_dir
+
+
 def _data_file_marker_builder(request, marker_name: str, parent_folder: Path):
     marker = request.node.get_closest_marker(marker_name)
     if marker:
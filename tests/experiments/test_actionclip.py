@@ -0,0 +1,159 @@
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+from hamcrest import *
+from torch.utils.data import DataLoader
+
+from ilids.experiments.actionclip import (
+    EXTRACTION_STAGES,
+    StageTimings,
+    extract_actionclip_sequences_features,
+)
+from ilids.models.actionclip.datasets import ActionDataset
+from ilids.models.actionclip.transform import (
+    TensorGroupFromFrames,
+    get_device_augmentation,
+    get_tensor_augmentation,
+)
+from ilids.utils.features_shards import FeaturesShardsWriter
+
+
+class _MeanFusion(torch.nn.Module):
+    def forward(self, x):
+        return x.mean(dim=1)
+
+
+def _image_model() -> torch.nn.Module:
+    torch.manual_seed(0)
+    return torch.nn.Sequential(
+        torch.nn.AdaptiveAvgPool2d(4), torch.nn.Flatten(), torch.nn.Linear(48, 16)
+    )
+
+
+def test_extract_actionclip_sequences_features__device_transform(
+    create_sample_video, tmp_path: Path
+):
+    sequences_csv = tmp_path / "sequences.csv"
+    pd.DataFrame(
+        [[str(create_sample_video(1, (280, 224), 25, ".mov")), 25] for _ in range(3)],
+        columns=["sequence", "frame_count"],
+    ).to_csv(sequences_csv, index=False)
+
+    def _extract(transform, device_transform):
+        dataset = ActionDataset(
+            sequences_csv,
+            frames_to_extract=8,
+            transform=transform,
+            tensor_transform=True,
+        )
+        return extract_actionclip_sequences_features(
+            _image_model(),
+            _MeanFusion(),
+            DataLoader(dataset, batch_size=2, shuffle=False),
+            extracted_frames=8,
+            normalize_features=True,
+            device=torch.device("cpu"),
+            device_transform=device_transform,
+        )
+
+    expected_df = _extract(get_tensor_augmentation(), None)
+    actual_df = _extract(TensorGroupFromFrames(), get_device_augmentation())
+
+    assert_that(actual_df.shape, is_((3, 16)))
+    assert_that(list(actual_df.index), is_(list(expected_df.index)))
+    assert torch.allclose(
+        torch.from_numpy(actual_df.values), torch.from_numpy(expected_df.values)
+    )
+
+
+def test_extract_actionclip_sequences_features__timings(
+    create_sample_video, tmp_path: Path
+):
+    sequences_csv = tmp_path / "sequences.csv"
+    pd.DataFrame(
+        [[str(create_sample_video(1, (280, 224), 25, ".mov")), 25] for _ in range(5)],
+        columns=["sequence", "frame_count"],
+    ).to_csv(sequences_csv, index=False)
+
+    dataset = ActionDataset(
+        sequences_csv,
+        frames_to_extract=8,
+        transform=get_tensor_augmentation(),
+        tensor_transform=True,
+    )
+    timings = StageTimings()
+
+    features_df = extract_actionclip_sequences_features(
+        _image_model(),
+        _MeanFusion(),
+        DataLoader(dataset, batch_size=2, shuffle=False),
+        extracted_frames=8,
+        normalize_features=False,
+        device=torch.device("cpu"),
+        timings=timings,
+    )
+
+    # the last batch is incomplete
+    assert_that(features_df.shape, is_((5, 16)))
+    assert_that(list(features_df.index), is_(list(dataset._sequences_df["sequence"])))
+
+    assert_that(list(timings.seconds.keys()), is_(EXTRACTION_STAGES))
+    for stage in ["load", "encode", "fusion"]:
+        assert_that(timings.seconds[stage], is_(greater_than(0)))
+
+
+def test_StageTimings__measure_failing_stage():
+    timings = StageTimings()
+
+    with pytest.raises(RuntimeError):
+        with timings.measure("encode"):
+            time.sleep(0.01)
+            raise RuntimeError("Out of memory")
+
+    assert_that(timings.seconds["encode"], is_(greater_than_or_equal_to(0.01)))
+
+
+def test_extract_actionclip_sequences_features__resume(
+    create_sample_video, tmp_path: Path
+):
+    sequences_csv = tmp_path / "sequences.csv"
+    sequences = [str(create_sample_video(1, (280, 224), 25, ".mov")) for _ in range(3)]
+    pd.DataFrame(
+        [[sequence, 25] for sequence in sequences],
+        columns=["sequence", "frame_count"],
+    ).to_csv(sequences_csv, index=False)
+
+    def _extract(features_writer=None):
+        dataset = ActionDataset(
+            sequences_csv,
+            frames_to_extract=8,
+            transform=get_tensor_augmentation(),
+            tensor_transform=True,
+            exclude_sequences=features_writer and features_writer.extracted_paths(),
+        )
+        return extract_actionclip_sequences_features(
+            _image_model(),
+            _MeanFusion(),
+            DataLoader(dataset, batch_size=1, shuffle=False),
+            extracted_frames=8,
+            normalize_features=False,
+            device=torch.device("cpu"),
+            features_writer=features_writer,
+        )
+
+    expected_df = _extract()
+
+    # a previous run, interrupted after the first sequence
+    with FeaturesShardsWriter(tmp_path / "shards") as writer:
+        writer.append(sequences[:1], expected_df.loc[sequences[:1]].to_numpy())
+
+    with FeaturesShardsWriter(tmp_path / "shards", flush_every=1) as writer:
+        resumed_df = _extract(writer)
+
+    assert_that(list(resumed_df.index), is_(sequences[1:]))
+    assert_that(list(writer.read().index), is_(sequences))
+    assert np.allclose(writer.read().to_numpy(), expected_df.to_numpy())
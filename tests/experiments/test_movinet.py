@@ -0,0 +1,175 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import torch
+from hamcrest import *
+
+from ilids.experiments import movinet as movinet_experiments
+from ilids.experiments.movinet import (
+    MOVINET_FEATURES_SIZE,
+    _batches_by_shape,
+    _chunked,
+    _predict_videos,
+    _stream_windows,
+    extract_movinet_stream_features,
+)
+from ilids.towhee_utils.override.movinet import Movinet
+from ilids.towhee_utils.override.movinet_config import MovinetModelName
+
+
+def test_batches_by_shape():
+    clips = [
+        ("a", torch.zeros(3, 50, 172, 172)),
+        ("b", torch.zeros(3, 20, 172, 172)),
+        ("c", torch.zeros(3, 50, 172, 172)),
+        ("d", torch.zeros(3, 50, 172, 172)),
+    ]
+
+    batches = list(_batches_by_shape(clips, batch_size=2))
+
+    assert_that([paths for paths, _ in batches], is_([["a", "c"], ["d"], ["b"]]))
+    assert_that(
+        [tuple(inputs.shape) for _, inputs in batches],
+        is_([(2, 3, 50, 172, 172), (1, 3, 50, 172, 172), (1, 3, 20, 172, 172)]),
+    )
+
+
+def test_stream_windows():
+    windows = _stream_windows(frame_count=10, frame_step=2, stride_frames=2)
+
+    assert_that([list(window) for window in windows], is_([[0, 2], [4, 6], [8]]))
+
+
+def test_chunked():
+    assert_that(list(_chunked(range(5), 2)), is_([[0, 1], [2, 3], [4]]))
+
+
+class CumulativeAveragePooling:
+    def __init__(self):
+        self.reset_activation()
+
+    def reset_activation(self):
+        self.sum = 0.0
+        self.count = 0
+
+    def __call__(self, activations: torch.Tensor) -> torch.Tensor:
+        self.sum = self.sum + activations.sum(dim=1)
+        self.count += activations.shape[1]
+        return self.sum / self.count
+
+
+class TinyCausalModel(torch.nn.Module):
+    """Causal temporal convolution (kernel of 2 frames) of the average of each frame,
+    followed by a cumulative average pooling, with the same stream buffers API as the
+    causal MoViNet"""
+
+    def __init__(self):
+        super().__init__()
+        self.weights = torch.linspace(-1, 1, MOVINET_FEATURES_SIZE)
+        self.cgap = CumulativeAveragePooling()
+        self.clean_activation_buffers()
+
+    def clean_activation_buffers(self):
+        self.last_frame = None
+        self.cgap.reset_activation()
+
+    def forward_features(self, inputs: torch.Tensor) -> torch.Tensor:
+        frames = inputs.mean(dim=(1, 3, 4))  # B x T
+
+        # the last frame of the previous chunk, as the stream buffer of the convolution
+        previous_frame = (
+            torch.zeros_like(frames[:, :1])
+            if self.last_frame is None
+            else self.last_frame
+        )
+        self.last_frame = frames[:, -1:]
+
+        return self.cgap(frames + 0.5 * torch.cat([previous_frame, frames[:, :-1]], 1))
+
+    def head(self, features: torch.Tensor) -> torch.Tensor:
+        return features[:, None] * self.weights.to(features.device)
+
+
+class FakeVideoReader:
+    def __init__(self, frames: np.ndarray):
+        self.frames = frames
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def get_batch(self, indices: np.ndarray) -> SimpleNamespace:
+        return SimpleNamespace(asnumpy=lambda: self.frames[indices])
+
+
+def test_predict_videos__in_another_thread(monkeypatch):
+    monkeypatch.setattr(
+        "ilids.towhee_utils.override.movinet.create_model",
+        lambda **kwargs: TinyCausalModel(),
+    )
+    movinet = Movinet(model_name=MovinetModelName.movineta0.value)
+
+    rng = np.random.default_rng(0)
+    videos = [
+        (path, rng.integers(0, 256, (20, 16, 16, 3), dtype=np.uint8))
+        for path in ["a", "b", "c"]
+    ]
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        batches = executor.submit(_predict_videos, movinet, videos, 2, None).result()
+
+    assert_that([paths for paths, _ in batches], is_([["a", "b"], ["c"]]))
+    for (path, frames), features in zip(
+        videos, np.concatenate([features for _, features in batches])
+    ):
+        np.testing.assert_allclose(features, movinet(list(frames))[2], rtol=1e-6)
+
+
+@pytest.mark.parametrize("chunk_frames", [1, 2, 4])
+def test_extract_movinet_stream_features__same_as_single_pass(
+    monkeypatch, tmp_path: Path, chunk_frames: int
+):
+    monkeypatch.setattr(
+        "ilids.towhee_utils.override.movinet.create_model",
+        lambda **kwargs: TinyCausalModel(),
+    )
+
+    frames = np.random.default_rng(0).integers(0, 256, (20, 16, 16, 3), dtype=np.uint8)
+    monkeypatch.setattr(
+        movinet_experiments, "VideoReader", lambda path, ctx: FakeVideoReader(frames)
+    )
+
+    features_df = extract_movinet_stream_features(
+        MovinetModelName.movineta0,
+        tmp_path / "video.mov",
+        chunk_frames=chunk_frames,
+        stride_frames=4,
+        frame_step=2,
+    )
+
+    # a single pass of the causal convolution over all the streamed frames
+    streamed_frames = (
+        Movinet(model_name=MovinetModelName.movineta0.value, causal=True)
+        .preprocess(frames[::2], temporal_subsample=False)
+        .mean(dim=(0, 2, 3))
+        .cpu()
+        .numpy()
+    )
+    activations = streamed_frames + 0.5 * np.concatenate([[0], streamed_frames[:-1]])
+
+    # the pooling is reset for each window: its features only average its own frames,
+    # while the convolution carries on from the previous window
+    windows = [range(0, 4), range(4, 8), range(8, 10)]
+    expected_features = np.stack(
+        [
+            activations[window].mean() * np.linspace(-1, 1, MOVINET_FEATURES_SIZE)
+            for window in windows
+        ]
+    )
+
+    assert_that(features_df.index.tolist(), is_([0, 8, 16]))
+    np.testing.assert_allclose(
+        features_df.to_numpy(), expected_features, rtol=1e-5, atol=1e-6
+    )
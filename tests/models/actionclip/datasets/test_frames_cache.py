@@ -0,0 +1,107 @@
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import torch
+from hamcrest import *
+
+from ilids.models.actionclip.datasets import ActionDataset
+from ilids.models.actionclip.datasets.frames_cache import PreprocessedFramesCache
+from ilids.models.actionclip.transform import (
+    get_augmentation,
+    get_normalize_augmentation,
+    get_tensor_augmentation,
+    get_tensor_normalize_augmentation,
+)
+
+
+def _sequences_csv(tmp_path: Path, sequences: list) -> Path:
+    sequences_csv = tmp_path / "sequences.csv"
+    pd.DataFrame(
+        [[str(sequence), 25] for sequence in sequences],
+        columns=["sequence", "frame_count"],
+    ).to_csv(sequences_csv, index=False)
+
+    return sequences_csv
+
+
+def test_ActionDataset__frames_cache_same_as_get_augmentation(
+    create_sample_video, tmp_path: Path
+):
+    sequences_csv = _sequences_csv(
+        tmp_path,
+        [
+            create_sample_video(1, (280, 224), 25, ".mov"),
+            create_sample_video(1, (320, 240), 25, ".mov"),
+        ],
+    )
+
+    dataset = ActionDataset(
+        sequences_csv, frames_to_extract=8, transform=get_augmentation()
+    )
+    cached_dataset = ActionDataset(
+        sequences_csv,
+        frames_to_extract=8,
+        transform=get_normalize_augmentation(),
+        frames_cache=PreprocessedFramesCache(cache_dir=tmp_path),
+    )
+
+    for i in range(len(dataset)):
+        frames, path = dataset[i]
+        # both when populating the cache and when reading from it
+        for _ in range(2):
+            cached_frames, cached_path = cached_dataset[i]
+
+            assert_that(cached_path, is_(path))
+            assert torch.equal(cached_frames, frames)
+
+
+def test_PreprocessedFramesCache__decode_once(create_sample_video, tmp_path: Path):
+    sequence = str(create_sample_video(1, (320, 240), 25, ".mov"))
+    frames_cache = PreprocessedFramesCache(input_size=112, cache_dir=tmp_path)
+
+    with patch.object(
+        frames_cache, "_decode", wraps=frames_cache._decode
+    ) as decode_mocked:
+        frames = frames_cache.get(sequence, np.array([1, 5, 9]))
+        cached_frames = frames_cache.get(sequence, np.array([1, 5, 9]))
+
+        assert_that(decode_mocked.call_count, is_(1))
+        assert_that(cached_frames.shape, is_((3, 112, 112, 3)))
+        assert_that(cached_frames.dtype, is_(np.dtype(np.uint8)))
+        assert np.array_equal(cached_frames, frames)
+
+        # another selection of frames is another cache entry
+        frames_cache.get(sequence, np.array([2, 6, 10]))
+
+        assert_that(decode_mocked.call_count, is_(2))
+
+
+def test_ActionDataset__frames_cache_tensor_transform(
+    create_sample_video, tmp_path: Path
+):
+    sequences_csv = _sequences_csv(
+        tmp_path, [create_sample_video(1, (320, 240), 25, ".mov")]
+    )
+
+    dataset = ActionDataset(
+        sequences_csv,
+        frames_to_extract=8,
+        transform=get_tensor_augmentation(),
+        tensor_transform=True,
+    )
+    cached_dataset = ActionDataset(
+        sequences_csv,
+        frames_to_extract=8,
+        transform=get_tensor_normalize_augmentation(),
+        frames_cache=PreprocessedFramesCache(cache_dir=tmp_path),
+        tensor_transform=True,
+    )
+
+    frames, _ = dataset[0]
+    cached_frames, _ = cached_dataset[0]
+
+    assert_that(cached_frames.shape, is_(frames.shape))
+    # the cache scales the frames with PIL
+    assert_that((cached_frames - frames).abs().mean().item(), is_(less_than(0.01)))
@@ -0,0 +1,62 @@
+from pathlib import Path
+from typing import List
+
+import torch
+from hamcrest import *
+
+from ilids.models.actionclip.prompt_embeddings import (
+    PromptEmbeddings,
+    PromptEmbeddingsCache,
+)
+
+
+class FakeTextEncoder:
+    """Encode each prompt as its length, repeated, keeping track of the prompts"""
+
+    def __init__(self):
+        self.encoded_prompts: List[List[str]] = []
+
+    def __call__(self, prompts: List[str]) -> torch.Tensor:
+        self.encoded_prompts.append(prompts)
+        return torch.tensor([[float(len(prompt))] * 4 for prompt in prompts])
+
+
+def test_prompt_embeddings__gathers_rows():
+    embeddings = PromptEmbeddings(
+        ["a", "bb", "ccc"], torch.arange(6, dtype=torch.float32).reshape(3, 2)
+    )
+
+    features = embeddings[["ccc", "a"]]
+    assert_that(features.tolist(), is_(equal_to([[4.0, 5.0], [0.0, 1.0]])))
+
+    # modifying the gathered rows leaves the table untouched
+    features -= 1
+    assert_that(embeddings.features[0].tolist(), is_(equal_to([0.0, 1.0])))
+
+
+def test_prompt_embeddings_cache__encodes_each_prompt_once(
+    tmp_path: Path, isolated_cache_dir: Path
+):
+    ckpt = tmp_path / "model.pt"
+    ckpt.write_bytes(b"weights")
+
+    encoder = FakeTextEncoder()
+
+    embeddings = PromptEmbeddingsCache(ckpt).get(["a", "bb", "a"], encoder)
+
+    assert_that(embeddings.prompts, is_(equal_to(["a", "bb"])))
+    assert_that(embeddings[["bb"]].tolist(), is_(equal_to([[2.0] * 4])))
+
+    # another process with a larger vocabulary only encodes the new prompts
+    embeddings = PromptEmbeddingsCache(ckpt).get(["bb", "ccc", "a"], encoder)
+
+    assert_that(encoder.encoded_prompts, is_(equal_to([["a", "bb"], ["ccc"]])))
+    assert_that(
+        embeddings[["a", "ccc"]].tolist(), is_(equal_to([[1.0] * 4, [3.0] * 4]))
+    )
+
+    # a new version of the checkpoint invalidates the cached features
+    ckpt.write_bytes(b"new weights")
+    PromptEmbeddingsCache(ckpt).get(["a"], encoder)
+
+    assert_that(encoder.encoded_prompts[-1], is_(equal_to(["a"])))
@@ -0,0 +1,59 @@
+import numpy as np
+import PIL.Image
+import pytest
+import torch
+from decord import VideoReader, cpu
+from hamcrest import *
+
+from ilids.models.actionclip.transform import (
+    INPUT_STD,
+    get_augmentation,
+    get_normalize_augmentation,
+    get_scale_crop_augmentation,
+    get_tensor_augmentation,
+    get_tensor_normalize_augmentation,
+)
+
+# difference of a single uint8 value, once normalized
+ONE_LEVEL = 1 / (255 * min(INPUT_STD))
+
+
+@pytest.mark.parametrize("input_size", [224, 112])
+def test_get_tensor_augmentation__parity_with_get_augmentation(
+    create_ilids_sample_video, input_size: int
+):
+    vr = VideoReader(str(create_ilids_sample_video()), ctx=cpu(0))
+    frames = vr.get_batch([0, 12, 24, 36, 48, 60, 72, 84]).asnumpy()
+
+    expected = get_augmentation(input_size)(
+        [PIL.Image.fromarray(frame) for frame in frames]
+    )
+    actual = get_tensor_augmentation(input_size)(frames)
+
+    assert_that(actual.shape, is_(expected.shape))
+    assert_that(actual.dtype, is_(torch.float32))
+
+    difference = (actual - expected).abs()
+    # PIL works with fixed point interpolation weights, which only matter on the sharp
+    # edges of the sample video
+    assert_that(difference.mean().item(), is_(less_than(0.05 * ONE_LEVEL)))
+    assert_that(
+        (difference > ONE_LEVEL + 1e-5).float().mean().item(),
+        is_(less_than(0.01)),
+    )
+
+
+def test_get_tensor_normalize_augmentation__same_as_get_normalize_augmentation(
+    create_ilids_sample_video,
+):
+    vr = VideoReader(str(create_ilids_sample_video()), ctx=cpu(0))
+    pil_frames = get_scale_crop_augmentation()(
+        [PIL.Image.fromarray(frame) for frame in vr.get_batch([0, 5, 10]).asnumpy()]
+    )
+
+    expected = get_normalize_augmentation()(pil_frames)
+    actual = get_tensor_normalize_augmentation()(
+        np.stack([np.asarray(frame) for frame in pil_frames])
+    )
+
+    assert torch.allclose(actual, expected, atol=1e-5)
@@ -0,0 +1,38 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+import torch
+from hamcrest import *
+
+# the results scripts aren't a package: they are run from their own folder
+TOPK_PATH = (
+    Path(__file__).parents[2]
+    / "results"
+    / "actionclip"
+    / "metrics"
+    / "score"
+    / "topk.py"
+)
+_spec = importlib.util.spec_from_file_location("actionclip_topk", TOPK_PATH)
+topk = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(topk)
+
+TOPKS = list(range(1, 9))
+
+
+@pytest.mark.parametrize("method", list(topk.TopClassificationMethod))
+@pytest.mark.parametrize("seed", range(5))
+def test_classify_topks__same_as_classify(method, seed: int):
+    generator = torch.Generator().manual_seed(seed)
+    # texts x visual, both classes of texts being drawn
+    similarities = torch.rand((12, 50), generator=generator)
+    text_class = (torch.rand(12, generator=generator) < 0.5).tolist()
+    text_class[:2] = [True, False]
+
+    topKs_y = topk.classify_topks(method, similarities, text_class, TOPKS)
+
+    assert_that(tuple(topKs_y.shape), is_((len(TOPKS), 50)))
+    for topK, y in zip(TOPKS, topKs_y):
+        expected = topk.classify(method, similarities, text_class, topK)
+        assert_that(y.tolist(), is_(equal_to(expected.bool().tolist())), f"top {topK}")
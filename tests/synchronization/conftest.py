@@ -0,0 +1,26 @@
+import socketserver
+
+import pytest
+
+
+class FakeClock:
+    """Clock of the leases, only moving forward when the tests set `now`"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+@pytest.fixture
+def free_port() -> int:
+    with socketserver.TCPServer(("localhost", 0), None) as s:
+        free_port = s.server_address[1]
+
+        return free_port
@@ -0,0 +1,28 @@
+import time
+
+import pytest
+from hamcrest import *
+
+from ilids.synchronization.acquire_gpu_client import acquire_free_gpu
+from ilids.synchronization.gpu_sync_manager import get_server_manager
+
+
+def test_acquire_free_gpu(free_port: int):
+    manager = get_server_manager({1}, free_port, lease_timeout=1.0)
+    manager.start()
+
+    try:
+        with acquire_free_gpu("localhost", free_port, heartbeat_interval=0.2) as gpu_id:
+            assert_that(gpu_id, is_(1))
+
+            # kept alive by the heartbeats
+            time.sleep(1.5)
+
+            with pytest.raises(TimeoutError):
+                with acquire_free_gpu("localhost", free_port, timeout=0.5):
+                    pytest.fail("The only GPU is already acquired")
+
+        with acquire_free_gpu("localhost", free_port, timeout=0.5) as gpu_id:
+            assert_that(gpu_id, is_(1))
+    finally:
+        manager.shutdown()
@@ -0,0 +1,111 @@
+import threading
+import time
+from typing import List
+
+import pytest
+from hamcrest import *
+
+from ilids.synchronization.gpu_scheduler import GpuScheduler
+
+
+def test_GpuScheduler__jobs_per_gpu():
+    scheduler = GpuScheduler({0, 1}, jobs_per_gpu=2)
+
+    gpu_ids = [scheduler.acquire(timeout=0.1)[0] for _ in range(4)]
+
+    # spread on the least busy GPU first
+    assert_that(gpu_ids, is_([0, 1, 0, 1]))
+    assert_that(scheduler.jobs(), is_({0: 2, 1: 2}))
+
+    with pytest.raises(TimeoutError):
+        scheduler.acquire(timeout=0.1)
+
+
+def test_GpuScheduler__release():
+    scheduler = GpuScheduler({3})
+
+    gpu_id, lease_id = scheduler.acquire(timeout=0.1)
+    scheduler.release(lease_id)
+    # released twice, e.g. after being reclaimed
+    scheduler.release(lease_id)
+
+    assert_that(scheduler.acquire(timeout=0.1)[0], is_(3))
+    assert_that(scheduler.jobs(), is_({3: 1}))
+
+
+def test_GpuScheduler__fifo():
+    scheduler = GpuScheduler({0})
+    _, first_lease_id = scheduler.acquire()
+
+    order: List[int] = []
+
+    def _wait_for_gpu(client: int):
+        _, lease_id = scheduler.acquire(timeout=5)
+        order.append(client)
+        scheduler.release(lease_id)
+
+    waiting_clients = []
+    for client in range(3):
+        waiting_clients.append(threading.Thread(target=_wait_for_gpu, args=(client,)))
+        waiting_clients[-1].start()
+        # let the client queue up
+        time.sleep(0.05)
+
+    scheduler.release(first_lease_id)
+    for waiting_client in waiting_clients:
+        waiting_client.join()
+
+    assert_that(order, is_([0, 1, 2]))
+
+
+def test_GpuScheduler__reclaim_expired_lease(clock):
+    scheduler = GpuScheduler({0}, lease_timeout=10, clock=clock)
+
+    _, dead_lease_id = scheduler.acquire()
+
+    clock.now = 8
+    assert_that(scheduler.heartbeat(dead_lease_id), is_(True))
+
+    with pytest.raises(TimeoutError):
+        scheduler.acquire(timeout=0.1)
+
+    # no heartbeat since
+    clock.now = 20
+    gpu_id, _ = scheduler.acquire(timeout=0.1)
+
+    assert_that(gpu_id, is_(0))
+    assert_that(scheduler.heartbeat(dead_lease_id), is_(False))
+
+
+def test_GpuScheduler__min_free_memory(clock):
+    free_memory = {0: 1 << 30, 1: 8 << 30}
+    readings: List[int] = []
+
+    def _free_memory(gpu_id: int) -> int:
+        readings.append(gpu_id)
+        return free_memory[gpu_id]
+
+    scheduler = GpuScheduler(
+        {0, 1},
+        jobs_per_gpu=4,
+        min_free_memory=4 << 30,
+        free_memory=_free_memory,
+        clock=clock,
+    )
+
+    # a burst of jobs: the memory of the jobs already given is reserved, as they didn't
+    # allocate it yet
+    assert_that([scheduler.acquire(timeout=0.1)[0] for _ in range(2)], is_([1, 1]))
+
+    with pytest.raises(TimeoutError):
+        scheduler.acquire(timeout=0.1)
+
+    # the free memory is only read once per check interval
+    assert_that(readings, is_([0, 1]))
+
+    # the next reading shows the memory the jobs allocated, and some released
+    free_memory[1] = 5 << 30
+    clock.now = 2
+
+    assert_that(scheduler.acquire(timeout=0.1)[0], is_(1))
+    assert_that(readings, is_([0, 1, 0, 1]))
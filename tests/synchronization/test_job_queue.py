@@ -0,0 +1,112 @@
+import multiprocessing
+import os
+
+import numpy as np
+import pandas as pd
+from hamcrest import *
+
+from ilids.synchronization.job_queue import (
+    ExtractionJob,
+    JobQueue,
+    JobStatus,
+    run_worker,
+    serve_job_queue,
+    shard_jobs,
+)
+
+
+def _sequences_df(count: int) -> pd.DataFrame:
+    return pd.DataFrame(
+        {"sequence": [f"seq-{i}.mov" for i in range(count)], "frame_count": 25}
+    )
+
+
+def _fake_features(job: ExtractionJob) -> pd.DataFrame:
+    return pd.DataFrame(
+        np.full((len(job.sequences), 2), len(job.model), dtype=np.float32),
+        index=[row["sequence"] for row in job.sequences],
+    )
+
+
+def test_shard_jobs():
+    jobs = shard_jobs(["movineta0", "movineta1"], _sequences_df(5), shard_size=2)
+
+    assert_that([job.job_id for job in jobs], is_(list(range(6))))
+    assert_that([job.model for job in jobs], is_(["movineta0"] * 3 + ["movineta1"] * 3))
+    assert_that([len(job.sequences) for job in jobs], is_([2, 2, 1] * 2))
+    assert_that(jobs[0].sequences[0], is_({"sequence": "seq-0.mov", "frame_count": 25}))
+
+
+def test_JobQueue__requeue_expired_job(clock):
+    queue = JobQueue(
+        shard_jobs(["a"], _sequences_df(2), 2), lease_timeout=10, clock=clock
+    )
+
+    job = queue.take("dead worker")
+    assert_that(queue.take("worker", timeout=0.1), is_(None))
+
+    clock.now = 20
+    retried_job = queue.take("worker", timeout=0.1)
+
+    assert_that(retried_job.job_id, is_(job.job_id))
+    assert_that(retried_job.attempts, is_(2))
+    assert_that(queue.heartbeat(job.job_id, "dead worker"), is_(False))
+
+    queue.complete(job.job_id, _fake_features(job))
+
+    assert_that(queue.wait(timeout=0.1), is_(True))
+    assert_that(queue.take("worker"), is_(None))
+
+
+def test_JobQueue__max_attempts():
+    queue = JobQueue(shard_jobs(["a"], _sequences_df(1), 1), max_attempts=2)
+
+    for _ in range(2):
+        job = queue.take("worker", timeout=0.1)
+        queue.fail(job.job_id, "worker", "error")
+
+    assert_that(queue.wait(timeout=0.1), is_(True))
+    assert_that(queue.failed_jobs(), has_length(1))
+    assert_that(queue.statuses()[JobStatus.failed], is_(1))
+
+
+def _run_dying_worker(port: int):
+    def _die(job: ExtractionJob) -> pd.DataFrame:
+        os._exit(1)
+
+    run_worker("localhost", port, _die, heartbeat_interval=0.1)
+
+
+def _run_worker(port: int):
+    run_worker("localhost", port, _fake_features, heartbeat_interval=0.1)
+
+
+def test_run_worker(free_port: int):
+    queue = JobQueue(
+        shard_jobs(["a", "bb"], _sequences_df(7), shard_size=3), lease_timeout=1.0
+    )
+    serve_job_queue(queue, free_port)
+
+    context = multiprocessing.get_context("fork")
+
+    # takes the first job, then disconnects without completing it
+    dying_worker = context.Process(target=_run_dying_worker, args=(free_port,))
+    dying_worker.start()
+    dying_worker.join()
+
+    workers = [context.Process(target=_run_worker, args=(free_port,)) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+
+    assert_that(queue.wait(timeout=30), is_(True))
+    for worker in workers:
+        worker.join(timeout=30)
+
+    assert_that(queue.statuses()[JobStatus.done], is_(6))
+
+    features = queue.features()
+
+    assert_that(sorted(features.keys()), is_(["a", "bb"]))
+    for model, features_df in features.items():
+        assert_that(list(features_df.index), is_(list(_sequences_df(7)["sequence"])))
+        assert np.all(features_df.to_numpy() == len(model))
@@ -1,7 +1,5 @@
-import socketserver
 from unittest.mock import patch
 
-import pytest
 from typer.testing import CliRunner
 
 from ilids.synchronization.share_gpu_command import typer_app
@@ -9,14 +7,6 @@ from ilids.synchronization.share_gpu_command import typer_app
 runner = CliRunner(mix_stderr=False)
 
 
-@pytest.fixture
-def free_port():
-    with socketserver.TCPServer(("localhost", 0), None) as s:
-        free_port = s.server_address[1]
-
-        return free_port
-
-
 def test_serve_gpu_sync__missing_option(free_port: int):
     result = runner.invoke(
         typer_app,
@@ -55,7 +45,13 @@ def test_serve_gpu_sync__gpu_count(free_port: int):
 
         Lock.assert_called()
 
-        server_provider.assert_called_once_with(set(range(4)), free_port)
+        server_provider.assert_called_once_with(
+            set(range(4)),
+            free_port,
+            jobs_per_gpu=1,
+            lease_timeout=60.0,
+            min_free_memory=None,
+        )
 
 
 def test_serve_gpu_sync__available_gpus(free_port: int):
@@ -80,7 +76,13 @@ def test_serve_gpu_sync__available_gpus(free_port: int):
 
         Lock.assert_called()
 
-        server_provider.assert_called_once_with({2, 3, 5}, free_port)
+        server_provider.assert_called_once_with(
+            {2, 3, 5},
+            free_port,
+            jobs_per_gpu=1,
+            lease_timeout=60.0,
+            min_free_memory=None,
+        )
 
 
 def test_serve_gpu_sync__available_gpus__duplicate(free_port: int):
@@ -111,4 +113,41 @@ def test_serve_gpu_sync__available_gpus__duplicate(free_port: int):
 
         Lock.assert_called()
 
-        server_provider.assert_called_once_with({3, 2, 5}, free_port)
+        server_provider.assert_called_once_with(
+            {3, 2, 5},
+            free_port,
+            jobs_per_gpu=1,
+            lease_timeout=60.0,
+            min_free_memory=None,
+        )
+
+
+def test_serve_gpu_sync__scheduler_options(free_port: int):
+    with patch("ilids.synchronization.share_gpu_command.DeleteFileLock"), patch(
+        "ilids.synchronization.share_gpu_command.get_server_manager"
+    ) as server_provider:
+        result = runner.invoke(
+            typer_app,
+            [
+                "--port",
+                free_port,
+                "--count",
+                2,
+                "--jobs-per-gpu",
+                3,
+                "--min-free-memory",
+                4096,
+                "--lease-timeout",
+                30,
+            ],
+        )
+
+        assert result.exit_code == 0
+
+        server_provider.assert_called_once_with(
+            {0, 1},
+            free_port,
+            jobs_per_gpu=3,
+            lease_timeout=30.0,
+            min_free_memory=4096 * 2**20,
+        )
@@ -4,10 +4,12 @@ import numpy
 import pytest
 import torch
 import towhee
+from einops import rearrange
 from hamcrest import *
 from towhee import ops
 from towhee.engine import OperatorRegistry
 from towhee.functional.entity import Entity
+from towhee.models.utils.video_transforms import transform_video
 
 from ilids.towhee_utils.override.movinet import Movinet
 
@@ -50,3 +52,25 @@ def test_get_override_movinet_from_chain_call(input_path: Path):
         entity,
         has_property("features", all_of(instance_of(numpy.ndarray), has_length(600))),
     )
+
+
+def test_movinet_preprocess__same_as_towhee_transform():
+    movinet: Movinet = ops.ilids.movinet(model_name="movineta0").get_op()
+
+    rng = numpy.random.default_rng(0)
+    frames = [rng.integers(0, 256, (240, 320, 3), dtype=numpy.uint8) for _ in range(90)]
+
+    expected_inputs = transform_video(
+        video=rearrange(
+            numpy.stack([frame.astype(numpy.float32) / 255.0 for frame in frames]),
+            "t w h c -> c t w h",
+        ),
+        **movinet.transform_cfgs,
+    )
+
+    # from the list of frames, or a single buffer of all of them
+    for video in [frames, numpy.stack(frames)]:
+        inputs = movinet.preprocess(video).cpu()
+
+        assert_that(inputs.shape, is_(expected_inputs.shape))
+        assert torch.allclose(inputs, expected_inputs)
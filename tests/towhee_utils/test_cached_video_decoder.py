@@ -4,6 +4,7 @@ from multiprocessing import cpu_count
 from pathlib import Path
 from typing import List
 
+import numpy as np
 import towhee
 from hamcrest import *
 from joblib import Parallel, delayed
@@ -12,6 +13,7 @@ from towhee.operator import PyOperator
 from towhee.types import VideoFrame
 
 import ilids.towhee_utils.cached_video_decoder
+from ilids.towhee_utils.cached_video_decoder import CachedVideoDecoder, CacheStats
 
 
 @register(name="frame_counter", output_schema=["count"])
@@ -59,3 +61,60 @@ def test_cached_video_decoder(create_ilids_sample_video, tmp_path: Path):
     assert_that(
         joined_entities, only_contains(has_property("count", is_(equal_to(10 * 25))))
     )
+
+
+def _frames(value: int, count: int = 3) -> List[VideoFrame]:
+    return [VideoFrame(np.full((4, 4, 3), value, dtype=np.uint8)) for _ in range(count)]
+
+
+def test_cached_video_decoder__lru_eviction():
+    decoder = CachedVideoDecoder(max_entries=2)
+
+    decoder("a", iter(_frames(0)))
+    decoder("b", iter(_frames(1)))
+    # "a" becomes the most recently used
+    decoder("a", iter([]))
+    decoder("c", iter(_frames(2)))
+
+    assert_that(list(decoder.latest_frames.keys()), is_(["a", "c"]))
+    assert_that(decoder.stats, is_(CacheStats(hits=1, misses=3, evictions=1)))
+
+
+def test_cached_video_decoder__max_bytes():
+    frames_bytes = sum(frame.nbytes for frame in _frames(0))
+    decoder = CachedVideoDecoder(max_bytes=2 * frames_bytes)
+
+    for path in ["a", "b", "c"]:
+        decoder(path, iter(_frames(0)))
+
+    assert_that(list(decoder.latest_frames.keys()), is_(["b", "c"]))
+    assert_that(decoder.cached_bytes, is_(2 * frames_bytes))
+
+    # the latest video is always kept
+    decoder("d", iter(_frames(0, count=9)))
+
+    assert_that(list(decoder.latest_frames.keys()), is_(["d"]))
+
+
+def test_cached_video_decoder__spill_to_disk(tmp_path: Path):
+    video_paths = []
+    for name in ["a", "b"]:
+        video_paths.append(str(tmp_path / f"{name}.mov"))
+        Path(video_paths[-1]).touch()
+
+    decoder = CachedVideoDecoder(
+        max_entries=1, spill_to_disk=True, cache_dir=tmp_path / "cache"
+    )
+
+    decoder(video_paths[0], iter(_frames(7)))
+    decoder(video_paths[1], iter(_frames(8)))
+
+    assert_that(len(list((tmp_path / "cache").glob("*.npy"))), is_(1))
+
+    # read back from the disk, not decoded again
+    frames = decoder(video_paths[0], iter([]))
+
+    assert_that(frames, has_length(3))
+    assert_that(frames, only_contains(instance_of(VideoFrame)))
+    assert np.array_equal(np.stack(frames), np.stack(_frames(7)))
+    assert_that(decoder.stats, is_(CacheStats(spill_hits=1, misses=2, evictions=2)))
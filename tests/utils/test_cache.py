@@ -0,0 +1,49 @@
+import os
+from pathlib import Path
+
+from hamcrest import *
+
+from ilids.utils.cache import file_cache_key, get_cache_dir, write_atomically
+
+
+def test_get_cache_dir(isolated_cache_dir: Path):
+    cache_dir = get_cache_dir("namespace")
+
+    assert_that(cache_dir, is_(equal_to(isolated_cache_dir / "namespace")))
+    assert cache_dir.is_dir()
+
+
+def test_file_cache_key__stable(tmp_path: Path):
+    file = tmp_path / "file.txt"
+    file.write_text("content")
+
+    assert_that(file_cache_key(file), is_(equal_to(file_cache_key(file))))
+    assert_that(
+        file_cache_key(file, "a", 1), is_not(equal_to(file_cache_key(file, "a", 2)))
+    )
+
+
+def test_file_cache_key__changes_with_modification(tmp_path: Path):
+    file = tmp_path / "file.txt"
+    file.write_text("content")
+
+    key = file_cache_key(file)
+
+    file.write_text("other content")
+
+    assert_that(file_cache_key(file), is_not(equal_to(key)))
+
+    # same size, but different modification time
+    stat_result = os.stat(file)
+    os.utime(file, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns + 1000))
+
+    assert_that(file_cache_key(file), is_not(equal_to(key)))
+
+
+def test_write_atomically(tmp_path: Path):
+    file = tmp_path / "file.bin"
+
+    write_atomically(file, b"content")
+
+    assert_that(file.read_bytes(), is_(equal_to(b"content")))
+    assert_that(list(tmp_path.iterdir()), contains_exactly(file))
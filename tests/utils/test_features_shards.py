@@ -0,0 +1,91 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+from hamcrest import *
+
+from ilids.utils.features_shards import FeaturesShardsWriter, ShardsMetadataMismatch
+
+
+def test_FeaturesShardsWriter(tmp_path: Path):
+    shards_folder = tmp_path / "output.npy.shards"
+
+    with FeaturesShardsWriter(
+        shards_folder, flush_every=2, index_name="path"
+    ) as writer:
+        writer.append(["a", "b"], np.arange(6).reshape(2, 3))
+        assert_that(writer.extracted_paths(), is_(set()))
+
+        writer.append(["c"], np.arange(6, 9).reshape(1, 3))
+        assert_that(writer.extracted_paths(), is_({"a", "b", "c"}))
+
+        writer.append(["d"], np.arange(9, 12).reshape(1, 3))
+
+    # flushed on exit
+    assert_that(writer.extracted_paths(), is_({"a", "b", "c", "d"}))
+    assert_that(len(list(shards_folder.glob("shard-*.npy"))), is_(2))
+
+    df = writer.read()
+
+    assert_that(list(df.index), is_(["a", "b", "c", "d"]))
+    assert_that(df.index.name, is_("path"))
+    assert_that(df.to_numpy().dtype, is_(np.dtype(np.float32)))
+    assert np.array_equal(df.to_numpy(), np.arange(12).reshape(4, 3))
+
+    writer.remove()
+
+    assert_that(shards_folder.exists(), is_(False))
+
+
+def test_FeaturesShardsWriter__resume(tmp_path: Path):
+    shards_folder = tmp_path / "output.npy.shards"
+
+    try:
+        with FeaturesShardsWriter(shards_folder, flush_every=10) as writer:
+            writer.append(["a"], np.zeros((1, 3)))
+            raise KeyboardInterrupt()
+    except KeyboardInterrupt:
+        pass
+
+    # a partially written shard is ignored
+    (shards_folder / ".shard-00001.npy").write_bytes(b"")
+
+    resumed_writer = FeaturesShardsWriter(shards_folder)
+    assert_that(resumed_writer.extracted_paths(), is_({"a"}))
+
+    resumed_writer.append(["b"], np.ones((1, 3)))
+    resumed_writer.flush()
+
+    assert_that(list(resumed_writer.read().index), is_(["a", "b"]))
+
+
+def test_FeaturesShardsWriter__copy_appended_features(tmp_path: Path):
+    writer = FeaturesShardsWriter(tmp_path / "shards")
+
+    # e.g. a buffer reused for the next batch
+    buffer = np.zeros((1, 3))
+    writer.append(["a"], buffer)
+    buffer[:] = 1
+    writer.append(["b"], buffer)
+    writer.flush()
+
+    assert np.array_equal(writer.read().to_numpy(), [[0, 0, 0], [1, 1, 1]])
+
+
+def test_FeaturesShardsWriter__other_extraction(tmp_path: Path):
+    shards_folder = tmp_path / "output.npy.shards"
+
+    with FeaturesShardsWriter(
+        shards_folder, flush_every=1, metadata={"model": "movineta0"}
+    ) as writer:
+        writer.append(["a"], np.zeros((1, 3)))
+
+    # the same extraction resumes
+    resumed_writer = FeaturesShardsWriter(
+        shards_folder, metadata={"model": "movineta0"}
+    )
+    assert_that(resumed_writer.extracted_paths(), is_({"a"}))
+
+    # while another one doesn't merge its features with the ones of the shards
+    with pytest.raises(ShardsMetadataMismatch):
+        FeaturesShardsWriter(shards_folder, metadata={"model": "movineta1"})
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+from hamcrest import *
+
+from ilids.utils.features_store import FeaturesStore
+
+
+def test_FeaturesStore():
+    store = FeaturesStore(4, 3, index_name="path")
+
+    store.append(["a", "b"], np.arange(6).reshape(2, 3))
+    # written later, in place
+    rows = store.reserve(["c"])
+    rows[:] = [[6, 7, 8]]
+
+    df = store.to_dataframe()
+
+    assert_that(len(store), is_(3))
+    assert_that(df.shape, is_((3, 3)))
+    assert_that(list(df.index), is_(["a", "b", "c"]))
+    assert_that(df.index.name, is_("path"))
+    assert_that(list(df.columns), is_([0, 1, 2]))
+    assert_that(df.to_numpy().dtype, is_(np.dtype(np.float32)))
+    assert np.array_equal(df.to_numpy(), np.arange(9).reshape(3, 3))
+
+
+def test_FeaturesStore__fail_over_capacity():
+    store = FeaturesStore(1, 3)
+
+    with pytest.raises(ValueError):
+        store.append(["a", "b"], np.zeros((2, 3)))
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from hamcrest import *
+from sklearn.metrics import confusion_matrix, roc_curve
+
+from ilids.utils.metrics import (
+    ThresholdSweep,
+    confusion_matrix_fn_equals_0,
+    cost_curves,
+)
+
+
+@pytest.mark.parametrize("decimals", [None, 1])
+def test_ThresholdSweep__same_as_confusion_matrix(decimals):
+    rng = np.random.default_rng(0)
+    y_true = rng.random(200) < 0.3
+    y_score = rng.random(200)
+    if decimals is not None:
+        # with ties
+        y_score = y_score.round(decimals)
+
+    sweep = ThresholdSweep(y_true, y_score)
+    thresholds = roc_curve(y_true, y_score)[2][::-1]
+
+    for threshold, matrix in zip(thresholds, sweep.confusion_matrices(thresholds)):
+        TN, FP, FN, TP = confusion_matrix(y_true, y_score >= threshold).ravel()
+        assert_that(matrix.tolist(), is_(equal_to([[TP, FN], [FP, TN]])))
+
+
+def test_ThresholdSweep__thresholds():
+    sweep = ThresholdSweep(
+        np.array([True, False, True, False]), np.array([0.9, 0.1, 0.4, 0.4])
+    )
+
+    assert_that(sweep.thresholds().tolist(), is_(equal_to([0.9, 0.4, 0.1])))
+    assert_that(
+        sweep.confusion_matrices(sweep.thresholds()).tolist(),
+        is_(
+            equal_to(
+                [
+                    [[1, 1], [0, 2]],
+                    [[2, 0], [1, 1]],
+                    [[2, 0], [2, 0]],
+                ]
+            )
+        ),
+    )
+
+
+def test_cost_curves():
+    matrices = np.array([[[2, 0], [3, 5]], [[1, 1], [0, 8]]])
+
+    costs = cost_curves(matrices, [0.5, 0.9])
+
+    assert_that(costs.shape, is_((2, 2)))
+    assert_that(costs[0].tolist(), is_(equal_to([1.5, 0.5])))
+    assert_that(costs[1, 0], is_(close_to(0.3, 1e-9)))
+    assert_that(costs[1, 1], is_(close_to(0.9, 1e-9)))
+
+
+def test_confusion_matrix_fn_equals_0():
+    y_true = np.array([True, False, True, False, False])
+    y_score = np.array([0.8, 0.9, 0.3, 0.2, 0.3])
+
+    assert_that(confusion_matrix_fn_equals_0(y_true, y_score), is_((2, 0, 2, 1)))
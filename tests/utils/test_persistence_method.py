@@ -0,0 +1,107 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+from hamcrest import *
+
+from ilids.utils.persistence_method import (
+    FeatherPandasPersistenceMethod,
+    NpyPandasPersistenceMethod,
+    NpzPandasPersistenceMethod,
+    ParquetPandasPersistenceMethod,
+    PicklePandasPersistenceMethod,
+    find_pandas_persisted_file,
+    get_pandas_persistence_method,
+    read_pandas,
+)
+
+
+def _features_df() -> pd.DataFrame:
+    return pd.DataFrame(
+        np.random.default_rng(0).random((3, 5), dtype=np.float32),
+        index=["data/sequences/a.mov", "data/sequences/b,c.mov", "d.mov"],
+    )
+
+
+def test_NpyPandasPersistenceMethod__persist_read(tmp_path: Path):
+    df = _features_df()
+    path = tmp_path / "features.npy"
+
+    NpyPandasPersistenceMethod().persist(path, df)
+    read_df = NpyPandasPersistenceMethod().read(path)
+
+    pd.testing.assert_frame_equal(read_df, df)
+
+
+@pytest.mark.parametrize(
+    "extension", [".csv", ".pkl", ".parquet", ".feather", ".arrow", ".npy", ".npz"]
+)
+def test_persist_read(tmp_path: Path, extension: str):
+    df = _features_df()
+    path = tmp_path / f"features{extension}"
+
+    get_pandas_persistence_method(path).persist(path, df)
+
+    # CSV doesn't keep the float32 type
+    check_dtype = extension != ".csv"
+
+    pd.testing.assert_frame_equal(
+        read_pandas(path), df, check_exact=False, check_dtype=check_dtype
+    )
+
+    # only a subset of the columns
+    pd.testing.assert_frame_equal(
+        read_pandas(path, columns=[1, 3]),
+        df[[1, 3]],
+        check_exact=False,
+        check_dtype=check_dtype,
+    )
+
+
+@pytest.mark.parametrize(
+    "persistence_method",
+    [ParquetPandasPersistenceMethod(), FeatherPandasPersistenceMethod()],
+)
+def test_columnar_persist__float32_named_index(tmp_path: Path, persistence_method):
+    df = _features_df().astype(np.float64).rename_axis("path")
+    path = tmp_path / "features"
+
+    persistence_method.persist(path, df)
+    read_df = persistence_method.read(path)
+
+    assert_that(read_df.index.name, is_("path"))
+    assert_that(set(read_df.dtypes), is_({np.dtype(np.float32)}))
+    pd.testing.assert_frame_equal(read_df, df.astype(np.float32))
+
+
+def test_NpzPandasPersistenceMethod__compressed(tmp_path: Path):
+    df = pd.DataFrame(np.zeros((100, 600)), index=[str(i) for i in range(100)])
+
+    NpzPandasPersistenceMethod().persist(tmp_path / "compressed.npz", df)
+    NpzPandasPersistenceMethod(compressed=False).persist(tmp_path / "raw.npz", df)
+
+    assert_that(
+        (tmp_path / "compressed.npz").stat().st_size,
+        is_(less_than((tmp_path / "raw.npz").stat().st_size)),
+    )
+
+
+def test_find_pandas_persisted_file(tmp_path: Path):
+    df = _features_df()
+    PicklePandasPersistenceMethod().persist(tmp_path / "features.pkl", df)
+
+    assert_that(
+        find_pandas_persisted_file(tmp_path, "features"),
+        is_(tmp_path / "features.pkl"),
+    )
+
+    ParquetPandasPersistenceMethod().persist(tmp_path / "features.parquet", df)
+
+    assert_that(
+        find_pandas_persisted_file(tmp_path, "features"),
+        is_(tmp_path / "features.parquet"),
+    )
+
+    with pytest.raises(FileNotFoundError):
+        find_pandas_persisted_file(tmp_path, "other")